@@ -26,12 +26,15 @@
         "partner_contact_gender",
         "partner_contact_birthdate",
         "partner_contact_nationality",
+        "queue_job",
         # "partner_identification_unique_by_category",
     ],
     "data": [
         "security/pms_security.xml",
         "security/ir.model.access.csv",
         "data/cron_jobs.xml",
+        "data/queue_data.xml",
+        "data/queue_job_function_data.xml",
         "data/pms_sequence.xml",
         "data/pms_confirmed_reservation_email_template.xml",
         "data/pms_modified_reservation_email_template.xml",
@@ -71,6 +74,7 @@
         "views/pms_room_type_class_views.xml",
         "views/pms_availability_plan_views.xml",
         "views/pms_availability_plan_rule_views.xml",
+        "views/pms_archived_record_views.xml",
         "views/res_partner_views.xml",
         "views/product_pricelist_views.xml",
         "views/product_pricelist_item_views.xml",
@@ -1 +1,2 @@
 from . import pms_portal
+from . import pms_ari
@@ -0,0 +1,80 @@
+import json
+
+from werkzeug.exceptions import BadRequest
+
+import odoo
+from odoo import api, fields, http
+from odoo.http import request
+
+
+class PmsAri(http.Controller):
+    @http.route(
+        ["/pms/ari/<int:pms_property_id>"],
+        type="http",
+        auth="user",
+        methods=["GET"],
+    )
+    def pms_ari_export(
+        self, pms_property_id, date_from, date_to, pricelist_id=None, **kw
+    ):
+        """
+        Stream the availability, rates and restrictions of a property as
+        JSON lines: a header line followed by one line per room type and
+        night. The rows are read from a server-side cursor while the
+        response is sent, so a long range is never held in memory.
+        """
+        pms_property = request.env["pms.property"].search(
+            [("id", "=", pms_property_id)]
+        )
+        if not pms_property:
+            return request.not_found()
+        try:
+            date_from = fields.Date.from_string(date_from)
+            date_to = fields.Date.from_string(date_to)
+            pricelist_id = int(pricelist_id) if pricelist_id else False
+        except ValueError:
+            raise BadRequest("Wrong date_from, date_to or pricelist_id")
+        if date_from > date_to:
+            raise BadRequest("date_from must be before date_to")
+        pricelist = (
+            request.env["product.pricelist"].browse(pricelist_id)
+            if pricelist_id
+            else pms_property.default_pricelist_id
+        )
+        if not pricelist.exists():
+            return request.not_found()
+        pricelist.check_access_rights("read")
+        pricelist.check_access_rule("read")
+
+        dbname = request.env.cr.dbname
+        uid = request.env.uid
+        context = dict(request.env.context)
+        header = {
+            "pms_property_id": pms_property.id,
+            "pricelist_id": pricelist.id,
+            "availability_plan_id": pricelist.availability_plan_id.id or None,
+            "date_from": fields.Date.to_string(date_from),
+            "date_to": fields.Date.to_string(date_to),
+        }
+
+        def generate_lines():
+            # the request cursor is closed before the response is streamed
+            with odoo.registry(dbname).cursor() as cr:
+                env = api.Environment(cr, uid, context)
+                yield json.dumps(header) + "\n"
+                for row in (
+                    env["pms.property"]
+                    .browse(pms_property.id)
+                    .iter_ari_rows(
+                        env["product.pricelist"].browse(pricelist.id),
+                        date_from,
+                        date_to,
+                    )
+                ):
+                    yield json.dumps(row) + "\n"
+
+        return http.Response(
+            generate_lines(),
+            headers=[("Content-Type", "application/x-ndjson")],
+            direct_passthrough=True,
+        )
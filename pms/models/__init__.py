@@ -4,6 +4,7 @@
 
 from . import ir_http
 from . import ir_config_parameter
+from . import ir_sequence
 
 from . import pms_board_service_room_type
 from . import pms_property
@@ -23,6 +24,7 @@ from . import res_company
 from . import account_payment
 from . import pms_availability_plan
 from . import pms_availability_plan_rule
+from . import pms_availability_plan_range_rule
 from . import pms_reservation_line
 from . import pms_checkin_partner
 from . import product_pricelist
@@ -43,6 +45,10 @@ from . import account_bank_statement_line
 from . import account_bank_statement
 from . import account_journal
 from . import pms_availability
+from . import pms_ari_change
+from . import pms_inventory_hold
+from . import pms_rate_grid
+from . import pms_archived_record
 from . import res_partner_id_number
 from . import pms_automated_mails
 from . import payment_transaction
@@ -0,0 +1,28 @@
+from odoo import models
+
+from odoo.addons.base.models.ir_sequence import _update_nogap
+
+
+class IrSequence(models.Model):
+    _inherit = "ir.sequence"
+
+    def _next_do_batch(self, count):
+        """
+        Next count values of the sequence, allocated in a block with a
+        single query instead of one _next_do call by value.
+        :return: list of the interpolated values
+        """
+        self.ensure_one()
+        if count <= 0:
+            return []
+        if self.implementation == "standard":
+            self.env.cr.execute(
+                "SELECT nextval('ir_sequence_%03d') FROM generate_series(1, %%s)"
+                % self.id,
+                (count,),
+            )
+            numbers = [row[0] for row in self.env.cr.fetchall()]
+        else:
+            first_number = _update_nogap(self, self.number_increment * count)
+            numbers = [first_number + self.number_increment * x for x in range(count)]
+        return [self.get_next_char(number) for number in numbers]
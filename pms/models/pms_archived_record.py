@@ -0,0 +1,238 @@
+# License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl).
+import datetime
+import json
+
+import psycopg2
+
+from odoo import _, api, fields, models
+from odoo.exceptions import ValidationError
+
+# archived models and the date after which their records are not used
+ARCHIVED_MODELS = {
+    "product.pricelist.item": "date_end_consumption",
+    "pms.availability.plan.rule": "date",
+    "pms.availability.plan.range.rule": "date_to",
+}
+# stored fields computed from other records, computed again on restore
+# instead of taking their archived values
+ARCHIVE_RECOMPUTED_FIELDS = {
+    "product.pricelist.item": ["pms_property_rank"],
+    "pms.availability.plan.rule": ["avail_id", "real_avail", "plan_avail"],
+}
+# changes registered in the ARI outbox for the restored records, as their
+# create does
+ARCHIVE_ARI_CHANGES = {
+    "product.pricelist.item": {"prices": True},
+    "pms.availability.plan.rule": {"avail": True, "restrictions": True},
+    "pms.availability.plan.range.rule": {"restrictions": True},
+}
+# days of past consumption kept in the live tables when the system
+# parameter pms.archive_window_days is not set
+ARCHIVE_WINDOW_DAYS = 365
+
+
+class PmsArchivedRecord(models.Model):
+    _name = "pms.archived.record"
+    _description = "Archived past pricelist item or availability rule"
+    _order = "date desc, id desc"
+
+    res_model = fields.Char(
+        string="Model",
+        help="Model of the archived record",
+        readonly=True,
+        required=True,
+        index=True,
+    )
+    res_id = fields.Integer(
+        string="Record ID",
+        help="ID of the archived record, kept when it is restored",
+        readonly=True,
+        required=True,
+        index=True,
+    )
+    date = fields.Date(
+        string="Date",
+        help="Last consumption date of the archived record",
+        readonly=True,
+        index=True,
+    )
+    data = fields.Text(
+        string="Data",
+        help="Row of the archived record, with its many2many values, as JSON",
+        readonly=True,
+    )
+
+    @api.model
+    def _get_archive_cutoff_date(self):
+        """
+        Records whose last consumption date is before the cutoff can be
+        archived: the archive window before today, moved back to the first
+        night of the folios still to invoice, so that their prices can be
+        recomputed until they are invoiced.
+        """
+        window_days = int(
+            self.env["ir.config_parameter"]
+            .sudo()
+            .get_param("pms.archive_window_days", ARCHIVE_WINDOW_DAYS)
+        )
+        cutoff = fields.Date.today() - datetime.timedelta(days=max(window_days, 1))
+        self.env["base"].flush()
+        self.env.cr.execute(
+            """
+            SELECT LEAST(
+                (SELECT MIN(line.date)
+                 FROM   pms_reservation_line line
+                        JOIN pms_reservation res ON res.id = line.reservation_id
+                        JOIN pms_folio folio ON folio.id = res.folio_id
+                 WHERE  folio.invoice_status = 'to_invoice'),
+                (SELECT MIN(line.date)
+                 FROM   pms_service_line line
+                        JOIN pms_service service ON service.id = line.service_id
+                        JOIN pms_folio folio ON folio.id = service.folio_id
+                 WHERE  folio.invoice_status = 'to_invoice')
+            )
+            """
+        )
+        first_to_invoice = self.env.cr.fetchone()[0]
+        if first_to_invoice and first_to_invoice < cutoff:
+            cutoff = first_to_invoice
+        return cutoff
+
+    @api.model
+    def _get_many2many_fields(self, model_name):
+        return [
+            field
+            for field in self.env[model_name]._fields.values()
+            if field.type == "many2many" and field.store
+        ]
+
+    @api.model
+    def archive_records(self, cutoff=False):
+        """
+        Move the pricelist items and availability rules whose consumption
+        ended before the cutoff out of their tables, so that the price and
+        restriction queries only scan the live calendar. Each row is kept
+        as JSON with its many2many values and can be restored.
+        :param cutoff: by default, the date given by _get_archive_cutoff_date
+        :return: number of archived records
+        """
+        cutoff = cutoff or self._get_archive_cutoff_date()
+        self.env["base"].flush()
+        archived = 0
+        for model_name, date_field in ARCHIVED_MODELS.items():
+            Model = self.env[model_name]
+            many2many = ", ".join(
+                "'%s', ARRAY(SELECT rel.%s FROM %s rel WHERE rel.%s = t.id)"
+                % (field.name, field.column2, field.relation, field.column1)
+                for field in self._get_many2many_fields(model_name)
+            )
+            self.env.cr.execute(
+                """
+                INSERT INTO pms_archived_record (
+                    res_model, res_id, date, data,
+                    create_uid, create_date, write_uid, write_date
+                )
+                SELECT %%(model)s, t.id, t.%s,
+                       (to_jsonb(t) || jsonb_build_object(%s))::text,
+                       %%(uid)s, now() at time zone 'UTC',
+                       %%(uid)s, now() at time zone 'UTC'
+                FROM   %s t
+                WHERE  t.%s < %%(cutoff)s
+                RETURNING res_id
+                """
+                % (date_field, many2many, Model._table, date_field),
+                {"model": model_name, "uid": self.env.uid, "cutoff": cutoff},
+            )
+            ids = [row[0] for row in self.env.cr.fetchall()]
+            if not ids:
+                continue
+            # through unlink, so that the ARI outbox, the rate grid and the
+            # availability cache follow the removed rows
+            Model.browse(ids).unlink()
+            archived += len(ids)
+        if archived:
+            self.invalidate_cache()
+        return archived
+
+    @api.model
+    def cron_archive_records(self):
+        self.archive_records()
+
+    def action_restore(self):
+        """
+        Put the archived records back in their tables with their former
+        ids, to audit them or to price again a past stay. The fields
+        computed from other records are computed again, as those records
+        may have changed meanwhile.
+        """
+        self.flush()
+        for model_name in set(self.mapped("res_model")):
+            records = self.filtered(lambda r: r.res_model == model_name)
+            Model = self.env[model_name]
+            recomputed_fields = ARCHIVE_RECOMPUTED_FIELDS.get(model_name, [])
+            try:
+                with self.env.cr.savepoint():
+                    self.env.cr.execute(
+                        """
+                        INSERT INTO %s
+                        SELECT archived_row.*
+                        FROM   pms_archived_record archive
+                               CROSS JOIN LATERAL jsonb_populate_record(
+                                   NULL::%s, archive.data::jsonb - %%s::text[]
+                               ) archived_row
+                        WHERE  archive.id = ANY(%%s)
+                        """
+                        % (Model._table, Model._table),
+                        (recomputed_fields, records.ids),
+                    )
+                    for field in self._get_many2many_fields(model_name):
+                        self.env.cr.execute(
+                            """
+                            INSERT INTO %s (%s, %s)
+                            SELECT archive.res_id, target.id
+                            FROM   pms_archived_record archive
+                                   CROSS JOIN LATERAL jsonb_array_elements_text(
+                                       archive.data::jsonb -> %%s
+                                   ) rel_id
+                                   JOIN %s target ON target.id = rel_id::int
+                            WHERE  archive.id = ANY(%%s)
+                            ON CONFLICT DO NOTHING
+                            """
+                            % (
+                                field.relation,
+                                field.column1,
+                                field.column2,
+                                self.env[field.comodel_name]._table,
+                            ),
+                            (field.name, records.ids),
+                        )
+            except psycopg2.IntegrityError:
+                raise ValidationError(
+                    _(
+                        "The archived records can't be restored, "
+                        "some of their related records were removed."
+                    )
+                )
+            restored = Model.browse(records.mapped("res_id"))
+            records.unlink()
+            Model.invalidate_cache()
+            for fname in recomputed_fields:
+                self.env.add_to_compute(Model._fields[fname], restored)
+            Model.recompute(recomputed_fields, restored)
+            self.env["pms.ari.change"]._register_changes(
+                restored._get_ari_cells(), **ARCHIVE_ARI_CHANGES[model_name]
+            )
+            if model_name == "product.pricelist.item":
+                restored._refresh_rate_grid_scopes(restored._get_rate_grid_scopes())
+        self.env["pms.property"]._invalidate_availability_cache()
+        return True
+
+    @api.model
+    def get_archived_data(self, res_model, res_id):
+        """
+        Values of an archived record, to audit it without restoring it.
+        """
+        record = self.search(
+            [("res_model", "=", res_model), ("res_id", "=", res_id)], limit=1
+        )
+        return json.loads(record.data) if record else {}
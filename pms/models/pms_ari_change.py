@@ -0,0 +1,187 @@
+# License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl).
+from odoo import api, fields, models
+
+
+class PmsAriChange(models.Model):
+    _name = "pms.ari.change"
+    _description = "Pending change of availability, rates or restrictions"
+    _order = "seq"
+    _check_pms_properties_auto = True
+
+    pms_property_id = fields.Many2one(
+        string="Property",
+        help="Property of the changed cell",
+        readonly=True,
+        required=True,
+        comodel_name="pms.property",
+        ondelete="cascade",
+        check_pms_properties=True,
+    )
+    room_type_id = fields.Many2one(
+        string="Room Type",
+        help="Room type of the changed cell",
+        readonly=True,
+        required=True,
+        comodel_name="pms.room.type",
+        ondelete="cascade",
+        check_pms_properties=True,
+    )
+    date = fields.Date(
+        string="Date",
+        help="Night of the changed cell",
+        readonly=True,
+        required=True,
+    )
+    availability_plan_id = fields.Many2one(
+        string="Availability Plan",
+        help="Availability plan of the changed cell; "
+        "if not set, the change applies to every plan",
+        readonly=True,
+        comodel_name="pms.availability.plan",
+        ondelete="cascade",
+        check_pms_properties=True,
+    )
+    avail_changed = fields.Boolean(
+        string="Availability Changed",
+        help="The rooms available or the plan availability of the cell changed",
+        readonly=True,
+    )
+    restrictions_changed = fields.Boolean(
+        string="Restrictions Changed",
+        help="The availability plan rule of the cell changed",
+        readonly=True,
+    )
+    price_changed = fields.Boolean(
+        string="Price Changed",
+        help="A pricelist item of the cell changed",
+        readonly=True,
+    )
+    seq = fields.Integer(
+        string="Sequence",
+        help="Increases every time the cell changes, "
+        "consumers acknowledge the changes they read with it",
+        readonly=True,
+    )
+
+    def init(self):
+        self._cr.execute("CREATE SEQUENCE IF NOT EXISTS pms_ari_change_seq")
+        self._cr.execute(
+            "SELECT indexname FROM pg_indexes WHERE indexname = %s",
+            ("pms_ari_change_cell_unique",),
+        )
+        if not self._cr.fetchone():
+            self._cr.execute(
+                "CREATE UNIQUE INDEX pms_ari_change_cell_unique \
+                ON pms_ari_change \
+                (pms_property_id, room_type_id, date, \
+                COALESCE(availability_plan_id, 0))"
+            )
+
+    @api.model
+    def _register_changes(self, cells, avail=False, restrictions=False, prices=False):
+        """
+        Add the changed cells to the outbox, coalesced with the pending
+        change of the same cell if any, in a single query.
+        :param cells: iterable of (pms_property_id, room_type_id, date,
+                      availability_plan_id or False)
+        """
+        cells = {cell for cell in cells if cell[0] and cell[1] and cell[2]}
+        if not cells:
+            return
+        property_ids, room_type_ids, dates, plan_ids = zip(*cells)
+        self.env.cr.execute(
+            """
+            INSERT INTO pms_ari_change (
+                pms_property_id, room_type_id, date, availability_plan_id,
+                avail_changed, restrictions_changed, price_changed, seq,
+                create_uid, create_date, write_uid, write_date
+            )
+            SELECT cell.pms_property_id, cell.room_type_id, cell.date,
+                cell.availability_plan_id,
+                %(avail)s, %(restrictions)s, %(prices)s,
+                nextval('pms_ari_change_seq'),
+                %(uid)s, now() at time zone 'UTC',
+                %(uid)s, now() at time zone 'UTC'
+            FROM unnest(
+                %(property_ids)s::int[], %(room_type_ids)s::int[],
+                %(dates)s::date[], %(plan_ids)s::int[]
+            ) AS cell(pms_property_id, room_type_id, date, availability_plan_id)
+            ON CONFLICT (
+                pms_property_id, room_type_id, date,
+                COALESCE(availability_plan_id, 0)
+            ) DO UPDATE SET
+                avail_changed =
+                    pms_ari_change.avail_changed OR EXCLUDED.avail_changed,
+                restrictions_changed =
+                    pms_ari_change.restrictions_changed
+                    OR EXCLUDED.restrictions_changed,
+                price_changed =
+                    pms_ari_change.price_changed OR EXCLUDED.price_changed,
+                seq = EXCLUDED.seq,
+                write_uid = EXCLUDED.write_uid,
+                write_date = EXCLUDED.write_date
+            """,
+            {
+                "avail": avail,
+                "restrictions": restrictions,
+                "prices": prices,
+                "uid": self.env.uid,
+                "property_ids": list(property_ids),
+                "room_type_ids": list(room_type_ids),
+                "dates": list(dates),
+                "plan_ids": [plan_id or None for plan_id in plan_ids],
+            },
+        )
+        self.invalidate_cache()
+
+    @api.model
+    def get_pending_changes(self, pms_property_id=False, limit=None):
+        """
+        Pending changes of the outbox, oldest first. The cost depends on the
+        number of changed cells, not on the size of the calendar.
+        :return: list of dicts with the cell, the changed flags and the
+                 id and seq to acknowledge them with acknowledge_changes()
+        """
+        # changes are registered when the modified records are flushed
+        self.env["base"].flush()
+        self.env.cr.execute(
+            """
+            SELECT id, seq, pms_property_id, room_type_id, date,
+                availability_plan_id, avail_changed, restrictions_changed,
+                price_changed
+            FROM pms_ari_change
+            WHERE %(pms_property_id)s IS NULL
+                OR pms_property_id = %(pms_property_id)s
+            ORDER BY seq
+            LIMIT %(limit)s
+            """,
+            {"pms_property_id": pms_property_id or None, "limit": limit},
+        )
+        return self.env.cr.dictfetchall()
+
+    @api.model
+    def acknowledge_changes(self, changes):
+        """
+        Remove from the outbox the changes consumed. Only the exact rows
+        read are removed: a cell that changed again after being read has a
+        new seq, and a change committed after the read by a transaction
+        that started before it may have a lower seq, so both stay pending.
+        :param changes: changes returned by get_pending_changes()
+        :return: number of acknowledged changes
+        """
+        if not changes:
+            return 0
+        self.env.cr.execute(
+            """
+            DELETE FROM pms_ari_change
+            USING unnest(%(ids)s::int[], %(seqs)s::int[]) AS ack(id, seq)
+            WHERE pms_ari_change.id = ack.id
+                AND pms_ari_change.seq = ack.seq
+            """,
+            {
+                "ids": [change["id"] for change in changes],
+                "seqs": [change["seq"] for change in changes],
+            },
+        )
+        self.invalidate_cache()
+        return self.env.cr.rowcount
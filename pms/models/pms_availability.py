@@ -97,168 +97,299 @@ class PmsAvailability(models.Model):
         "child_avail_ids.reservation_line_ids.occupies_availability",
     )
     def _compute_real_avail(self):
+        if not self:
+            return
+        room_type_ids = self.room_type_id.ids
+        pms_property_ids = self.pms_property_id.ids
+        query = self._get_blocked_rooms_query()
+        self.env.cr.execute(
+            """
+            SELECT room_type_id, pms_property_id, COUNT(id)
+            FROM   pms_room
+            WHERE  active = True
+               AND room_type_id = ANY(%s)
+               AND pms_property_id = ANY(%s)
+            GROUP  BY room_type_id, pms_property_id
+            """,
+            (room_type_ids, pms_property_ids),
+        )
+        total_rooms = {
+            (room_type_id, pms_property_id): count
+            for room_type_id, pms_property_id, count in self.env.cr.fetchall()
+        }
+        dates = self.mapped("date")
+        self.env.cr.execute(
+            query
+            + """
+            SELECT room.room_type_id, blocked.date, room.pms_property_id,
+                   COUNT(DISTINCT room.id)
+            FROM   blocked
+                   JOIN pms_room room ON room.id = blocked.room_id
+            WHERE  room.active = True
+               AND room.room_type_id = ANY(%(room_type_ids)s)
+            GROUP  BY room.room_type_id, blocked.date, room.pms_property_id
+            """,
+            {
+                "pms_property_ids": pms_property_ids,
+                "checkin": min(dates),
+                "checkout": max(dates) + datetime.timedelta(1),
+                "current_lines": [],
+                # holds are short-lived, the stored availability ignores them
+                "with_holds": False,
+                "hold_token": None,
+                "room_type_ids": room_type_ids,
+            },
+        )
+        rooms_not_avail = {
+            (room_type_id, date, pms_property_id): count
+            for room_type_id, date, pms_property_id, count in self.env.cr.fetchall()
+        }
         for record in self:
-            Rooms = self.env["pms.room"]
-            total_rooms = Rooms.search_count(
-                [
-                    ("room_type_id", "=", record.room_type_id.id),
-                    ("pms_property_id", "=", record.pms_property_id.id),
-                ]
-            )
-            room_ids = record.room_type_id.mapped("room_ids.id")
-            count_rooms_not_avail = len(
-                record.get_rooms_not_avail(
-                    checkin=record.date,
-                    checkout=record.date + datetime.timedelta(1),
-                    room_ids=room_ids,
-                    pms_property_id=record.pms_property_id.id,
-                )
+            record.real_avail = total_rooms.get(
+                (record.room_type_id.id, record.pms_property_id.id), 0
+            ) - rooms_not_avail.get(
+                (record.room_type_id.id, record.date, record.pms_property_id.id), 0
             )
-            record.real_avail = total_rooms - count_rooms_not_avail
 
     @api.depends("reservation_line_ids", "reservation_line_ids.room_id")
     def _compute_parent_avail_id(self):
+        parent_keys = {}
         for record in self:
-            parent_rooms = record.room_type_id.mapped("room_ids.parent_id.id")
+            parent_rooms = record.room_type_id.mapped("room_ids.parent_id")
             if parent_rooms:
-                for room_id in parent_rooms:
-                    room = self.env["pms.room"].browse(room_id)
-                    parent_avail = self.env["pms.availability"].search(
-                        [
-                            ("date", "=", record.date),
-                            ("room_type_id", "=", room.room_type_id.id),
-                            ("pms_property_id", "=", record.pms_property_id.id),
-                        ]
-                    )
-                    if parent_avail:
-                        record.parent_avail_id = parent_avail
-                    else:
-                        record.parent_avail_id = self.env["pms.availability"].create(
-                            {
-                                "date": record.date,
-                                "room_type_id": room.room_type_id.id,
-                                "pms_property_id": record.pms_property_id.id,
-                            }
-                        )
+                parent_keys[record] = (
+                    parent_rooms[-1].room_type_id.id,
+                    record.date,
+                    record.pms_property_id.id,
+                )
+        avail_ids = self._get_or_create_avails(list(parent_keys.values()))
+        for record in self:
+            if record in parent_keys:
+                record.parent_avail_id = avail_ids[parent_keys[record]]
             else:
                 record.parent_avail_id = False
 
     @api.depends("reservation_line_ids", "reservation_line_ids.room_id")
     def _compute_child_avail_ids(self):
+        child_keys = {}
         for record in self:
-            child_rooms = record.room_type_id.mapped("room_ids.child_ids.id")
+            child_rooms = record.room_type_id.mapped("room_ids.child_ids")
             if child_rooms:
-                for room_id in child_rooms:
-                    room = self.env["pms.room"].browse(room_id)
-                    child_avail = self.env["pms.availability"].search(
-                        [
-                            ("date", "=", record.date),
-                            ("room_type_id", "=", room.room_type_id.id),
-                            ("pms_property_id", "=", record.pms_property_id.id),
-                        ]
-                    )
-                    if child_avail:
-                        record.child_avail_ids = [(4, child_avail.id)]
-                    else:
-                        record.child_avail_ids = [
-                            (
-                                0,
-                                0,
-                                {
-                                    "date": record.date,
-                                    "room_type_id": room.room_type_id.id,
-                                    "pms_property_id": record.pms_property_id.id,
-                                },
-                            )
-                        ]
+                child_keys[record] = [
+                    (room_type_id, record.date, record.pms_property_id.id)
+                    for room_type_id in child_rooms.room_type_id.ids
+                ]
+        avail_ids = self._get_or_create_avails(
+            [key for keys in child_keys.values() for key in keys]
+        )
+        for record in self:
+            if record in child_keys:
+                record.child_avail_ids = [
+                    (4, avail_ids[key]) for key in child_keys[record]
+                ]
             else:
                 record.child_avail_ids = False
 
+    @api.model
+    def _get_or_create_avails(self, keys):
+        """
+        Get the availability records of the keys, creating the missing ones
+        with a single upsert, so that concurrent bookings creating the same
+        day never duplicate it: the later one is retried. When the calendar
+        is already materialized (see pms.property.materialize_availability)
+        this is a single read.
+        :param keys: iterable of (room_type_id, date, pms_property_id)
+        :return: dict {(room_type_id, date, pms_property_id): availability id}
+        """
+        keys = list(set(keys))
+        if not keys:
+            return {}
+        self.flush(["room_type_id", "date", "pms_property_id"])
+        avail_ids = self._read_avail_ids(keys)
+        missing_keys = [key for key in keys if key not in avail_ids]
+        if not missing_keys:
+            return avail_ids
+        room_type_ids, dates, pms_property_ids = zip(*missing_keys)
+        self.env.cr.execute(
+            """
+            INSERT INTO pms_availability
+                   (room_type_id, date, pms_property_id,
+                    create_uid, create_date, write_uid, write_date)
+            SELECT room_type_id, date, pms_property_id,
+                   %s, (now() at time zone 'UTC'),
+                   %s, (now() at time zone 'UTC')
+            FROM   unnest(%s::int[], %s::date[], %s::int[])
+                   AS k(room_type_id, date, pms_property_id)
+            ON CONFLICT (room_type_id, date, pms_property_id) DO NOTHING
+            RETURNING id, room_type_id, date, pms_property_id
+            """,
+            (
+                self.env.uid,
+                self.env.uid,
+                list(room_type_ids),
+                list(dates),
+                list(pms_property_ids),
+            ),
+        )
+        new_ids = []
+        for avail_id, room_type_id, date, pms_property_id in self.env.cr.fetchall():
+            avail_ids[(room_type_id, date, pms_property_id)] = avail_id
+            new_ids.append(avail_id)
+        missing_keys = [key for key in missing_keys if key not in avail_ids]
+        if missing_keys:
+            # skipped by the upsert, which only happens under READ COMMITTED.
+            # Under REPEATABLE READ, the isolation level of Odoo, a row that
+            # a concurrent transaction commits after our snapshot makes the
+            # upsert raise a serialization failure instead, and the request
+            # is retried by Odoo from the start
+            avail_ids.update(self._read_avail_ids(missing_keys))
+        if new_ids:
+            new_avails = self.browse(new_ids)
+            new_avails._check_property_integrity()
+            for fname in ("real_avail", "parent_avail_id", "child_avail_ids"):
+                self.env.add_to_compute(self._fields[fname], new_avails)
+        return avail_ids
+
+    @api.model
+    def _read_avail_ids(self, keys):
+        room_type_ids, dates, pms_property_ids = zip(*keys)
+        self.env.cr.execute(
+            """
+            SELECT avail.id, avail.room_type_id, avail.date, avail.pms_property_id
+            FROM   pms_availability avail
+                   JOIN unnest(%s::int[], %s::date[], %s::int[])
+                        AS k(room_type_id, date, pms_property_id)
+                        USING (room_type_id, date, pms_property_id)
+            """,
+            (list(room_type_ids), list(dates), list(pms_property_ids)),
+        )
+        return {
+            (room_type_id, date, pms_property_id): avail_id
+            for avail_id, room_type_id, date, pms_property_id in self.env.cr.fetchall()
+        }
+
     @api.model
     def get_rooms_not_avail(
         self, checkin, checkout, room_ids, pms_property_id, current_lines=False
     ):
-        RoomLines = self.env["pms.reservation.line"]
-        rooms = self.env["pms.room"].browse(room_ids)
-        occupied_room_ids = []
-        for room in rooms.filtered("parent_id"):
-            if self.get_occupied_parent_rooms(
-                room=room.parent_id,
-                checkin=checkin,
-                checkout=checkout,
-                pms_property_id=room.pms_property_id.id,
-            ):
-                occupied_room_ids.append(room.id)
-        for room in rooms.filtered("child_ids"):
-            if self.get_occupied_child_rooms(
-                rooms=room.child_ids,
+        if not room_ids:
+            return []
+        return list(
+            self.get_occupied_room_dates(
                 checkin=checkin,
                 checkout=checkout,
-                pms_property_id=room.pms_property_id.id,
-            ):
-                occupied_room_ids.append(room.id)
-        occupied_room_ids.extend(
-            RoomLines.search(
-                [
-                    ("date", ">=", checkin),
-                    ("date", "<=", checkout - datetime.timedelta(1)),
-                    ("room_id", "in", room_ids),
-                    ("pms_property_id", "=", pms_property_id),
-                    ("occupies_availability", "=", True),
-                    ("id", "not in", current_lines if current_lines else []),
-                ]
-            ).mapped("room_id.id")
+                pms_property_id=pms_property_id,
+                room_ids=room_ids,
+                current_lines=current_lines,
+            )
         )
-        return occupied_room_ids
 
     @api.model
-    def get_occupied_parent_rooms(self, room, checkin, checkout, pms_property_id):
-        RoomLines = self.env["pms.reservation.line"]
-        if (
-            RoomLines.search_count(
-                [
-                    ("date", ">=", checkin),
-                    ("date", "<=", checkout - datetime.timedelta(1)),
-                    ("room_id", "=", room.id),
-                    ("pms_property_id", "=", pms_property_id),
-                    ("occupies_availability", "=", True),
-                ]
-            )
-            > 0
-        ):
-            return True
-        if room.parent_id:
-            return self.get_occupied_parent_rooms(
-                room=room.parent_room_id,
-                checkin=checkin,
-                checkout=checkout,
+    def _get_blocked_rooms_query(self):
+        """
+        :return: recursive CTE with the (room_id, date) nights that can't be
+                 sold between %(checkin)s and %(checkout)s in the properties
+                 %(pms_property_ids)s, either because the room is occupied or
+                 because any of its ancestor or descendant rooms (shared rooms
+                 and their beds) is occupied. Lines in %(current_lines)s are
+                 ignored. Unexpired inventory holds also occupy their rooms
+                 when %(with_holds)s, except the ones of the token in the
+                 context key inventory_hold_token. The query must be completed
+                 selecting from "blocked".
+        """
+        self.env["pms.reservation.line"].flush(
+            ["room_id", "date", "pms_property_id", "occupies_availability"]
+        )
+        self.env["pms.room"].flush(
+            ["parent_id", "room_type_id", "pms_property_id", "active"]
+        )
+        # The hierarchy of rooms is walked up and down from every occupied
+        # room in the same query, whatever its depth; UNION discards the
+        # repeated rows, so the recursion ends even on cyclic hierarchies
+        return """
+            WITH RECURSIVE occupied AS (
+                SELECT line.room_id, line.date
+                FROM   pms_reservation_line line
+                WHERE  line.pms_property_id = ANY(%(pms_property_ids)s)
+                   AND line.occupies_availability = True
+                   AND line.room_id IS NOT NULL
+                   AND line.date >= %(checkin)s
+                   AND line.date < %(checkout)s
+                   AND NOT (line.id = ANY(%(current_lines)s))
+                UNION
+                SELECT hold.room_id, hold.date
+                FROM   pms_inventory_hold hold
+                WHERE  %(with_holds)s
+                   AND hold.pms_property_id = ANY(%(pms_property_ids)s)
+                   AND hold.date >= %(checkin)s
+                   AND hold.date < %(checkout)s
+                   AND hold.expiration_date > now() at time zone 'UTC'
+                   AND hold.token IS DISTINCT FROM %(hold_token)s
+            ), ancestors AS (
+                SELECT room.parent_id AS room_id, occupied.date
+                FROM   occupied
+                       JOIN pms_room room ON room.id = occupied.room_id
+                WHERE  room.parent_id IS NOT NULL
+                UNION
+                SELECT room.parent_id, ancestors.date
+                FROM   ancestors
+                       JOIN pms_room room ON room.id = ancestors.room_id
+                WHERE  room.parent_id IS NOT NULL
+            ), descendants AS (
+                SELECT room.id AS room_id, occupied.date
+                FROM   occupied
+                       JOIN pms_room room ON room.parent_id = occupied.room_id
+                UNION
+                SELECT room.id, descendants.date
+                FROM   descendants
+                       JOIN pms_room room ON room.parent_id = descendants.room_id
+            ), blocked AS (
+                SELECT room_id, date FROM occupied
+                UNION
+                SELECT room_id, date FROM ancestors
+                UNION
+                SELECT room_id, date FROM descendants
             )
-        return False
+        """
 
     @api.model
-    def get_occupied_child_rooms(self, rooms, checkin, checkout, pms_property_id):
-        RoomLines = self.env["pms.reservation.line"]
-        if (
-            RoomLines.search_count(
-                [
-                    ("date", ">=", checkin),
-                    ("date", "<=", checkout - datetime.timedelta(1)),
-                    ("room_id", "in", rooms.ids),
-                    ("pms_property_id", "=", pms_property_id),
-                    ("occupies_availability", "=", True),
-                ]
-            )
-            > 0
-        ):
-            return True
-        for room in rooms.filtered("child_ids"):
-            if self.get_occupied_child_rooms(
-                rooms=room.child_ids,
-                checkin=checkin,
-                checkout=checkout,
-            ):
-                return True
-        return False
+    def get_occupied_room_dates(
+        self, checkin, checkout, pms_property_id, room_ids=False, current_lines=False
+    ):
+        """
+        :return: dict {room_id: set of dates} with the nights between checkin
+                 and checkout in which each room of the property can't be sold,
+                 either because it is occupied or because any of its ancestor
+                 or descendant rooms (shared rooms and their beds) is occupied
+        """
+        query = self._get_blocked_rooms_query()
+        self.env.cr.execute(
+            query
+            + """
+            SELECT room_id, date
+            FROM   blocked
+            WHERE  %(all_rooms)s OR room_id = ANY(%(room_ids)s)
+            """,
+            {
+                "pms_property_ids": [pms_property_id],
+                "checkin": checkin,
+                "checkout": checkout,
+                # lines not yet saved can't occupy anything
+                "current_lines": [
+                    line_id
+                    for line_id in (current_lines or [])
+                    if isinstance(line_id, int)
+                ],
+                "all_rooms": not room_ids,
+                "room_ids": room_ids or [],
+                "with_holds": True,
+                "hold_token": self.env.context.get("inventory_hold_token"),
+            },
+        )
+        not_avail = {}
+        for room_id, date in self.env.cr.fetchall():
+            not_avail.setdefault(room_id, set()).add(date)
+        return not_avail
 
     @api.constrains(
         "room_type_id",
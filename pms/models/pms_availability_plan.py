@@ -48,6 +48,14 @@ class PmsAvailabilityPlan(models.Model):
         inverse_name="availability_plan_id",
         check_pms_properties=True,
     )
+    range_rule_ids = fields.One2many(
+        string="Date Range Rules",
+        help="Rules of the availability plan for every day of a date range; "
+        "the daily rules of a day replace them",
+        comodel_name="pms.availability.plan.range.rule",
+        inverse_name="availability_plan_id",
+        check_pms_properties=True,
+    )
 
     active = fields.Boolean(
         string="Active",
@@ -80,53 +88,289 @@ class PmsAvailabilityPlan(models.Model):
             ]
         )
 
-    @api.model
-    def update_quota(self, pricelist_id, room_type_id, date, impacts_quota_id=False):
-        if pricelist_id and room_type_id and date:
-            rule = self.env["pms.availability.plan.rule"].search(
-                [
-                    ("availability_plan_id.pms_pricelist_ids", "=", pricelist_id.id),
-                    ("room_type_id", "=", room_type_id.id),
-                    ("date", "=", date),
-                ]
+    def get_rule_restrictions(
+        self, checkin, checkout, pms_property_id, room_type_ids=False
+    ):
+        """
+        SQL version of any_rule_applies: evaluates in a single query all the
+        rules of the plan between checkin and checkout (both included). The
+        days without a daily rule take the range rule that covers them, with
+        the real availability as plan availability.
+        :return: list of (room_type_id, date, applies, plan_avail) with one
+                 row per rule and day, applies being True if the rule doesn't
+                 allow to sell the stay (min/max stay, closed, closed arrival
+                 or departure, or no quota/max avail left)
+        """
+        self.ensure_one()
+        if isinstance(checkin, str):
+            checkin = datetime.datetime.strptime(
+                checkin, DEFAULT_SERVER_DATE_FORMAT
+            ).date()
+        if isinstance(checkout, str):
+            checkout = datetime.datetime.strptime(
+                checkout, DEFAULT_SERVER_DATE_FORMAT
+            ).date()
+        self.env["pms.availability.plan.rule"].flush()
+        self.env["pms.availability.plan.range.rule"].flush()
+        self.env["pms.availability"].flush(["real_avail"])
+        self.env.cr.execute(
+            """
+            WITH cell AS (
+                SELECT rule.room_type_id, rule.date,
+                       rule.min_stay, rule.min_stay_arrival,
+                       rule.max_stay, rule.max_stay_arrival, rule.closed,
+                       rule.closed_arrival, rule.closed_departure,
+                       rule.quota, rule.max_avail,
+                       COALESCE(rule.plan_avail, 0) AS plan_avail
+                FROM   pms_availability_plan_rule rule
+                WHERE  rule.availability_plan_id = %(plan_id)s
+                   AND rule.pms_property_id = %(pms_property_id)s
+                   AND rule.date >= %(checkin)s
+                   AND rule.date <= %(checkout)s
+                   AND (%(all_room_types)s
+                        OR rule.room_type_id = ANY(%(room_type_ids)s))
+                UNION ALL
+                (
+                SELECT DISTINCT ON (range_rule.room_type_id, night.date)
+                       range_rule.room_type_id, night.date::date,
+                       range_rule.min_stay, range_rule.min_stay_arrival,
+                       range_rule.max_stay, range_rule.max_stay_arrival,
+                       range_rule.closed, range_rule.closed_arrival,
+                       range_rule.closed_departure,
+                       -1, -1,
+                       COALESCE(
+                           avail.real_avail,
+                           (SELECT COUNT(*)
+                            FROM   pms_room room
+                            WHERE  room.active = True
+                               AND room.room_type_id = range_rule.room_type_id
+                               AND room.pms_property_id = %(pms_property_id)s)
+                       )
+                FROM   pms_availability_plan_range_rule range_rule
+                       CROSS JOIN LATERAL generate_series(
+                           GREATEST(range_rule.date_from, %(checkin)s::date),
+                           LEAST(range_rule.date_to, %(checkout)s::date),
+                           interval '1 day'
+                       ) AS night(date)
+                       LEFT JOIN pms_availability avail
+                            ON  avail.room_type_id = range_rule.room_type_id
+                            AND avail.date = night.date::date
+                            AND avail.pms_property_id = range_rule.pms_property_id
+                WHERE  range_rule.availability_plan_id = %(plan_id)s
+                   AND range_rule.pms_property_id = %(pms_property_id)s
+                   AND range_rule.date_from <= %(checkout)s
+                   AND range_rule.date_to >= %(checkin)s
+                   AND (%(all_room_types)s
+                        OR range_rule.room_type_id = ANY(%(room_type_ids)s))
+                   /* the daily rule of a day replaces the range rules */
+                   AND NOT EXISTS (
+                        SELECT 1
+                        FROM   pms_availability_plan_rule rule
+                        WHERE  rule.availability_plan_id
+                               = range_rule.availability_plan_id
+                           AND rule.room_type_id = range_rule.room_type_id
+                           AND rule.date = night.date::date
+                           AND rule.pms_property_id = range_rule.pms_property_id
+                   )
+                ORDER  BY range_rule.room_type_id, night.date,
+                          range_rule.date_to - range_rule.date_from,
+                          range_rule.id DESC
+                )
             )
-            # applies a rule
-            if rule:
-                rule.ensure_one()
-                if rule and rule.quota != -1 and rule.quota > 0:
-
-                    # the line has no rule item applied before
-                    if not impacts_quota_id:
-                        rule.quota -= 1
-                        return rule.id
-
-                    # the line has a rule item applied before
-                    elif impacts_quota_id != rule.id:
+            SELECT cell.room_type_id, cell.date,
+                   (
+                    (COALESCE(cell.max_stay, 0) > 0
+                     AND cell.max_stay < %(stay)s)
+                    OR (COALESCE(cell.min_stay, 0) > 0
+                        AND cell.min_stay > %(stay)s)
+                    OR (COALESCE(cell.max_stay_arrival, 0) > 0
+                        AND cell.max_stay_arrival < %(stay)s
+                        AND cell.date = %(checkin)s)
+                    OR (COALESCE(cell.min_stay_arrival, 0) > 0
+                        AND cell.min_stay_arrival > %(stay)s
+                        AND cell.date = %(checkin)s)
+                    OR COALESCE(cell.closed, False)
+                    OR (COALESCE(cell.closed_arrival, False)
+                        AND cell.date = %(checkin)s)
+                    OR (COALESCE(cell.closed_departure, False)
+                        AND cell.date = %(checkout)s)
+                    OR COALESCE(cell.quota, 0) = 0
+                    OR COALESCE(cell.max_avail, 0) = 0
+                   ) AS applies,
+                   cell.plan_avail
+            FROM   cell
+            """,
+            {
+                "stay": (checkout - checkin).days,
+                "checkin": checkin,
+                "checkout": checkout,
+                "plan_id": self.id,
+                "pms_property_id": pms_property_id,
+                "all_room_types": not room_type_ids,
+                "room_type_ids": room_type_ids or [],
+            },
+        )
+        return self.env.cr.fetchall()
 
-                        # decrement quota on current rule item
-                        rule.quota -= 1
+    def get_blocked_room_type_ids(
+        self, checkin, checkout, pms_property_id, room_type_ids=False
+    ):
+        """
+        :return: ids of the room types that can't be sold between checkin
+                 and checkout because of the rules of the plan
+        """
+        return list(
+            {
+                room_type_id
+                for room_type_id, _date, applies, _plan_avail in (
+                    self.get_rule_restrictions(
+                        checkin, checkout, pms_property_id, room_type_ids
+                    )
+                )
+                if applies
+            }
+        )
 
-                        # check old rule item
-                        old_rule = self.env["pms.availability.plan.rule"].search(
-                            [("id", "=", impacts_quota_id)]
-                        )
+    @api.model
+    def update_quota(
+        self,
+        pricelist_id,
+        room_type_id,
+        date,
+        impacts_quota_id=False,
+        pms_property_id=False,
+    ):
+        return self.update_quotas(
+            [
+                (
+                    pricelist_id.id,
+                    room_type_id.id,
+                    date,
+                    pms_property_id,
+                    impacts_quota_id,
+                )
+            ]
+        )[0]
 
-                        # restore quota in old rule item
-                        if old_rule:
-                            old_rule.quota += 1
+    @api.model
+    def update_quotas(self, quota_lines):
+        """
+        Batched and atomic quota accounting of reservation nights. Each night
+        takes a unit of the quota of the rule of the availability plan of its
+        pricelist, and gives back the unit of the rule it took before if the
+        rule changes. Units are given back and taken with single UPDATEs that
+        lock the rules and only take from rules with quota left, so two
+        concurrent bookings can never take the same last unit.
+        :param quota_lines: list of (pricelist_id, room_type_id, date,
+                            pms_property_id or False, impacts_quota_id or
+                            False), one per night
+        :return: list with the rule id (or False) that each night takes
+                 quota from, in the same order
+        """
+        Rule = self.env["pms.availability.plan.rule"]
+        result = [False] * len(quota_lines)
+        if not quota_lines:
+            return result
+        Rule.flush(
+            [
+                "quota",
+                "availability_plan_id",
+                "room_type_id",
+                "date",
+                "pms_property_id",
+            ]
+        )
+        self.env["product.pricelist"].flush(["availability_plan_id"])
+        pricelist_ids, room_type_ids, dates, property_ids, old_rule_ids = zip(
+            *quota_lines
+        )
+        self.env.cr.execute(
+            """
+            SELECT night.idx, rule.id
+            FROM   unnest(
+                       %(pricelist_ids)s::int[], %(room_type_ids)s::int[],
+                       %(dates)s::date[], %(property_ids)s::int[]
+                   ) WITH ORDINALITY
+                   AS night(pricelist_id, room_type_id, date, pms_property_id, idx)
+            JOIN   product_pricelist pricelist
+                   ON pricelist.id = night.pricelist_id
+            JOIN   pms_availability_plan_rule rule
+                   ON  rule.availability_plan_id = pricelist.availability_plan_id
+                   AND rule.room_type_id = night.room_type_id
+                   AND rule.date = night.date
+                   AND (
+                       night.pms_property_id IS NULL
+                       OR rule.pms_property_id = night.pms_property_id
+                   )
+            """,
+            {
+                "pricelist_ids": [x or None for x in pricelist_ids],
+                "room_type_ids": [x or None for x in room_type_ids],
+                "dates": [x or None for x in dates],
+                "property_ids": [x or None for x in property_ids],
+            },
+        )
+        # ordinality starts at 1
+        new_rule_ids = {idx - 1: rule_id for idx, rule_id in self.env.cr.fetchall()}
 
-                        return rule.id
+        to_release = {}
+        to_take = {}
+        for idx, old_rule_id in enumerate(old_rule_ids):
+            new_rule_id = new_rule_ids.get(idx, False)
+            if old_rule_id and old_rule_id == new_rule_id:
+                result[idx] = old_rule_id
+                continue
+            if old_rule_id:
+                to_release[old_rule_id] = to_release.get(old_rule_id, 0) + 1
+            if new_rule_id:
+                to_take.setdefault(new_rule_id, []).append(idx)
+        if not to_release and not to_take:
+            return result
 
-        # in any case, check old rule item
-        if impacts_quota_id:
-            old_rule = self.env["pms.availability.plan.rule"].search(
-                [("id", "=", impacts_quota_id)]
+        # units are given back first, so that they can be taken again
+        if to_release:
+            self.env.cr.execute(
+                """
+                UPDATE pms_availability_plan_rule rule
+                SET    quota = rule.quota + release.units
+                FROM   unnest(%s::int[], %s::int[]) AS release(id, units)
+                WHERE  rule.id = release.id
+                   AND rule.quota >= 0
+                """,
+                (list(to_release), list(to_release.values())),
+            )
+        if to_take:
+            self.env.cr.execute(
+                """
+                WITH locked AS (
+                    SELECT rule.id, rule.quota,
+                           LEAST(rule.quota, take.units) AS units
+                    FROM   pms_availability_plan_rule rule
+                    JOIN   unnest(%s::int[], %s::int[]) AS take(id, units)
+                           ON take.id = rule.id
+                    WHERE  rule.quota > 0
+                    FOR UPDATE OF rule
+                )
+                UPDATE pms_availability_plan_rule rule
+                SET    quota = locked.quota - locked.units
+                FROM   locked
+                WHERE  rule.id = locked.id
+                RETURNING rule.id, locked.units
+                """,
+                (list(to_take), [len(idxs) for idxs in to_take.values()]),
             )
-            # and restore quota in old rule item
-            if old_rule:
-                old_rule.quota += 1
+            for rule_id, units in self.env.cr.fetchall():
+                for idx in to_take[rule_id][:units]:
+                    result[idx] = rule_id
 
-        return False
+        rules = Rule.browse(set(to_release) | set(to_take))
+        rules.invalidate_cache(["quota"])
+        rules.modified(["quota"])
+        self.env["pms.property"]._invalidate_availability_cache(
+            rules.mapped("pms_property_id").ids
+        )
+        self.env["pms.ari.change"]._register_changes(rules._get_ari_cells(), avail=True)
+        return result
 
     # Action methods
     def open_massive_changes_wizard(self):
@@ -0,0 +1,191 @@
+# License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl).
+from odoo import _, api, fields, models
+from odoo.exceptions import ValidationError
+
+
+class PmsAvailabilityPlanRangeRule(models.Model):
+    """
+    Restrictions of a room type for every day of a date range, stored as a
+    single row. A range rule has no quota: on its days, the plan
+    availability is the real one.
+
+    Precedence: the daily rule (pms.availability.plan.rule) of a day, if
+    any, replaces the range rules of that day. Among the range rules that
+    cover a day, the shortest range wins, then the newest one. A daily rule
+    created by _upsert_rules over a range rule starts from its restrictions.
+    """
+
+    _name = "pms.availability.plan.range.rule"
+    _description = "Reservation rule by date range"
+    _order = "date_from, room_type_id"
+    _check_pms_properties_auto = True
+
+    availability_plan_id = fields.Many2one(
+        string="Availability Plan",
+        help="The availability plan that include the rule",
+        required=True,
+        comodel_name="pms.availability.plan",
+        ondelete="cascade",
+        check_pms_properties=True,
+    )
+    room_type_id = fields.Many2one(
+        string="Room Type",
+        help="Room type for which the rule is applied",
+        required=True,
+        comodel_name="pms.room.type",
+        ondelete="cascade",
+        check_pms_properties=True,
+    )
+    pms_property_id = fields.Many2one(
+        string="Property",
+        help="Properties with access to the element",
+        ondelete="restrict",
+        required=True,
+        comodel_name="pms.property",
+        check_pms_properties=True,
+    )
+    date_from = fields.Date(
+        string="From",
+        help="First day of the rule",
+        required=True,
+    )
+    date_to = fields.Date(
+        string="To",
+        help="Last day of the rule",
+        required=True,
+    )
+    min_stay = fields.Integer(
+        string="Min. Stay",
+        help="Minimum stay",
+        default=0,
+    )
+    min_stay_arrival = fields.Integer(
+        string="Min. Stay Arrival",
+        help="Minimum stay if checkin is that day",
+        default=0,
+    )
+    max_stay = fields.Integer(
+        string="Max. Stay",
+        help="Maximum stay",
+        default=0,
+    )
+    max_stay_arrival = fields.Integer(
+        string="Max. Stay Arrival",
+        help="Maximum stay if checkin is that day",
+        default=0,
+    )
+    closed = fields.Boolean(
+        string="Closed",
+        help="Indicate if property is closed or not",
+        default=False,
+    )
+    closed_departure = fields.Boolean(
+        string="Closed Departure",
+        help="Indicate if the checkout is not allowed",
+        default=False,
+    )
+    closed_arrival = fields.Boolean(
+        string="Closed Arrival",
+        help="Indicate if the checkin is not allowed",
+        default=False,
+    )
+
+    def init(self):
+        self._cr.execute(
+            "SELECT indexname FROM pg_indexes WHERE indexname = %s",
+            ("pms_availability_plan_range_rule_lookup_index",),
+        )
+        if not self._cr.fetchone():
+            self._cr.execute(
+                "CREATE INDEX pms_availability_plan_range_rule_lookup_index \
+                ON pms_availability_plan_range_rule \
+                (availability_plan_id, pms_property_id, room_type_id, \
+                date_from, date_to)"
+            )
+
+    # ORM Overrides
+    @api.model_create_multi
+    def create(self, vals_list):
+        records = super().create(vals_list)
+        self.env["pms.property"]._invalidate_availability_cache(
+            records.mapped("pms_property_id").ids
+        )
+        self.env["pms.ari.change"]._register_changes(
+            records._get_ari_cells(), restrictions=True
+        )
+        return records
+
+    def _write(self, vals):
+        pms_property_ids = self.mapped("pms_property_id").ids
+        if vals.get("pms_property_id"):
+            pms_property_ids.append(vals["pms_property_id"])
+        self.env["pms.property"]._invalidate_availability_cache(pms_property_ids)
+        cells = self._get_ari_cells()
+        res = super()._write(vals)
+        self.env["pms.ari.change"]._register_changes(
+            cells | self._get_ari_cells(), restrictions=True
+        )
+        return res
+
+    def unlink(self):
+        cells = self._get_ari_cells()
+        pms_property_ids = self.mapped("pms_property_id").ids
+        res = super().unlink()
+        self.env["pms.property"]._invalidate_availability_cache(pms_property_ids)
+        self.env["pms.ari.change"]._register_changes(cells, restrictions=True)
+        return res
+
+    def _get_ari_cells(self):
+        """
+        Cells (property, room type, date, plan) of every day of the rules
+        as stored in the database.
+        """
+        self.env.cr.execute(
+            """
+            SELECT rule.pms_property_id, rule.room_type_id, night.date::date,
+                   rule.availability_plan_id
+            FROM   pms_availability_plan_range_rule rule
+                   CROSS JOIN LATERAL generate_series(
+                       rule.date_from, rule.date_to, interval '1 day'
+                   ) AS night(date)
+            WHERE  rule.id = ANY(%s)
+            """,
+            (self.ids,),
+        )
+        return set(self.env.cr.fetchall())
+
+    @api.constrains("date_from", "date_to")
+    def _check_dates(self):
+        for record in self:
+            if record.date_from > record.date_to:
+                raise ValidationError(
+                    _("The last day of a rule can't be before its first day")
+                )
+
+    @api.constrains("min_stay", "min_stay_arrival", "max_stay", "max_stay_arrival")
+    def _check_min_max_stay(self):
+        for record in self:
+            if (
+                min(
+                    record.min_stay,
+                    record.min_stay_arrival,
+                    record.max_stay,
+                    record.max_stay_arrival,
+                )
+                < 0
+            ):
+                raise ValidationError(_("The stays of a rule can't be less than zero"))
+            if (
+                record.min_stay
+                and record.max_stay
+                and record.min_stay > record.max_stay
+            ):
+                raise ValidationError(_("Max. Stay can't be less than Min. Stay"))
+            if (
+                record.min_stay_arrival
+                and record.max_stay_arrival
+                and record.min_stay_arrival > record.max_stay_arrival
+            ):
+                raise ValidationError(
+                    _("Max. Stay Arrival can't be less than Min. Stay Arrival")
+                )
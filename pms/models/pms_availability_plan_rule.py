@@ -3,6 +3,21 @@
 from odoo import _, api, fields, models
 from odoo.exceptions import ValidationError
 
+# fields of the rules that change the plan availability of their cell
+RULE_AVAIL_FIELDS = ["quota", "max_avail", "plan_avail", "real_avail", "avail_id"]
+# fields of the rules set by _upsert_rules and their column types
+RULE_UPSERT_FIELDS = {
+    "min_stay": "int",
+    "min_stay_arrival": "int",
+    "max_stay": "int",
+    "max_stay_arrival": "int",
+    "closed": "boolean",
+    "closed_arrival": "boolean",
+    "closed_departure": "boolean",
+    "quota": "int",
+    "max_avail": "int",
+}
+
 
 class PmsAvailabilityPlanRule(models.Model):
     _name = "pms.availability.plan.rule"
@@ -117,25 +132,17 @@ class PmsAvailabilityPlanRule(models.Model):
 
     @api.depends("room_type_id", "date", "pms_property_id")
     def _compute_avail_id(self):
+        avail_keys = {
+            record: (record.room_type_id.id, record.date, record.pms_property_id.id)
+            for record in self
+            if record.room_type_id and record.pms_property_id and record.date
+        }
+        avail_ids = self.env["pms.availability"]._get_or_create_avails(
+            avail_keys.values()
+        )
         for record in self:
-            if record.room_type_id and record.pms_property_id and record.date:
-                avail = self.env["pms.availability"].search(
-                    [
-                        ("date", "=", record.date),
-                        ("room_type_id", "=", record.room_type_id.id),
-                        ("pms_property_id", "=", record.pms_property_id.id),
-                    ]
-                )
-                if avail:
-                    record.avail_id = avail.id
-                else:
-                    record.avail_id = self.env["pms.availability"].create(
-                        {
-                            "date": record.date,
-                            "room_type_id": record.room_type_id.id,
-                            "pms_property_id": record.pms_property_id.id,
-                        }
-                    )
+            if record in avail_keys:
+                record.avail_id = avail_ids[avail_keys[record]]
             else:
                 record.avail_id = False
 
@@ -165,6 +172,220 @@ class PmsAvailabilityPlanRule(models.Model):
             if not record.max_avail:
                 record.max_avail = record.room_type_id.default_max_avail
 
+    # ORM Overrides
+    @api.model_create_multi
+    def create(self, vals_list):
+        records = super().create(vals_list)
+        self.env["pms.property"]._invalidate_availability_cache(
+            records.mapped("pms_property_id").ids
+        )
+        self.env["pms.ari.change"]._register_changes(
+            records._get_ari_cells(), avail=True, restrictions=True
+        )
+        return records
+
+    def _write(self, vals):
+        pms_property_ids = self.mapped("pms_property_id").ids
+        if vals.get("pms_property_id"):
+            pms_property_ids.append(vals["pms_property_id"])
+        self.env["pms.property"]._invalidate_availability_cache(pms_property_ids)
+        cells = self._get_ari_cells()
+        res = super()._write(vals)
+        self.env["pms.ari.change"]._register_changes(
+            cells | self._get_ari_cells(),
+            avail=bool(set(vals) & set(RULE_AVAIL_FIELDS)),
+            restrictions=bool(set(vals) - set(RULE_AVAIL_FIELDS)),
+        )
+        return res
+
+    def unlink(self):
+        cells = self._get_ari_cells()
+        pms_property_ids = self.mapped("pms_property_id").ids
+        res = super().unlink()
+        self.env["pms.property"]._invalidate_availability_cache(pms_property_ids)
+        self.env["pms.ari.change"]._register_changes(
+            cells, avail=True, restrictions=True
+        )
+        return res
+
+    @api.model
+    def _get_range_rules_vals(self, keys, fnames):
+        """
+        Values of the range rules that apply to the days of the keys, read
+        with a single query.
+        :param keys: iterable of (availability_plan_id, room_type_id, date,
+                     pms_property_id)
+        :return: dict {key: {field name: value}} of the keys covered by a
+                 range rule
+        """
+        keys = list(keys)
+        if not keys:
+            return {}
+        plan_ids, room_type_ids, dates, pms_property_ids = zip(*keys)
+        self.env["pms.availability.plan.range.rule"].flush()
+        self.env.cr.execute(
+            """
+            SELECT cell.availability_plan_id, cell.room_type_id, cell.date,
+                   cell.pms_property_id, %s
+            FROM   unnest(
+                       %%(plan_ids)s::int[], %%(room_type_ids)s::int[],
+                       %%(dates)s::date[], %%(pms_property_ids)s::int[]
+                   ) AS cell(
+                       availability_plan_id, room_type_id, date, pms_property_id
+                   )
+            JOIN   LATERAL (
+                       SELECT range_rule.*
+                       FROM   pms_availability_plan_range_rule range_rule
+                       WHERE  range_rule.availability_plan_id
+                              = cell.availability_plan_id
+                          AND range_rule.room_type_id = cell.room_type_id
+                          AND range_rule.pms_property_id = cell.pms_property_id
+                          AND range_rule.date_from <= cell.date
+                          AND range_rule.date_to >= cell.date
+                       ORDER  BY range_rule.date_to - range_rule.date_from,
+                                 range_rule.id DESC
+                       LIMIT  1
+                   ) range_rule ON True
+            """
+            % ", ".join("range_rule.%s" % fname for fname in fnames),
+            {
+                "plan_ids": list(plan_ids),
+                "room_type_ids": list(room_type_ids),
+                "dates": list(dates),
+                "pms_property_ids": list(pms_property_ids),
+            },
+        )
+        return {
+            tuple(row[:4]): dict(zip(fnames, row[4:])) for row in self.env.cr.fetchall()
+        }
+
+    def _upsert_rules(self, rules_vals, update_fields):
+        """
+        Create the missing rules and update the existing ones in a single
+        query, relying on the unique key of the rules.
+        :param rules_vals: dict {(availability_plan_id, room_type_id, date,
+                           pms_property_id): vals}, vals having a value for
+                           every field of RULE_UPSERT_FIELDS
+        :param update_fields: fields written on the rules that already exist,
+                              the other ones keep their values; on the rules
+                              created over a range rule, they take the values
+                              of the range rule
+        :return: the created and updated rules
+        """
+        if not rules_vals:
+            return self.browse()
+        update_fields = [
+            fname for fname in RULE_UPSERT_FIELDS if fname in update_fields
+        ]
+        self.flush()
+        range_fields = self.env["pms.availability.plan.range.rule"]._fields
+        kept_fields = [
+            fname
+            for fname in RULE_UPSERT_FIELDS
+            if fname not in update_fields and fname in range_fields
+        ]
+        if kept_fields:
+            # a new daily rule replaces the range rule of its day, so it
+            # keeps the restrictions that are not being changed
+            range_rules_vals = self._get_range_rules_vals(rules_vals, kept_fields)
+            rules_vals = {
+                key: dict(vals, **range_rules_vals.get(key, {}))
+                for key, vals in rules_vals.items()
+            }
+        avail_ids = self.env["pms.availability"]._get_or_create_avails(
+            (room_type_id, date, pms_property_id)
+            for _plan_id, room_type_id, date, pms_property_id in rules_vals
+        )
+        keys = list(rules_vals)
+        plan_ids, room_type_ids, dates, pms_property_ids = zip(*keys)
+        params = {
+            "plan_ids": list(plan_ids),
+            "room_type_ids": list(room_type_ids),
+            "dates": list(dates),
+            "pms_property_ids": list(pms_property_ids),
+            "avail_ids": [avail_ids[key[1:]] for key in keys],
+            "uid": self.env.uid,
+        }
+        for fname in RULE_UPSERT_FIELDS:
+            params[fname] = [rules_vals[key][fname] for key in keys]
+        self.env.cr.execute(
+            """
+            INSERT INTO pms_availability_plan_rule (
+                availability_plan_id, room_type_id, date, pms_property_id,
+                avail_id, %(columns)s,
+                create_uid, create_date, write_uid, write_date
+            )
+            SELECT rule.*, %%(uid)s, now() at time zone 'UTC',
+                   %%(uid)s, now() at time zone 'UTC'
+            FROM   unnest(
+                       %%(plan_ids)s::int[], %%(room_type_ids)s::int[],
+                       %%(dates)s::date[], %%(pms_property_ids)s::int[],
+                       %%(avail_ids)s::int[], %(arrays)s
+                   ) AS rule(
+                       availability_plan_id, room_type_id, date,
+                       pms_property_id, avail_id, %(columns)s
+                   )
+            ON CONFLICT (availability_plan_id, room_type_id, date, pms_property_id)
+            DO UPDATE SET %(updates)s
+            RETURNING id, xmax = 0 AS inserted
+            """
+            % {
+                "columns": ", ".join(RULE_UPSERT_FIELDS),
+                "arrays": ", ".join(
+                    "%%(%s)s::%s[]" % (fname, column_type)
+                    for fname, column_type in RULE_UPSERT_FIELDS.items()
+                ),
+                "updates": ", ".join(
+                    ["%s = EXCLUDED.%s" % (fname, fname) for fname in update_fields]
+                    + ["write_uid = EXCLUDED.write_uid"]
+                    + ["write_date = EXCLUDED.write_date"]
+                ),
+            },
+            params,
+        )
+        rows = self.env.cr.fetchall()
+        new_rules = self.browse([rule_id for rule_id, inserted in rows if inserted])
+        updated_rules = self.browse(
+            [rule_id for rule_id, inserted in rows if not inserted]
+        )
+        new_rules._check_pms_properties()
+        updated_rules.invalidate_cache(update_fields + ["write_uid", "write_date"])
+        updated_rules.modified(update_fields)
+        # the plan availability of all the rules is computed in batch
+        for fname in ("real_avail", "plan_avail"):
+            self.env.add_to_compute(self._fields[fname], new_rules)
+        self.recompute(["real_avail", "plan_avail"])
+        (new_rules | updated_rules)._check_min_max_stay()
+
+        self.env["pms.property"]._invalidate_availability_cache(
+            list({pms_property_id for *_key, pms_property_id in rules_vals})
+        )
+        self.env["pms.ari.change"]._register_changes(
+            new_rules._get_ari_cells(), avail=True, restrictions=True
+        )
+        if update_fields:
+            self.env["pms.ari.change"]._register_changes(
+                updated_rules._get_ari_cells(),
+                avail=bool(set(update_fields) & set(RULE_AVAIL_FIELDS)),
+                restrictions=bool(set(update_fields) - set(RULE_AVAIL_FIELDS)),
+            )
+        return new_rules | updated_rules
+
+    def _get_ari_cells(self):
+        """
+        Cells (property, room type, date, plan) of the rules as stored
+        in the database.
+        """
+        self.env.cr.execute(
+            """
+            SELECT pms_property_id, room_type_id, date, availability_plan_id
+            FROM pms_availability_plan_rule
+            WHERE id = ANY(%s)
+            """,
+            (self.ids,),
+        )
+        return set(self.env.cr.fetchall())
+
     @api.constrains("min_stay", "min_stay_arrival", "max_stay", "max_stay_arrival")
     def _check_min_max_stay(self):
         for record in self:
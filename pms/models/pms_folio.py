@@ -1139,18 +1139,28 @@ class PmsFolio(models.Model):
             if not record.partner_name:
                 raise models.ValidationError(_("You must assign a customer name"))
 
-    @api.model
-    def create(self, vals):
-        if vals.get("name", _("New")) == _("New") or "name" not in vals:
-            pms_property_id = (
-                self.env.user.get_active_property_ids()[0]
-                if "pms_property_id" not in vals
-                else vals["pms_property_id"]
-            )
+    @api.model_create_multi
+    def create(self, vals_list):
+        vals_by_property = {}
+        for vals in vals_list:
+            if vals.get("name", _("New")) == _("New") or "name" not in vals:
+                pms_property_id = (
+                    self.env.user.get_active_property_ids()[0]
+                    if "pms_property_id" not in vals
+                    else vals["pms_property_id"]
+                )
+                vals_by_property.setdefault(pms_property_id, []).append(vals)
+        # the names of each property are allocated in a block
+        for pms_property_id, property_vals_list in vals_by_property.items():
             pms_property = self.env["pms.property"].browse(pms_property_id)
-            vals["name"] = pms_property.folio_sequence_id._next_do()
-        result = super(PmsFolio, self).create(vals)
-        result.access_token = result._portal_ensure_token()
+            names = pms_property.folio_sequence_id._next_do_batch(
+                len(property_vals_list)
+            )
+            for vals, name in zip(property_vals_list, names):
+                vals["name"] = name
+        result = super(PmsFolio, self).create(vals_list)
+        for record in result:
+            record.access_token = record._portal_ensure_token()
         return result
 
     def action_pay(self):
@@ -0,0 +1,192 @@
+# License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl).
+import datetime
+import uuid
+
+from odoo import _, api, fields, models
+from odoo.exceptions import ValidationError
+
+# minutes a hold keeps its rooms when no ttl is given
+DEFAULT_HOLD_MINUTES = 15
+
+
+class PmsInventoryHold(models.Model):
+    _name = "pms.inventory.hold"
+    _description = "Short-lived hold of a room night"
+    _order = "expiration_date"
+    _check_pms_properties_auto = True
+
+    token = fields.Char(
+        string="Token",
+        help="Identifies the holds taken together for the same booking",
+        readonly=True,
+        required=True,
+        index=True,
+    )
+    pms_property_id = fields.Many2one(
+        string="Property",
+        help="Property of the held room",
+        readonly=True,
+        required=True,
+        comodel_name="pms.property",
+        ondelete="cascade",
+        check_pms_properties=True,
+    )
+    room_id = fields.Many2one(
+        string="Room",
+        help="Held room",
+        readonly=True,
+        required=True,
+        comodel_name="pms.room",
+        ondelete="cascade",
+        check_pms_properties=True,
+    )
+    date = fields.Date(
+        string="Date",
+        help="Held night",
+        readonly=True,
+        required=True,
+    )
+    expiration_date = fields.Datetime(
+        string="Expiration Date",
+        help="After this moment the hold doesn't take availability any more "
+        "and it is removed by the sweep cron",
+        readonly=True,
+        required=True,
+        index=True,
+    )
+    user_id = fields.Many2one(
+        string="User",
+        help="User who took the hold",
+        readonly=True,
+        comodel_name="res.users",
+        default=lambda self: self.env.user,
+    )
+
+    _sql_constraints = [
+        (
+            "room_date_unique",
+            "unique(room_id, date)",
+            "The room is already held for that night",
+        )
+    ]
+
+    @api.model
+    def hold_rooms(
+        self, pms_property_id, checkin, checkout, room_ids, token=False, ttl=False
+    ):
+        """
+        Take the rooms for the nights between checkin and checkout before
+        the reservations are created, so that a booking that competes for
+        the same rooms fails here, cheaply, instead of after computing its
+        prices and services. Holding again with the same token extends the
+        holds.
+        :param ttl: minutes the holds last, DEFAULT_HOLD_MINUTES by default
+        :return: token of the holds, to ignore them with the context key
+                 inventory_hold_token and to release them
+        """
+        token = token or uuid.uuid4().hex
+        room_ids = list(set(room_ids or []))
+        dates = [
+            checkin + datetime.timedelta(days=x)
+            for x in range(0, (checkout - checkin).days)
+        ]
+        if not room_ids or not dates:
+            return token
+        expiration_date = fields.Datetime.now() + datetime.timedelta(
+            minutes=ttl or DEFAULT_HOLD_MINUTES
+        )
+        self._sweep_expired_holds(room_ids=room_ids)
+        not_avail = (
+            self.env["pms.availability"]
+            .with_context(inventory_hold_token=token)
+            .get_occupied_room_dates(
+                checkin=checkin,
+                checkout=checkout,
+                pms_property_id=pms_property_id,
+                room_ids=room_ids,
+            )
+        )
+        if not_avail:
+            raise ValidationError(
+                _("%s: No room available in %s <-> %s.")
+                % (
+                    ", ".join(self.env["pms.room"].browse(not_avail).mapped("name")),
+                    checkin,
+                    checkout,
+                )
+            )
+        self.env.cr.execute(
+            """
+            INSERT INTO pms_inventory_hold (
+                token, pms_property_id, room_id, date, expiration_date,
+                user_id, create_uid, create_date, write_uid, write_date
+            )
+            SELECT %(token)s, %(pms_property_id)s, room_id, date,
+                   %(expiration_date)s, %(uid)s,
+                   %(uid)s, now() at time zone 'UTC',
+                   %(uid)s, now() at time zone 'UTC'
+            FROM   unnest(%(room_ids)s::int[]) AS room_id
+                   CROSS JOIN unnest(%(dates)s::date[]) AS date
+            ON CONFLICT (room_id, date) DO UPDATE
+                SET expiration_date = EXCLUDED.expiration_date
+                WHERE pms_inventory_hold.token = EXCLUDED.token
+            RETURNING id
+            """,
+            {
+                "token": token,
+                "pms_property_id": pms_property_id,
+                "expiration_date": expiration_date,
+                "uid": self.env.uid,
+                "room_ids": room_ids,
+                "dates": dates,
+            },
+        )
+        held = len(self.env.cr.fetchall())
+        self.invalidate_cache()
+        self.env["pms.property"]._invalidate_availability_cache([pms_property_id])
+        if held < len(room_ids) * len(dates):
+            # another booking holds some of the rooms
+            self.release_holds(token)
+            raise ValidationError(
+                _("The rooms are being booked by another user in %s <-> %s.")
+                % (checkin, checkout)
+            )
+        return token
+
+    @api.model
+    def release_holds(self, token):
+        """
+        Free the rooms held with the token, once the reservations that
+        replace them are created or the booking is abandoned.
+        """
+        self.env.cr.execute(
+            """
+            DELETE FROM pms_inventory_hold
+            WHERE  token = %s
+            RETURNING pms_property_id
+            """,
+            (token,),
+        )
+        pms_property_ids = list({row[0] for row in self.env.cr.fetchall()})
+        self.invalidate_cache()
+        self.env["pms.property"]._invalidate_availability_cache(pms_property_ids)
+
+    @api.model
+    def _sweep_expired_holds(self, room_ids=False):
+        self.env.cr.execute(
+            """
+            DELETE FROM pms_inventory_hold
+            WHERE  expiration_date <= now() at time zone 'UTC'
+               AND (%(all_rooms)s OR room_id = ANY(%(room_ids)s))
+            RETURNING pms_property_id
+            """,
+            {"all_rooms": not room_ids, "room_ids": list(room_ids or [])},
+        )
+        pms_property_ids = list({row[0] for row in self.env.cr.fetchall()})
+        if pms_property_ids:
+            self.invalidate_cache()
+            self.env["pms.property"]._invalidate_availability_cache(pms_property_ids)
+
+    @api.model
+    def cron_sweep_expired_holds(self):
+        self._sweep_expired_holds()
@@ -2,7 +2,9 @@
 # Copyright 2019  Dario Lodeiros
 # License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl).
 
+import copy
 import datetime
+import functools
 import time
 
 import pytz
@@ -13,6 +15,18 @@ from odoo.tools import DEFAULT_SERVER_DATE_FORMAT
 
 from odoo.addons.base.models.res_partner import _tz_get
 
+AVAILABILITY_CHUNK_DAYS = 60
+# rows read from the server-side cursor of the ARI export at a time
+ARI_FETCH_SIZE = 1000
+
+# fields whose changes invalidate the availability cache
+AVAILABILITY_LINE_FIELDS = ["room_id", "date", "occupies_availability"]
+AVAILABILITY_ROOM_FIELDS = ["room_type_id", "parent_id", "pms_property_id", "active"]
+# key of the availability matrices in the cache of the cursor
+AVAILABILITY_CACHE_KEY = "pms_availability_matrix"
+# hits and misses of the availability cache in this worker
+AVAILABILITY_CACHE_STATS = {"hits": 0, "misses": 0}
+
 
 class PmsProperty(models.Model):
     _name = "pms.property"
@@ -139,6 +153,13 @@ class PmsProperty(models.Model):
         comodel_name="mail.template",
     )
 
+    availability_horizon_days = fields.Integer(
+        string="Availability Horizon (days)",
+        help="Number of days from today for which the availability calendar "
+        "of every room type is created in advance",
+        default=730,
+    )
+
     is_confirmed_auto_mail = fields.Boolean(string="Auto Send Confirmation Mail")
     is_modified_auto_mail = fields.Boolean(string="Auto Send Modification Mail")
     is_canceled_auto_mail = fields.Boolean(string="Auto Send Cancellation Mail")
@@ -155,6 +176,7 @@ class PmsProperty(models.Model):
         "class_id",
         "overnight_rooms",
         "current_lines",
+        "inventory_hold_token",
     )
     def _compute_free_room_ids(self):
         checkin = self._context["checkin"]
@@ -183,30 +205,17 @@ class PmsProperty(models.Model):
             )
             if pricelist_id and not real_avail:
                 # TODO: only closed_departure take account checkout date!
-                domain_rules = [
-                    ("date", ">=", checkin),
-                    ("date", "<=", checkout),
-                    ("pms_property_id", "=", pms_property.id),
-                ]
-                if room_type_id:
-                    domain_rules.append(("room_type_id", "=", room_type_id))
-
                 pricelist = self.env["product.pricelist"].browse(pricelist_id)
                 if pricelist.availability_plan_id:
-                    domain_rules.append(
-                        ("availability_plan_id", "=", pricelist.availability_plan_id.id)
-                    )
-                    rule_items = self.env["pms.availability.plan.rule"].search(
-                        domain_rules
+                    room_types_to_remove = (
+                        pricelist.availability_plan_id.get_blocked_room_type_ids(
+                            checkin,
+                            checkout,
+                            pms_property.id,
+                            [room_type_id] if room_type_id else False,
+                        )
                     )
-
-                    if len(rule_items) > 0:
-                        room_types_to_remove = []
-                        for item in rule_items:
-                            if pricelist.availability_plan_id.any_rule_applies(
-                                checkin, checkout, item
-                            ):
-                                room_types_to_remove.append(item.room_type_id.id)
+                    if room_types_to_remove:
                         free_rooms = free_rooms.filtered(
                             lambda x: x.room_type_id.id not in room_types_to_remove
                         )
@@ -280,6 +289,7 @@ class PmsProperty(models.Model):
         "class_id",
         "overnight_rooms",
         "current_lines",
+        "inventory_hold_token",
     )
     def _compute_availability(self):
         for record in self:
@@ -313,42 +323,420 @@ class PmsProperty(models.Model):
             if current_lines and not isinstance(current_lines, list):
                 current_lines = [current_lines]
 
-            domain_rules = [
-                ("date", ">=", checkin),
-                ("date", "<=", checkout),
-                ("pms_property_id", "=", pms_property.id),
-            ]
-            if room_type_id:
-                domain_rules.append(("room_type_id", "=", room_type_id))
-
             pricelist = False
             if pricelist_id:
                 pricelist = self.env["product.pricelist"].browse(pricelist_id)
             if pricelist and pricelist.availability_plan_id and not real_avail:
-                domain_rules.append(
-                    ("availability_plan_id", "=", pricelist.availability_plan_id.id)
-                )
-                rule_groups = self.env["pms.availability.plan.rule"].read_group(
-                    domain_rules,
-                    ["plan_avail:sum"],
-                    ["date:day"],
-                    lazy=False,
+                restrictions = pricelist.availability_plan_id.get_rule_restrictions(
+                    checkin,
+                    checkout,
+                    pms_property.id,
+                    [room_type_id] if room_type_id else False,
                 )
-                if len(rule_groups) > 0:
-                    # If in the group per day, some room type has the sale blocked,
+                if restrictions:
+                    # If in the day some room type has the sale blocked,
                     # we must subtract from that day the availability of that room type
-                    for group in rule_groups:
-                        items = self.env["pms.availability.plan.rule"].search(
-                            group["__domain"]
-                        )
-                        for item in items:
-                            if pricelist.availability_plan_id.any_rule_applies(
-                                checkin, checkout, item
-                            ):
-                                group["plan_avail"] -= item.plan_avail
-                    count_free_rooms = min(i["plan_avail"] for i in rule_groups)
+                    plan_avail_by_date = {}
+                    for _room_type_id, date, applies, plan_avail in restrictions:
+                        plan_avail_by_date.setdefault(date, 0)
+                        if not applies:
+                            plan_avail_by_date[date] += plan_avail
+                    count_free_rooms = min(plan_avail_by_date.values())
             record.availability = count_free_rooms
 
+    def get_availability_matrix(
+        self,
+        checkin,
+        checkout,
+        room_type_ids=None,
+        pricelist_id=None,
+        current_lines=False,
+    ):
+        """
+        Availability of several room types for a whole stay, resolved with
+        a fixed number of queries regardless of the number of room types
+        and nights.
+        :return: dict {room_type_id: {
+                    "nights": {date: rooms free that night},
+                    "free_room_ids": rooms free for the whole stay,
+                    "blocked": True if the availability plan closes the stay,
+                    "availability": bookable rooms for the whole stay
+                        (same value as the availability field),
+                    "split_availability": bookable stays when they can
+                        change rooms between nights,
+                 }}
+        """
+        self.ensure_one()
+        if isinstance(checkin, str):
+            checkin = datetime.datetime.strptime(
+                checkin, DEFAULT_SERVER_DATE_FORMAT
+            ).date()
+        if isinstance(checkout, str):
+            checkout = datetime.datetime.strptime(
+                checkout, DEFAULT_SERVER_DATE_FORMAT
+            ).date()
+        if current_lines and not isinstance(current_lines, list):
+            current_lines = [current_lines]
+        if room_type_ids is None:
+            room_type_ids = (
+                self.env["pms.room.type"]
+                .search(
+                    [
+                        "|",
+                        ("pms_property_ids", "=", False),
+                        ("pms_property_ids", "in", self.id),
+                    ]
+                )
+                .ids
+            )
+        # pending changes must invalidate the cache before it is looked up
+        self.env["pms.reservation.line"].flush(AVAILABILITY_LINE_FIELDS)
+        self.env["pms.availability.plan.rule"].flush()
+        self.env["pms.availability.plan.range.rule"].flush()
+        self.env["pms.room"].flush(AVAILABILITY_ROOM_FIELDS)
+        key = (
+            checkin,
+            checkout,
+            tuple(room_type_ids),
+            pricelist_id or False,
+            tuple(sorted(x for x in current_lines or [] if isinstance(x, int))),
+            self.env.context.get("inventory_hold_token"),
+        )
+        property_cache = self._get_availability_cache().setdefault(self.id, {})
+        if key in property_cache:
+            AVAILABILITY_CACHE_STATS["hits"] += 1
+        else:
+            AVAILABILITY_CACHE_STATS["misses"] += 1
+            property_cache[key] = self._build_availability_matrix(*key[:5])
+        return copy.deepcopy(property_cache[key])
+
+    @api.model
+    def _get_availability_cache(self):
+        """
+        Availability matrices computed in the current transaction, as
+        {property id: {key: matrix}}. The cache lives on the cursor and is
+        dropped at commit and rollback, so that it is not shared between
+        transactions or workers and never serves rolled back data.
+        """
+        cr = self.env.cr
+        if AVAILABILITY_CACHE_KEY not in cr.cache:
+            cr.cache[AVAILABILITY_CACHE_KEY] = {}
+            drop_cache = functools.partial(cr.cache.pop, AVAILABILITY_CACHE_KEY, None)
+            cr.after("commit", drop_cache)
+            cr.after("rollback", drop_cache)
+        return cr.cache[AVAILABILITY_CACHE_KEY]
+
+    def _build_availability_matrix(
+        self, checkin, checkout, room_type_ids, pricelist_id, current_lines
+    ):
+        """
+        Core of get_availability_matrix(), cached per property and stay in
+        the current transaction. The matrices of a property are dropped by
+        _invalidate_availability_cache() whenever the occupation of one of
+        its rooms, a room or an availability plan rule changes.
+        """
+        current_lines = list(current_lines)
+        dates = [
+            checkin + datetime.timedelta(days=x)
+            for x in range(0, (checkout - checkin).days)
+        ]
+        matrix = {
+            room_type_id: {
+                "nights": {date: 0 for date in dates},
+                "free_room_ids": [],
+                "blocked": False,
+                "availability": 0,
+                "split_availability": 0,
+            }
+            for room_type_id in room_type_ids
+        }
+        if not room_type_ids:
+            return matrix
+
+        rooms = self.env["pms.room"].search_read(
+            [
+                ("pms_property_id", "=", self.id),
+                ("room_type_id", "in", room_type_ids),
+            ],
+            ["room_type_id"],
+        )
+        not_avail = self.env["pms.availability"].get_occupied_room_dates(
+            checkin=checkin,
+            checkout=checkout,
+            pms_property_id=self.id,
+            current_lines=current_lines,
+        )
+        for room in rooms:
+            values = matrix[room["room_type_id"][0]]
+            room_not_avail = not_avail.get(room["id"], set())
+            for date in dates:
+                if date not in room_not_avail:
+                    values["nights"][date] += 1
+            if not room_not_avail:
+                values["free_room_ids"].append(room["id"])
+
+        pricelist = self.env["product.pricelist"].browse(pricelist_id)
+        availability_plan = pricelist.availability_plan_id
+        restrictions = []
+        if availability_plan:
+            # TODO: only closed_departure take account checkout date!
+            restrictions = availability_plan.get_rule_restrictions(
+                checkin, checkout, self.id, room_type_ids
+            )
+        plan_avails = {}
+        for room_type_id, _date, applies, plan_avail in restrictions:
+            if applies:
+                matrix[room_type_id]["blocked"] = True
+                plan_avail = 0
+            plan_avails.setdefault(room_type_id, []).append(plan_avail)
+
+        for room_type_id, values in matrix.items():
+            if values["blocked"]:
+                values["free_room_ids"] = []
+            if room_type_id in plan_avails:
+                values["availability"] = min(plan_avails[room_type_id])
+                values["split_availability"] = min(
+                    values["availability"], min(values["nights"].values(), default=0)
+                )
+            else:
+                values["availability"] = len(values["free_room_ids"])
+                values["split_availability"] = (
+                    0
+                    if values["blocked"]
+                    else min(values["nights"].values(), default=0)
+                )
+        return matrix
+
+    @api.model
+    def _invalidate_availability_cache(self, pms_property_ids=None):
+        """
+        Drop the availability matrices of the properties, all of them if
+        not given, computed in the current transaction.
+        """
+        cache = self.env.cr.cache.get(AVAILABILITY_CACHE_KEY)
+        if not cache:
+            return
+        if pms_property_ids is None:
+            cache.clear()
+        else:
+            for pms_property_id in pms_property_ids:
+                cache.pop(pms_property_id, None)
+
+    @api.model
+    def get_availability_cache_stats(self):
+        """
+        Hits and misses of the availability cache in this worker since
+        it started.
+        :return: dict {"hits": int, "misses": int}
+        """
+        return dict(AVAILABILITY_CACHE_STATS)
+
+    def get_split_room_assignment(
+        self,
+        checkin,
+        checkout,
+        room_type_id,
+        current_lines=False,
+        last_room_id=False,
+    ):
+        """
+        Assign a room of the room type to every night of a stay that can't
+        be allocated in a single room, with the least number of room changes.
+        The free nights of the rooms are read into an in-memory grid with
+        one query, and the assignment is solved as a shortest path over
+        (night, room) where staying in the same room costs nothing and
+        moving to another room costs one. On equal cost, staying in the
+        room of the night before is preferred.
+        :param last_room_id: room of the night before checkin, if any
+        :return: dict {date: room_id}, empty if some night has no free room
+        """
+        self.ensure_one()
+        if isinstance(checkin, str):
+            checkin = datetime.datetime.strptime(
+                checkin, DEFAULT_SERVER_DATE_FORMAT
+            ).date()
+        if isinstance(checkout, str):
+            checkout = datetime.datetime.strptime(
+                checkout, DEFAULT_SERVER_DATE_FORMAT
+            ).date()
+        if current_lines and not isinstance(current_lines, list):
+            current_lines = [current_lines]
+        room_ids = (
+            self.env["pms.room"]
+            .search(
+                [
+                    ("room_type_id", "=", room_type_id),
+                    ("pms_property_id", "=", self.id),
+                ]
+            )
+            .ids
+        )
+        not_avail = self.env["pms.availability"].get_occupied_room_dates(
+            checkin=checkin,
+            checkout=checkout,
+            pms_property_id=self.id,
+            room_ids=room_ids,
+            current_lines=current_lines,
+        )
+        dates = [
+            checkin + datetime.timedelta(days=x)
+            for x in range(0, (checkout - checkin).days)
+        ]
+        # costs: {room_id: room changes of the best path ending in room_id}
+        costs = {last_room_id: 0} if last_room_id else {False: 0}
+        previous_rooms = []
+        for date in dates:
+            free_room_ids = [
+                room_id
+                for room_id in room_ids
+                if date not in not_avail.get(room_id, set())
+            ]
+            if not free_room_ids:
+                return {}
+            best_room_id = min(costs, key=lambda room_id: costs[room_id])
+            best_cost = costs[best_room_id] + (1 if best_room_id else 0)
+            new_costs = {}
+            previous_room = {}
+            for room_id in free_room_ids:
+                if room_id in costs and costs[room_id] <= best_cost:
+                    new_costs[room_id] = costs[room_id]
+                    previous_room[room_id] = room_id
+                else:
+                    new_costs[room_id] = best_cost
+                    previous_room[room_id] = best_room_id
+            costs = new_costs
+            previous_rooms.append(previous_room)
+        if not dates:
+            return {}
+        # walk the best path back from the last night
+        room_id = min(costs, key=lambda room_id: costs[room_id])
+        assignment = {}
+        for date, previous_room in zip(reversed(dates), reversed(previous_rooms)):
+            assignment[date] = room_id
+            room_id = previous_room[room_id]
+        return assignment
+
+    def get_group_room_assignment(
+        self,
+        checkin,
+        checkout,
+        room_type_demands,
+        pricelist_id=None,
+    ):
+        """
+        Assign the rooms of a group of stays with the same dates in one pass.
+        The free rooms of every requested room type come from a single
+        availability matrix, and the ubications are ranked by how many
+        rooms of the group they can host, so that the group sits together
+        as much as possible. Rooms sharing the same physical space (a
+        shared room and its beds) are never given to two stays of the group.
+        When there are not enough rooms free for the whole stay, the other
+        stays get no room and are split between rooms by the reservation,
+        as long as the free rooms of every night cover the group.
+        :param room_type_demands: dict {room_type_id: number of rooms}
+        :return: dict {room_type_id: [room_ids]}, with False for the stays
+                 to split
+        """
+        self.ensure_one()
+        room_type_demands = {
+            room_type_id: demand
+            for room_type_id, demand in room_type_demands.items()
+            if demand
+        }
+        if not room_type_demands:
+            return {}
+        matrix = self.get_availability_matrix(
+            checkin,
+            checkout,
+            room_type_ids=list(room_type_demands),
+            pricelist_id=pricelist_id,
+        )
+        for room_type_id, demand in room_type_demands.items():
+            if matrix[room_type_id]["split_availability"] < demand:
+                raise ValidationError(
+                    _("%s: Not enough rooms available in %s <-> %s.")
+                    % (
+                        self.env["pms.room.type"].browse(room_type_id).name,
+                        checkin,
+                        checkout,
+                    )
+                )
+        rooms = self.env["pms.room"].search_read(
+            [("pms_property_id", "=", self.id)],
+            ["room_type_id", "ubication_id", "parent_id"],
+        )
+        parents = {
+            room["id"]: room["parent_id"] and room["parent_id"][0] for room in rooms
+        }
+        free_room_ids = {
+            room_id for values in matrix.values() for room_id in values["free_room_ids"]
+        }
+        free_rooms = [room for room in rooms if room["id"] in free_room_ids]
+
+        # rooms of the group each ubication can host
+        ubication_capacity = {}
+        for room_type_id, demand in room_type_demands.items():
+            free_by_ubication = {}
+            for room in free_rooms:
+                if room["room_type_id"][0] == room_type_id:
+                    ubication_id = room["ubication_id"] and room["ubication_id"][0]
+                    free_by_ubication[ubication_id] = (
+                        free_by_ubication.get(ubication_id, 0) + 1
+                    )
+            for ubication_id, free in free_by_ubication.items():
+                ubication_capacity[ubication_id] = ubication_capacity.get(
+                    ubication_id, 0
+                ) + min(free, demand)
+        ubication_rank = {
+            ubication_id: rank
+            for rank, ubication_id in enumerate(
+                sorted(
+                    ubication_capacity,
+                    key=lambda u: (-ubication_capacity[u], not u),
+                )
+            )
+        }
+
+        def ancestors(room_id):
+            while parents.get(room_id):
+                room_id = parents[room_id]
+                yield room_id
+
+        assignment = {}
+        used_room_ids = set()
+        # the room types with the fewest spare rooms go first
+        for room_type_id in sorted(
+            room_type_demands,
+            key=lambda rt: len(matrix[rt]["free_room_ids"]) - room_type_demands[rt],
+        ):
+            candidates = sorted(
+                (
+                    (index, room)
+                    for index, room in enumerate(free_rooms)
+                    if room["room_type_id"][0] == room_type_id
+                ),
+                key=lambda r: (
+                    ubication_rank[r[1]["ubication_id"] and r[1]["ubication_id"][0]],
+                    r[0],
+                ),
+            )
+            assignment[room_type_id] = []
+            for _index, room in candidates:
+                if len(assignment[room_type_id]) == room_type_demands[room_type_id]:
+                    break
+                related_room_ids = {room["id"]} | set(ancestors(room["id"]))
+                if related_room_ids & used_room_ids or any(
+                    room["id"] in ancestors(used_room_id)
+                    for used_room_id in used_room_ids
+                ):
+                    continue
+                assignment[room_type_id].append(room["id"])
+                used_room_ids.add(room["id"])
+            assignment[room_type_id] += [False] * (
+                room_type_demands[room_type_id] - len(assignment[room_type_id])
+            )
+        return assignment
+
     @api.model
     def splitted_availability(
         self,
@@ -367,20 +755,24 @@ class PmsProperty(models.Model):
             checkout = datetime.datetime.strptime(
                 checkout, DEFAULT_SERVER_DATE_FORMAT
             ).date()
+        pms_property = self.env["pms.property"].browse(pms_property_id)
+        matrix = pms_property.get_availability_matrix(
+            checkin=checkin,
+            checkout=checkout,
+            room_type_ids=[room_type_id] if room_type_id else None,
+            pricelist_id=pricelist.id if pricelist else False,
+            current_lines=current_lines,
+        )
         for date_iterator in [
             checkin + datetime.timedelta(days=x)
             for x in range(0, (checkout - checkin).days)
         ]:
-            pms_property = self.env["pms.property"].browse(pms_property_id)
-            pms_property = pms_property.with_context(
-                checkin=date_iterator,
-                checkout=date_iterator + datetime.timedelta(1),
-                room_type_id=room_type_id,
-                current_lines=current_lines,
-                pricelist_id=pricelist.id,
+            free_rooms = sum(
+                values["nights"][date_iterator]
+                for values in matrix.values()
+                if not values["blocked"]
             )
-
-            if len(pms_property.free_room_ids) < 1:
+            if free_rooms < 1:
                 return False
         return True
 
@@ -489,8 +881,257 @@ class PmsProperty(models.Model):
             )
             vals.update({"checkin_sequence_id": checkin_sequence.id})
         record = super(PmsProperty, self).create(vals)
+        self._trigger_materialize_availability()
+        # the items without properties of the pricelists without properties
+        # apply in the new property too
+        pricelist_ids = (
+            self.env["product.pricelist"].search([("pms_property_ids", "=", False)]).ids
+        )
+        if pricelist_ids:
+            self.env["pms.rate.grid"]._refresh_rate_grid(pricelist_ids=pricelist_ids)
         return record
 
+    @api.model
+    def _trigger_materialize_availability(self):
+        cron = self.env.ref("pms.materialize_availability", raise_if_not_found=False)
+        if cron:
+            cron._trigger()
+
+    @api.model
+    def cron_materialize_availability(self):
+        self.search([]).materialize_availability()
+
+    def materialize_availability(self, horizon_days=None, room_type_ids=None):
+        """
+        Create in advance the availability calendar (pms.availability) of the
+        room types of the properties from today to the horizon, so that the
+        bookings only have to read it. The calendar is created in chunks
+        of days and the days that already exist are kept.
+        :param horizon_days: number of days to materialize, by default the
+                             availability horizon of each property
+        :param room_type_ids: room types to materialize, by default all the
+                              room types of each property
+        """
+        Avail = self.env["pms.availability"]
+        today = fields.date.today()
+        for pms_property in self:
+            room_types = self.env["pms.room.type"].search(
+                [
+                    "|",
+                    ("pms_property_ids", "=", False),
+                    ("pms_property_ids", "in", pms_property.id),
+                ]
+            )
+            if room_type_ids:
+                room_types = room_types.filtered(lambda r: r.id in room_type_ids)
+            if not room_types:
+                continue
+            days = horizon_days or pms_property.availability_horizon_days
+            for chunk_start in range(0, days, AVAILABILITY_CHUNK_DAYS):
+                dates = [
+                    today + datetime.timedelta(days=x)
+                    for x in range(
+                        chunk_start, min(chunk_start + AVAILABILITY_CHUNK_DAYS, days)
+                    )
+                ]
+                Avail._get_or_create_avails(
+                    (room_type_id, date, pms_property.id)
+                    for room_type_id in room_types.ids
+                    for date in dates
+                )
+                # compute the new days of the chunk before the next one
+                Avail.flush()
+        return True
+
+    def iter_ari_rows(self, pricelist, date_from, date_to, batch_size=None):
+        """
+        Availability, rates and restrictions (ARI) of every room type of the
+        property for each night between date_from and date_to (included),
+        read through a server-side cursor in batches so that the range is
+        never loaded in memory at once. The prices are read from the rate
+        grid by key; the nights without a price of their own in a derived
+        pricelist follow the base pricelist, with its adjustments.
+        :param pricelist: pricelist whose fixed prices and availability plan
+                          are exported
+        :return: generator of dicts, one per room type and night
+        """
+        self.ensure_one()
+        batch_size = batch_size or ARI_FETCH_SIZE
+        room_type_ids = (
+            self.env["pms.room.type"]
+            .search(
+                [
+                    "|",
+                    ("pms_property_ids", "=", False),
+                    ("pms_property_ids", "in", self.id),
+                ]
+            )
+            .ids
+        )
+        parent_rows = False
+        if pricelist.parent_pricelist_id:
+            # the rows of the base pricelist come in the same order
+            parent_rows = self.iter_ari_rows(
+                pricelist.parent_pricelist_id, date_from, date_to, batch_size
+            )
+        # a cursor by pricelist, as the base pricelist rows are read meanwhile
+        cursor_name = "pms_ari_rows_%s" % pricelist.id
+        self.env["base"].flush()
+        self.env.cr.execute(
+            "DECLARE %s NO SCROLL CURSOR FOR" % cursor_name
+            + """
+            SELECT rt.id, night.date::date,
+                   COALESCE(rule.plan_avail, avail.real_avail, rooms.total),
+                   COALESCE(grid.price, price.fixed_price),
+                   COALESCE(rule.min_stay, range_rule.min_stay, 0),
+                   COALESCE(rule.min_stay_arrival, range_rule.min_stay_arrival, 0),
+                   COALESCE(rule.max_stay, range_rule.max_stay, 0),
+                   COALESCE(rule.max_stay_arrival, range_rule.max_stay_arrival, 0),
+                   COALESCE(rule.closed, range_rule.closed, False),
+                   COALESCE(rule.closed_arrival, range_rule.closed_arrival, False),
+                   COALESCE(rule.closed_departure, range_rule.closed_departure, False)
+            FROM   generate_series(
+                       %(date_from)s::date, %(date_to)s::date, interval '1 day'
+                   ) AS night(date)
+            CROSS  JOIN pms_room_type rt
+            JOIN   product_product pp ON pp.id = rt.product_id
+            JOIN   product_template pt ON pt.id = pp.product_tmpl_id
+            JOIN   product_category categ ON categ.id = pt.categ_id
+            CROSS  JOIN LATERAL (
+                       SELECT COUNT(*) AS total
+                       FROM   pms_room room
+                       WHERE  room.active = True
+                          AND room.room_type_id = rt.id
+                          AND room.pms_property_id = %(pms_property_id)s
+                   ) rooms
+            LEFT   JOIN pms_availability avail
+                   ON  avail.room_type_id = rt.id
+                   AND avail.date = night.date::date
+                   AND avail.pms_property_id = %(pms_property_id)s
+            LEFT   JOIN pms_availability_plan_rule rule
+                   ON  rule.availability_plan_id = %(availability_plan_id)s
+                   AND rule.room_type_id = rt.id
+                   AND rule.date = night.date::date
+                   AND rule.pms_property_id = %(pms_property_id)s
+            LEFT   JOIN LATERAL (
+                       /* the daily rule replaces the range rules */
+                       SELECT range_rule.*
+                       FROM   pms_availability_plan_range_rule range_rule
+                       WHERE  rule.id IS NULL
+                          AND range_rule.availability_plan_id
+                              = %(availability_plan_id)s
+                          AND range_rule.room_type_id = rt.id
+                          AND range_rule.pms_property_id = %(pms_property_id)s
+                          AND range_rule.date_from <= night.date::date
+                          AND range_rule.date_to >= night.date::date
+                       ORDER  BY range_rule.date_to - range_rule.date_from,
+                                 range_rule.id DESC
+                       LIMIT  1
+                   ) range_rule ON True
+            LEFT   JOIN pms_rate_grid grid
+                   ON  grid.pricelist_id = %(pricelist_id)s
+                   AND grid.product_id = pp.id
+                   AND grid.pms_property_id = %(pms_property_id)s
+                   AND grid.date = night.date::date
+                   AND grid.board_service_room_type_id IS NULL
+            LEFT   JOIN LATERAL (
+                       /* nights out of the rate grid, with the filters and
+                          the priority of _get_pms_items_by_consumption_date */
+                       SELECT item.fixed_price
+                       FROM   product_pricelist_item item
+                       WHERE  grid.id IS NULL
+                          AND %(pricelist_in_property)s
+                          AND item.pricelist_id = %(pricelist_id)s
+                          AND item.compute_price = 'fixed'
+                          AND COALESCE(item.min_quantity, 0) <= 1
+                          AND (item.product_tmpl_id IS NULL
+                               OR item.product_tmpl_id = pp.product_tmpl_id)
+                          AND (item.product_id IS NULL OR item.product_id = pp.id)
+                          AND (item.categ_id IS NULL
+                               OR '/' || categ.parent_path
+                                  LIKE '%%/' || item.categ_id || '/%%')
+                          AND (item.date_start IS NULL
+                               OR item.date_start <= %(date)s)
+                          AND (item.date_end IS NULL OR item.date_end >= %(date)s)
+                          AND (
+                               item.date_start_consumption IS NULL
+                               OR item.date_start_consumption <= night.date::date
+                          )
+                          AND (
+                               item.date_end_consumption IS NULL
+                               OR item.date_end_consumption >= night.date::date
+                          )
+                          AND item.board_service_room_type_id IS NULL
+                          AND (
+                               NOT EXISTS (
+                                   SELECT 1
+                                   FROM   product_pricelist_item_pms_property_rel r
+                                   WHERE  r.product_pricelist_item_id = item.id
+                               )
+                               OR EXISTS (
+                                   SELECT 1
+                                   FROM   product_pricelist_item_pms_property_rel r
+                                   WHERE  r.product_pricelist_item_id = item.id
+                                      AND r.pms_property_id = %(pms_property_id)s
+                               )
+                          )
+                       ORDER  BY item.applied_on,
+                                 item.date_end - item.date_start ASC,
+                                 CASE WHEN item.consumption_run THEN 0
+                                      ELSE item.date_end_consumption
+                                           - item.date_start_consumption
+                                 END ASC,
+                                 NULLIF(item.pms_property_rank, 0) NULLS LAST,
+                                 item.id DESC
+                       LIMIT  1
+                   ) price ON True
+            WHERE  rt.id = ANY(%(room_type_ids)s)
+            ORDER  BY night.date, rt.id
+            """,
+            {
+                "date_from": date_from,
+                "date_to": date_to,
+                "pms_property_id": self.id,
+                "availability_plan_id": pricelist.availability_plan_id.id or None,
+                "pricelist_id": pricelist.id,
+                "room_type_ids": room_type_ids,
+                "pricelist_in_property": not pricelist.pms_property_ids
+                or self in pricelist.pms_property_ids,
+                "date": fields.Datetime.now(),
+            },
+        )
+        try:
+            while True:
+                self.env.cr.execute(
+                    "FETCH FORWARD %%s FROM %s" % cursor_name, (batch_size,)
+                )
+                rows = self.env.cr.fetchall()
+                if not rows:
+                    break
+                for row in rows:
+                    price = float(row[3]) if row[3] is not None else None
+                    if parent_rows:
+                        parent_price = next(parent_rows)["price"]
+                        if price is None and parent_price is not None:
+                            price = pricelist._compute_derived_price(parent_price)
+                    yield {
+                        "room_type_id": row[0],
+                        "date": fields.Date.to_string(row[1]),
+                        "plan_avail": row[2],
+                        "price": price,
+                        "min_stay": row[4],
+                        "min_stay_arrival": row[5],
+                        "max_stay": row[6],
+                        "max_stay_arrival": row[7],
+                        "closed": row[8],
+                        "closed_arrival": row[9],
+                        "closed_departure": row[10],
+                    }
+        finally:
+            self.env.cr.execute("CLOSE %s" % cursor_name)
+            if parent_rows:
+                parent_rows.close()
+
     @api.model
     def daily_closing(
         self, pms_property_ids, room_type_ids=False, availability_plan_ids=False
@@ -0,0 +1,295 @@
+# License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl).
+from odoo import api, fields, models
+
+# item fields read to find the winning item of a grid cell
+RATE_GRID_ITEM_FIELDS = [
+    "pricelist_id",
+    "product_id",
+    "product_tmpl_id",
+    "applied_on",
+    "compute_price",
+    "fixed_price",
+    "min_quantity",
+    "date_start",
+    "date_end",
+    "date_start_consumption",
+    "date_end_consumption",
+    "board_service_room_type_id",
+    "pms_property_ids",
+    "pms_property_rank",
+    "consumption_run",
+]
+
+
+class PmsRateGrid(models.Model):
+    _name = "pms.rate.grid"
+    _description = "Daily price of a product in a pricelist and property"
+    _order = "date"
+    _check_pms_properties_auto = True
+
+    pricelist_id = fields.Many2one(
+        string="Pricelist",
+        help="Pricelist of the price",
+        readonly=True,
+        required=True,
+        comodel_name="product.pricelist",
+        ondelete="cascade",
+        check_pms_properties=True,
+    )
+    product_id = fields.Many2one(
+        string="Product",
+        help="Priced product: room type, board service or service product",
+        readonly=True,
+        required=True,
+        comodel_name="product.product",
+        ondelete="cascade",
+        check_pms_properties=True,
+    )
+    pms_property_id = fields.Many2one(
+        string="Property",
+        help="Property of the price",
+        readonly=True,
+        required=True,
+        comodel_name="pms.property",
+        ondelete="cascade",
+        check_pms_properties=True,
+    )
+    date = fields.Date(
+        string="Date",
+        help="Consumption date of the price",
+        readonly=True,
+        required=True,
+    )
+    board_service_room_type_id = fields.Many2one(
+        string="Board Service",
+        help="Board service of the price; if not set, the price doesn't "
+        "apply to board services",
+        readonly=True,
+        comodel_name="pms.board.service.room.type",
+        ondelete="cascade",
+        check_pms_properties=True,
+    )
+    pricelist_item_id = fields.Many2one(
+        string="Pricelist Item",
+        help="Item with the highest priority for the cell",
+        readonly=True,
+        required=True,
+        comodel_name="product.pricelist.item",
+        ondelete="cascade",
+    )
+    price = fields.Float(
+        string="Price",
+        help="Fixed price of the pricelist item",
+        readonly=True,
+        digits="Product Price",
+    )
+
+    def init(self):
+        self._cr.execute(
+            "SELECT indexname FROM pg_indexes WHERE indexname = %s",
+            ("pms_rate_grid_cell_unique",),
+        )
+        if not self._cr.fetchone():
+            self._cr.execute(
+                "CREATE UNIQUE INDEX pms_rate_grid_cell_unique \
+                ON pms_rate_grid \
+                (pricelist_id, product_id, pms_property_id, date, \
+                COALESCE(board_service_room_type_id, 0))"
+            )
+            self._refresh_rate_grid()
+
+    @api.model
+    def _refresh_rate_grid(
+        self, pricelist_ids=False, product_ids=False, date_from=False, date_to=False
+    ):
+        """
+        Recompute the cells of the grid of the pricelists (all by default)
+        for the products and the consumption dates between date_from and
+        date_to (both included, unbounded if not set).
+
+        A cell is stored only when the pricelist item that wins it is a
+        fixed price for the product, valid for any sale date and quantity,
+        so that the price read from the grid is the one the dynamic
+        priority of the items would give. Any other cell is left out of the
+        grid and priced dynamically.
+        """
+        self.env["product.pricelist.item"].flush(RATE_GRID_ITEM_FIELDS)
+        self.env["product.pricelist"].flush(["pms_property_ids"])
+        params = {
+            "all_pricelists": not pricelist_ids,
+            "pricelist_ids": list(pricelist_ids or []),
+            "all_products": not product_ids,
+            "product_ids": list(product_ids or []),
+            "date_from": date_from or None,
+            "date_to": date_to or None,
+            "uid": self.env.uid,
+        }
+        self.env.cr.execute(
+            """
+            DELETE FROM pms_rate_grid
+            WHERE  (%(all_pricelists)s OR pricelist_id = ANY(%(pricelist_ids)s))
+               AND (%(all_products)s OR product_id = ANY(%(product_ids)s))
+               AND (%(date_from)s::date IS NULL OR date >= %(date_from)s::date)
+               AND (%(date_to)s::date IS NULL OR date <= %(date_to)s::date)
+            """,
+            params,
+        )
+        self.env.cr.execute(
+            """
+            WITH cell AS (
+                SELECT DISTINCT item.pricelist_id, item.product_id,
+                       lin.pms_property_id, night.date::date AS date,
+                       item.board_service_room_type_id
+                FROM   product_pricelist_item item
+                       CROSS JOIN LATERAL (
+                           /* an item without properties applies in the
+                              properties of its pricelist, or in all of them */
+                           SELECT l.pms_property_id
+                           FROM   product_pricelist_item_pms_property_rel l
+                           WHERE  l.product_pricelist_item_id = item.id
+                           UNION
+                           SELECT c.pms_property_id
+                           FROM   product_pricelist_pms_property_rel c
+                           WHERE  c.product_pricelist_id = item.pricelist_id
+                              AND NOT EXISTS (
+                                   SELECT 1
+                                   FROM   product_pricelist_item_pms_property_rel l
+                                   WHERE  l.product_pricelist_item_id = item.id
+                              )
+                           UNION
+                           SELECT p.id
+                           FROM   pms_property p
+                           WHERE  NOT EXISTS (
+                                   SELECT 1
+                                   FROM   product_pricelist_item_pms_property_rel l
+                                   WHERE  l.product_pricelist_item_id = item.id
+                              )
+                              AND NOT EXISTS (
+                                   SELECT 1
+                                   FROM   product_pricelist_pms_property_rel c
+                                   WHERE  c.product_pricelist_id = item.pricelist_id
+                              )
+                       ) lin
+                       CROSS JOIN LATERAL generate_series(
+                           GREATEST(
+                               item.date_start_consumption,
+                               COALESCE(
+                                   %(date_from)s::date, item.date_start_consumption
+                               )
+                           ),
+                           LEAST(
+                               item.date_end_consumption,
+                               COALESCE(%(date_to)s::date, item.date_end_consumption)
+                           ),
+                           interval '1 day'
+                       ) AS night(date)
+                WHERE  (%(all_pricelists)s
+                        OR item.pricelist_id = ANY(%(pricelist_ids)s))
+                   AND (%(all_products)s OR item.product_id = ANY(%(product_ids)s))
+                   AND item.applied_on = '0_product_variant'
+                   AND item.product_id IS NOT NULL
+                   AND (
+                        NOT EXISTS (
+                            SELECT 1
+                            FROM   product_pricelist_pms_property_rel c
+                            WHERE  c.product_pricelist_id = item.pricelist_id
+                        )
+                        OR EXISTS (
+                            SELECT 1
+                            FROM   product_pricelist_pms_property_rel c
+                            WHERE  c.product_pricelist_id = item.pricelist_id
+                               AND c.pms_property_id = lin.pms_property_id
+                        )
+                   )
+            )
+            INSERT INTO pms_rate_grid (
+                pricelist_id, product_id, pms_property_id, date,
+                board_service_room_type_id, pricelist_item_id, price,
+                create_uid, create_date, write_uid, write_date
+            )
+            SELECT cell.pricelist_id, cell.product_id, cell.pms_property_id,
+                   cell.date, cell.board_service_room_type_id,
+                   winner.id, winner.fixed_price,
+                   %(uid)s, now() at time zone 'UTC',
+                   %(uid)s, now() at time zone 'UTC'
+            FROM   cell
+                   CROSS JOIN LATERAL (
+                       /* same priority as _get_pms_items_by_consumption_date */
+                       SELECT item.id, item.fixed_price, item.compute_price,
+                              item.min_quantity, item.date_start, item.date_end
+                       FROM   product_pricelist_item item
+                       WHERE  item.pricelist_id = cell.pricelist_id
+                          AND item.product_id = cell.product_id
+                          AND item.applied_on = '0_product_variant'
+                          AND item.board_service_room_type_id
+                              IS NOT DISTINCT FROM cell.board_service_room_type_id
+                          AND (item.date_start_consumption IS NULL
+                               OR item.date_start_consumption <= cell.date)
+                          AND (item.date_end_consumption IS NULL
+                               OR item.date_end_consumption >= cell.date)
+                          AND (
+                               NOT EXISTS (
+                                   SELECT 1
+                                   FROM   product_pricelist_item_pms_property_rel l
+                                   WHERE  l.product_pricelist_item_id = item.id
+                               )
+                               OR EXISTS (
+                                   SELECT 1
+                                   FROM   product_pricelist_item_pms_property_rel l
+                                   WHERE  l.product_pricelist_item_id = item.id
+                                      AND l.pms_property_id = cell.pms_property_id
+                               )
+                          )
+                       ORDER  BY item.date_end - item.date_start ASC,
+                                 CASE WHEN item.consumption_run THEN 0
+                                      ELSE item.date_end_consumption
+                                           - item.date_start_consumption
+                                 END ASC,
+                                 NULLIF(item.pms_property_rank, 0) NULLS LAST,
+                                 item.id DESC
+                       LIMIT  1
+                   ) winner
+            WHERE  winner.compute_price = 'fixed'
+               AND winner.date_start IS NULL
+               AND winner.date_end IS NULL
+               AND COALESCE(winner.min_quantity, 0) <= 0
+            """,
+            params,
+        )
+        self.invalidate_cache()
+
+    @api.model
+    def get_rate_grid_items(
+        self,
+        pricelist_id,
+        product_id,
+        pms_property_id,
+        dates,
+        board_service_room_type_id=False,
+    ):
+        """
+        Pricelist item that prices the product on each date, read from the
+        grid by key.
+        :return: dict {date: item id} of the dates stored in the grid
+        """
+        if not dates:
+            return {}
+        self.env.cr.execute(
+            """
+            SELECT date, pricelist_item_id
+            FROM   pms_rate_grid
+            WHERE  pricelist_id = %(pricelist_id)s
+               AND product_id = %(product_id)s
+               AND pms_property_id = %(pms_property_id)s
+               AND date = ANY(%(dates)s)
+               AND COALESCE(board_service_room_type_id, 0) = %(board)s
+            """,
+            {
+                "pricelist_id": pricelist_id,
+                "product_id": product_id,
+                "pms_property_id": pms_property_id,
+                "dates": list(dates),
+                "board": board_service_room_type_id or 0,
+            },
+        )
+        return dict(self.env.cr.fetchall())
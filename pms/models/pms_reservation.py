@@ -867,29 +867,26 @@ class PmsReservation(models.Model):
     @api.depends("checkin", "checkout")
     def _compute_reservation_line_ids(self):
         for reservation in self:
-            cmds = []
             if reservation.checkout and reservation.checkin:
+                # the nights are compared as sets of dates, so that moving
+                # the dates of a long stay is linear in its nights
+                line_dates = set(reservation.reservation_line_ids.mapped("date"))
                 days_diff = (reservation.checkout - reservation.checkin).days
-                for i in range(0, days_diff):
-                    idate = reservation.checkin + datetime.timedelta(days=i)
-                    old_line = reservation.reservation_line_ids.filtered(
-                        lambda r: r.date == idate
+                cmds = [
+                    (0, False, {"date": idate})
+                    for idate in (
+                        reservation.checkin + datetime.timedelta(days=i)
+                        for i in range(0, days_diff)
                     )
-                    if not old_line:
-                        cmds.append(
-                            (
-                                0,
-                                False,
-                                {"date": idate},
-                            )
-                        )
+                    if idate not in line_dates
+                ]
                 reservation.reservation_line_ids -= (
-                    reservation.reservation_line_ids.filtered_domain(
-                        [
-                            "|",
-                            ("date", ">=", reservation.checkout),
-                            ("date", "<", reservation.checkin),
-                        ]
+                    reservation.reservation_line_ids.filtered(
+                        lambda r: r.date
+                        and (
+                            r.date >= reservation.checkout
+                            or r.date < reservation.checkin
+                        )
                     )
                 )
                 reservation.reservation_line_ids = cmds
@@ -1825,72 +1822,139 @@ class PmsReservation(models.Model):
             result.append((res.id, name))
         return result
 
-    @api.model
-    def create(self, vals):
-        if vals.get("folio_id"):
-            folio = self.env["pms.folio"].browse(vals["folio_id"])
-            default_vals = {"pms_property_id": folio.pms_property_id.id}
-            if folio.partner_id:
-                default_vals["partner_id"] = folio.partner_id.id
-            elif folio.partner_name:
-                default_vals["partner_name"] = folio.partner_name
-                default_vals["mobile"] = folio.mobile
-                default_vals["email"] = folio.email
-            else:
-                raise ValidationError(_("Partner contact name is required"))
-            vals.update(default_vals)
-        elif "pms_property_id" in vals and (
-            "partner_name" in vals or "partner_id" in vals or "agency_id" in vals
-        ):
-            folio_vals = {
-                "pms_property_id": vals["pms_property_id"],
-            }
-            if vals.get("partner_id"):
-                folio_vals["partner_id"] = vals.get("partner_id")
-            elif vals.get("agency_id"):
-                folio_vals["agency_id"] = vals.get("agency_id")
-            elif vals.get("partner_name"):
-                folio_vals["partner_name"] = vals.get("partner_name")
-                folio_vals["mobile"] = vals.get("mobile")
-                folio_vals["email"] = vals.get("email")
+    @api.model_create_multi
+    def create(self, vals_list):
+        """
+        Create the reservations in batch: the folios to create, the names,
+        the nights and the board services of all of them are prepared
+        before the reservations, so that each of them is created in a
+        single query instead of one by reservation.
+        """
+        folio_vals_list = []
+        new_folio_vals = []
+        for vals in vals_list:
+            if vals.get("folio_id"):
+                folio = self.env["pms.folio"].browse(vals["folio_id"])
+                default_vals = {"pms_property_id": folio.pms_property_id.id}
+                if folio.partner_id:
+                    default_vals["partner_id"] = folio.partner_id.id
+                elif folio.partner_name:
+                    default_vals["partner_name"] = folio.partner_name
+                    default_vals["mobile"] = folio.mobile
+                    default_vals["email"] = folio.email
+                else:
+                    raise ValidationError(_("Partner contact name is required"))
+                vals.update(default_vals)
+            elif "pms_property_id" in vals and (
+                "partner_name" in vals or "partner_id" in vals or "agency_id" in vals
+            ):
+                folio_vals = {
+                    "pms_property_id": vals["pms_property_id"],
+                }
+                if vals.get("partner_id"):
+                    folio_vals["partner_id"] = vals.get("partner_id")
+                elif vals.get("agency_id"):
+                    folio_vals["agency_id"] = vals.get("agency_id")
+                elif vals.get("partner_name"):
+                    folio_vals["partner_name"] = vals.get("partner_name")
+                    folio_vals["mobile"] = vals.get("mobile")
+                    folio_vals["email"] = vals.get("email")
+                else:
+                    raise ValidationError(_("Partner contact name is required"))
+                # Create the folio in case of need
+                # (To allow to create reservations direct)
+                if vals.get("reservation_type"):
+                    folio_vals["reservation_type"] = vals.get("reservation_type")
+                folio_vals_list.append(folio_vals)
+                new_folio_vals.append(vals)
             else:
-                raise ValidationError(_("Partner contact name is required"))
-            # Create the folio in case of need
-            # (To allow to create reservations direct)
-            if vals.get("reservation_type"):
-                folio_vals["reservation_type"] = vals.get("reservation_type")
-            folio = self.env["pms.folio"].create(folio_vals)
+                raise ValidationError(
+                    _("The Property are mandatory in the reservation")
+                )
+        folios = self.env["pms.folio"].create(folio_vals_list)
+        for vals, folio in zip(new_folio_vals, folios):
             vals.update(
                 {
                     "folio_id": folio.id,
                     "reservation_type": vals.get("reservation_type"),
                 }
             )
-        else:
-            raise ValidationError(_("The Property are mandatory in the reservation"))
-        if vals.get("name", _("New")) == _("New") or "name" not in vals:
-            pms_property_id = (
-                self.env.user.get_active_property_ids()[0]
-                if "pms_property_id" not in vals
-                else vals["pms_property_id"]
-            )
-            pms_property = self.env["pms.property"].browse(pms_property_id)
-            vals["name"] = pms_property.reservation_sequence_id._next_do()
 
-        if not vals.get("reservation_type"):
-            vals["reservation_type"] = (
-                folio.reservation_type if folio.reservation_type else "normal"
+        vals_by_property = {}
+        for vals in vals_list:
+            if vals.get("name", _("New")) == _("New") or "name" not in vals:
+                pms_property_id = (
+                    self.env.user.get_active_property_ids()[0]
+                    if "pms_property_id" not in vals
+                    else vals["pms_property_id"]
+                )
+                vals_by_property.setdefault(pms_property_id, []).append(vals)
+        # the names of each property are allocated in a block
+        for pms_property_id, property_vals_list in vals_by_property.items():
+            pms_property = self.env["pms.property"].browse(pms_property_id)
+            names = pms_property.reservation_sequence_id._next_do_batch(
+                len(property_vals_list)
             )
+            for vals, name in zip(property_vals_list, names):
+                vals["name"] = name
 
-        record = super(PmsReservation, self).create(vals)
-        if record.preconfirm and record.state == "draft":
-            record.confirm()
-        return record
+        self._prepare_nights_and_board_services_vals(vals_list)
+        records = super(PmsReservation, self).create(vals_list)
+        records.check_in_out_dates()
+        records.filtered(lambda r: r.preconfirm and r.state == "draft").confirm()
+        return records
+
+    @api.model
+    def _prepare_nights_and_board_services_vals(self, vals_list):
+        """
+        Add to the values of the reservations the default reservation
+        type and, when they are not given, the nights between checkin and
+        checkout and the services of the board service, so that they are
+        created in batch with the reservations as their computes would do
+        one by one.
+        """
+        board_lines = {}
+        for vals in vals_list:
+            folio = self.env["pms.folio"].browse(vals["folio_id"])
+            if not vals.get("reservation_type"):
+                vals["reservation_type"] = (
+                    folio.reservation_type if folio.reservation_type else "normal"
+                )
+            if (
+                vals.get("checkin")
+                and vals.get("checkout")
+                and "reservation_line_ids" not in vals
+            ):
+                checkin = fields.Date.to_date(vals["checkin"])
+                checkout = fields.Date.to_date(vals["checkout"])
+                vals["reservation_line_ids"] = [
+                    (0, False, {"date": checkin + datetime.timedelta(days=i)})
+                    for i in range(0, (checkout - checkin).days)
+                ]
+            if vals.get("board_service_room_id") and "service_ids" not in vals:
+                board_id = vals["board_service_room_id"]
+                if board_id not in board_lines:
+                    board_lines[board_id] = (
+                        self.env["pms.board.service.room.type"]
+                        .browse(board_id)
+                        .board_service_line_ids
+                    )
+                vals["service_ids"] = [
+                    (
+                        0,
+                        False,
+                        {
+                            "product_id": line.product_id.id,
+                            "is_board_service": True,
+                            "folio_id": folio.id,
+                        },
+                    )
+                    for line in board_lines[board_id]
+                ]
 
     def update_prices(self):
         self.ensure_one()
-        for line in self.reservation_line_ids:
-            line.with_context(force_recompute=True)._compute_price()
+        self.reservation_line_ids.with_context(force_recompute=True)._compute_price()
         self.show_update_pricelist = False
         self.message_post(
             body=_(
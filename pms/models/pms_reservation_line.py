@@ -7,6 +7,8 @@ import logging
 from odoo import _, api, fields, models
 from odoo.exceptions import ValidationError
 
+from .pms_property import AVAILABILITY_LINE_FIELDS
+
 _logger = logging.getLogger(__name__)
 
 
@@ -164,6 +166,8 @@ class PmsReservationLine(models.Model):
 
     @api.depends("reservation_id.room_type_id", "reservation_id.preferred_room_id")
     def _compute_room_id(self):
+        # {reservation: {date: room_id}} of the stays split between rooms
+        split_assignments = {}
         for line in self.filtered("reservation_id.room_type_id").sorted(
             key=lambda r: (r.reservation_id, r.date)
         ):
@@ -259,98 +263,46 @@ class PmsReservationLine(models.Model):
 
                 # the reservation can be allocated into several rooms
                 else:
-                    rooms_ranking = dict()
-
-                    # we go through the rooms of the type
-                    for room in self.env["pms.room"].search(
-                        [
-                            ("room_type_id", "=", reservation.room_type_id.id),
-                            ("pms_property_id", "=", reservation.pms_property_id.id),
-                        ]
-                    ):
-                        # we iterate the dates from the date of the line to the checkout
-                        for date_iterator in [
-                            line.date + datetime.timedelta(days=x)
-                            for x in range(0, (reservation.checkout - line.date).days)
-                        ]:
-                            # if the room is already assigned for
-                            # a date we go to the next room
-                            ids = reservation.reservation_line_ids.ids
-                            if (
-                                self.env["pms.reservation.line"].search_count(
-                                    [
-                                        ("date", "=", date_iterator),
-                                        ("room_id", "=", room.id),
-                                        ("id", "not in", ids),
-                                        ("occupies_availability", "=", True),
-                                    ]
-                                )
-                                > 0
-                            ):
-                                break
-                            # if the room is not assigned for a date we
-                            # add it to the ranking / update its ranking
-                            else:
-                                rooms_ranking[room.id] = (
-                                    1
-                                    if room.id not in rooms_ranking
-                                    else rooms_ranking[room.id] + 1
-                                )
-
-                    if len(rooms_ranking) > 0:
-                        # we get the best score in the ranking
-                        best = max(rooms_ranking.values())
-
-                        # we keep the rooms with the best ranking
-                        bests = {
-                            key: value
-                            for (key, value) in rooms_ranking.items()
-                            if value == best
-                        }
-
-                        # if there is a tie in the rankings
-                        if len(bests) > 1:
-
-                            # we get the line from last night
-                            date_last_night = line.date + datetime.timedelta(days=-1)
-                            line_past_night = self.env["pms.reservation.line"].search(
-                                [
-                                    ("date", "=", date_last_night),
-                                    ("reservation_id", "=", reservation.id),
-                                ]
-                            )
-                            # if there is the night before and if the room
-                            # from the night before is in the ranking
-                            if line_past_night and line_past_night.room_id.id in bests:
-                                line.room_id = line_past_night.room_id.id
-
-                            # if the room from the night before is not in the ranking
-                            # or there is no night before
-                            else:
-                                # At this point we set the room with the best ranking,
-                                # no matter what it is
-                                line.room_id = list(bests.keys())[0]
-
-                        # if there is no tie in the rankings
-                        else:
-                            # At this point we set the room with the best ranking,
-                            # no matter what it is
-                            line.room_id = list(bests.keys())[0]
+                    if line.date not in split_assignments.get(reservation, {}):
+                        # we solve the rooms from this night to the checkout
+                        # starting from the room of last night, if any
+                        date_last_night = line.date + datetime.timedelta(days=-1)
+                        line_past_night = reservation.reservation_line_ids.filtered(
+                            lambda r: r.date == date_last_night
+                        )[:1]
+                        split_assignments[
+                            reservation
+                        ] = line.pms_property_id.get_split_room_assignment(
+                            checkin=line.date,
+                            checkout=reservation.checkout,
+                            room_type_id=reservation.room_type_id.id,
+                            current_lines=reservation.reservation_line_ids.ids,
+                            last_room_id=line_past_night.room_id.id,
+                        )
+                    if line.date in split_assignments[reservation]:
+                        line.room_id = split_assignments[reservation][line.date]
 
     @api.depends("reservation_id.room_type_id", "reservation_id.pricelist_id")
     def _compute_impacts_quota(self):
-        for line in self:
-            reservation = line.reservation_id
-            if isinstance(line.id, int):
-                impacts_quota = False
-            else:
-                impacts_quota = line.impacts_quota
-            line.impacts_quota = self.env["pms.availability.plan"].update_quota(
-                pricelist_id=reservation.pricelist_id,
-                room_type_id=reservation.room_type_id,
-                date=line.date,
-                impacts_quota_id=impacts_quota,
-            )
+        # lines not saved yet (onchanges) never touch the quota
+        for line in self.filtered(lambda r: not isinstance(r.id, int)):
+            line.impacts_quota = line.impacts_quota
+        lines = self.filtered(lambda r: isinstance(r.id, int))
+        # the old value of the field is the rule the line took quota from
+        rule_ids = self.env["pms.availability.plan"].update_quotas(
+            [
+                (
+                    line.reservation_id.pricelist_id.id,
+                    line.reservation_id.room_type_id.id,
+                    line.date,
+                    line.pms_property_id.id,
+                    line.impacts_quota,
+                )
+                for line in lines
+            ]
+        )
+        for line, rule_id in zip(lines, rule_ids):
+            line.impacts_quota = rule_id
 
     @api.depends(
         "reservation_id",
@@ -359,6 +311,14 @@ class PmsReservationLine(models.Model):
         "reservation_id.pms_property_id",
     )
     def _compute_price(self):
+        # {reservation: {date: items}} of the pricelist for the stay
+        stay_items = {}
+        dates_by_reservation = {}
+        for line in self:
+            if line.date:
+                dates_by_reservation.setdefault(line.reservation_id, []).append(
+                    line.date
+                )
         for line in self:
             reservation = line.reservation_id
             if (
@@ -372,6 +332,17 @@ class PmsReservationLine(models.Model):
                 room_type_id = reservation.room_type_id.id
                 product = self.env["pms.room.type"].browse(room_type_id).product_id
                 partner = self.env["res.partner"].browse(reservation.partner_id.id)
+                if reservation not in stay_items:
+                    # the items of every night of the reservation in one query
+                    stay_items[
+                        reservation
+                    ] = reservation.pricelist_id.get_pms_stay_items(
+                        product,
+                        reservation.pms_property_id.id,
+                        dates_by_reservation.get(reservation, []),
+                        reservation.date_order,
+                    )
+                pricelist_item_ids = stay_items[reservation].get(line.date, False)
                 product = product.with_context(
                     lang=partner.lang,
                     partner=partner.id,
@@ -381,9 +352,12 @@ class PmsReservationLine(models.Model):
                     pricelist=reservation.pricelist_id.id,
                     uom=product.uom_id.id,
                     property=reservation.pms_property_id.id,
+                    pricelist_item_ids=pricelist_item_ids,
                 )
                 line.price = self.env["account.tax"]._fix_tax_included_price_company(
-                    line._get_display_price(product),
+                    line.with_context(
+                        pricelist_item_ids=pricelist_item_ids
+                    )._get_display_price(product),
                     product.taxes_id,
                     reservation.tax_ids,
                     reservation.company_id,
@@ -452,28 +426,91 @@ class PmsReservationLine(models.Model):
 
     @api.depends("room_id", "pms_property_id", "date", "occupies_availability")
     def _compute_avail_id(self):
+        avail_keys = {
+            record: (
+                record.room_id.room_type_id.id,
+                record.date,
+                record.pms_property_id.id,
+            )
+            for record in self
+            if record.room_id.room_type_id and record.date and record.pms_property_id
+        }
+        avail_ids = self.env["pms.availability"]._get_or_create_avails(
+            avail_keys.values()
+        )
         for record in self:
-            if record.room_id.room_type_id and record.date and record.pms_property_id:
-                avail = self.env["pms.availability"].search(
-                    [
-                        ("date", "=", record.date),
-                        ("room_type_id", "=", record.room_id.room_type_id.id),
-                        ("pms_property_id", "=", record.pms_property_id.id),
-                    ]
-                )
-                if avail:
-                    record.avail_id = avail.id
-                else:
-                    record.avail_id = self.env["pms.availability"].create(
-                        {
-                            "date": record.date,
-                            "room_type_id": record.room_id.room_type_id.id,
-                            "pms_property_id": record.pms_property_id.id,
-                        }
-                    )
+            if record in avail_keys:
+                record.avail_id = avail_ids[avail_keys[record]]
             else:
                 record.avail_id = False
 
+    # ORM Overrides
+    @api.model_create_multi
+    def create(self, vals_list):
+        records = super().create(vals_list)
+        self.env["pms.property"]._invalidate_availability_cache(
+            records.mapped("pms_property_id").ids
+        )
+        self.env["pms.ari.change"]._register_changes(
+            records._get_ari_cells(), avail=True
+        )
+        return records
+
+    def _write(self, vals):
+        # stored computes (room_id, occupies_availability) are flushed here
+        if not set(vals) & set(AVAILABILITY_LINE_FIELDS):
+            return super()._write(vals)
+        self.env["pms.property"]._invalidate_availability_cache(
+            self.mapped("pms_property_id").ids
+        )
+        cells = self._get_ari_cells()
+        res = super()._write(vals)
+        self.env["pms.ari.change"]._register_changes(
+            cells | self._get_ari_cells(), avail=True
+        )
+        return res
+
+    def unlink(self):
+        cells = self._get_ari_cells()
+        pms_property_ids = self.mapped("pms_property_id").ids
+        res = super().unlink()
+        self.env["pms.property"]._invalidate_availability_cache(pms_property_ids)
+        self.env["pms.ari.change"]._register_changes(cells, avail=True)
+        return res
+
+    def _get_ari_cells(self):
+        """
+        Availability cells (property, room type, date, all plans) that
+        depend on the lines as stored in the database, including the room
+        types that share the physical space of their rooms.
+        """
+        self.env.cr.execute(
+            """
+            SELECT pms_property_id, room_id, date
+            FROM pms_reservation_line
+            WHERE id = ANY(%s) AND room_id IS NOT NULL
+            """,
+            (self.ids,),
+        )
+        rows = self.env.cr.fetchall()
+        room_type_ids = {}
+        for room in self.env["pms.room"].browse({row[1] for row in rows}):
+            related_rooms = room
+            parent = room.parent_id
+            while parent:
+                related_rooms |= parent
+                parent = parent.parent_id
+            children = room.child_ids
+            while children:
+                related_rooms |= children
+                children = children.child_ids
+            room_type_ids[room.id] = related_rooms.room_type_id.ids
+        return {
+            (pms_property_id, room_type_id, date, False)
+            for pms_property_id, room_id, date in rows
+            for room_type_id in room_type_ids[room_id]
+        }
+
     # Constraints and onchanges
     @api.constrains("date")
     def constrains_duplicated_date(self):
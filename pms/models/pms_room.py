@@ -5,6 +5,8 @@
 from odoo import _, api, fields, models
 from odoo.exceptions import ValidationError
 
+from .pms_property import AVAILABILITY_ROOM_FIELDS
+
 
 class PmsRoom(models.Model):
     """The rooms for lodging can be for sleeping, usually called rooms,
@@ -131,6 +133,29 @@ class PmsRoom(models.Model):
             result.append((room.id, name))
         return result
 
+    # ORM Overrides
+    @api.model_create_multi
+    def create(self, vals_list):
+        records = super().create(vals_list)
+        self.env["pms.property"]._invalidate_availability_cache(
+            records.mapped("pms_property_id").ids
+        )
+        return records
+
+    def _write(self, vals):
+        if set(vals) & set(AVAILABILITY_ROOM_FIELDS):
+            pms_property_ids = self.mapped("pms_property_id").ids
+            if vals.get("pms_property_id"):
+                pms_property_ids.append(vals["pms_property_id"])
+            self.env["pms.property"]._invalidate_availability_cache(pms_property_ids)
+        return super()._write(vals)
+
+    def unlink(self):
+        pms_property_ids = self.mapped("pms_property_id").ids
+        res = super().unlink()
+        self.env["pms.property"]._invalidate_availability_cache(pms_property_ids)
+        return res
+
     # Constraints and onchanges
     @api.constrains("capacity")
     def _check_capacity(self):
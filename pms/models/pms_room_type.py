@@ -93,19 +93,25 @@ class PmsRoomType(models.Model):
 
     def name_get(self):
         result = []
+        matrix = {}
+        pms_property = self.env["pms.property"].browse(
+            self._context.get("pms_property_id")
+        )
+        if (
+            self._context.get("checkin")
+            and self._context.get("checkout")
+            and pms_property
+        ):
+            matrix = pms_property.get_availability_matrix(
+                checkin=self._context.get("checkin"),
+                checkout=self._context.get("checkout"),
+                room_type_ids=self.ids,
+                pricelist_id=self._context.get("pricelist_id") or False,
+            )
         for room_type in self:
             name = room_type.name
             if self._context.get("checkin") and self._context.get("checkout"):
-                pms_property = self.env["pms.property"].browse(
-                    self._context.get("pms_property_id")
-                )
-                pms_property = pms_property.with_context(
-                    checkin=self._context.get("checkin"),
-                    checkout=self._context.get("checkout"),
-                    room_type_id=room_type.id,
-                    pricelist_id=self._context.get("pricelist_id") or False,
-                )
-                avail = pms_property.availability
+                avail = matrix.get(room_type.id, {}).get("availability", 0)
                 name += " (%s)" % avail
             result.append((room_type.id, name))
         return result
@@ -194,7 +200,15 @@ class PmsRoomType(models.Model):
                 "type": "service",
             }
         )
-        return super().create(vals)
+        record = super().create(vals)
+        self.env["pms.property"]._trigger_materialize_availability()
+        return record
+
+    def write(self, vals):
+        res = super().write(vals)
+        if "pms_property_ids" in vals:
+            self.env["pms.property"]._trigger_materialize_availability()
+        return res
 
     # def unlink(self):
     #     for record in self:
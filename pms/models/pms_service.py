@@ -312,26 +312,37 @@ class PmsService(models.Model):
                         lines = []
                         day_qty = service._service_day_qty()
                         days_diff = (reservation.checkout - reservation.checkin).days
-                        for i in range(0, days_diff):
-                            if consumed_on == "after":
-                                i += 1
-                            idate = reservation.checkin + timedelta(days=i)
-                            old_line = service.service_line_ids.filtered(
-                                lambda r: r.date == idate
-                            )
-                            price_unit = service._get_price_unit_line(idate)
+                        move_day = 1 if consumed_on == "after" else 0
+                        # the lines are compared by date, so that moving the
+                        # dates of a long stay is linear in its nights, and
+                        # only the new lines are priced, in batch
+                        lines_by_date = {
+                            line.date: line for line in service.service_line_ids
+                        }
+                        dates = [
+                            reservation.checkin + timedelta(days=i + move_day)
+                            for i in range(0, days_diff)
+                        ]
+                        new_dates = [x for x in dates if x not in lines_by_date]
+                        stay_items = service._get_stay_pricelist_items(new_dates)
+                        for idate in dates:
+                            old_line = lines_by_date.get(idate)
                             if old_line and old_line.auto_qty:
-                                lines.append(
-                                    (
-                                        1,
-                                        old_line.id,
-                                        {
-                                            "day_qty": day_qty,
-                                            "auto_qty": True,
-                                        },
+                                if old_line.day_qty != day_qty:
+                                    lines.append(
+                                        (
+                                            1,
+                                            old_line.id,
+                                            {
+                                                "day_qty": day_qty,
+                                                "auto_qty": True,
+                                            },
+                                        )
                                     )
-                                )
                             elif not old_line:
+                                price_unit = service.with_context(
+                                    pricelist_item_ids=stay_items.get(idate, False)
+                                )._get_price_unit_line(idate)
                                 lines.append(
                                     (
                                         0,
@@ -344,9 +355,6 @@ class PmsService(models.Model):
                                         },
                                     )
                                 )
-                        move_day = 0
-                        if consumed_on == "after":
-                            move_day = 1
                         for del_service_id in service.service_line_ids.filtered_domain(
                             [
                                 "|",
@@ -552,6 +560,31 @@ class PmsService(models.Model):
             qty = self.reservation_id.adults
         return qty
 
+    def _get_stay_pricelist_items(self, dates):
+        """
+        Pricelist items of the service for every date, fetched with a single
+        query, to price the lines of a per day service.
+        :return: dict {date: (pricelist id, tuple of item ids)}
+        """
+        self.ensure_one()
+        reservation = self.reservation_id
+        origin = reservation if reservation else self.folio_id
+        if (
+            reservation.reservation_type != "normal"
+            or not origin.pricelist_id
+            or not reservation.pms_property_id
+        ):
+            return {}
+        return origin.pricelist_id.get_pms_stay_items(
+            self.product_id,
+            reservation.pms_property_id.id,
+            dates,
+            self.folio_id.date_order if self.folio_id else fields.Date.today(),
+            board_service=reservation.board_service_room_id.id
+            if self.is_board_service
+            else False,
+        )
+
     def _get_price_unit_line(self, date=False):
         self.ensure_one()
         if self.reservation_id.reservation_type == "normal":
@@ -2,7 +2,7 @@
 # License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl).
 import logging
 
-from odoo import _, api, fields, models
+from odoo import _, api, fields, models, tools
 from odoo.exceptions import ValidationError
 
 _logger = logging.getLogger(__name__)
@@ -47,6 +47,13 @@ class ProductPricelist(models.Model):
         default="daily",
         selection=[("daily", "Daily Plan")],
     )
+    item_storage_mode = fields.Selection(
+        string="Item Storage",
+        help="With Date Ranges, the consecutive days with the same price "
+        "and scope are stored as a single item spanning the run",
+        default="daily",
+        selection=[("daily", "Daily Items"), ("range", "Date Ranges")],
+    )
     pms_sale_channel_ids = fields.Many2many(
         string="Available Channels",
         help="Sale channel for which the pricelist is included",
@@ -65,81 +72,311 @@ class ProductPricelist(models.Model):
         help="Items for which the pricelist is made up",
         check_pms_properties=True,
     )
+    parent_pricelist_id = fields.Many2one(
+        string="Base Pricelist",
+        help="Pricelist whose prices are followed, with the adjustments of "
+        "this pricelist, for the products and dates without their own items",
+        comodel_name="product.pricelist",
+        ondelete="restrict",
+        check_pms_properties=True,
+    )
+    derived_price_discount = fields.Float(
+        string="Discount (%)",
+        help="Percentage taken off the prices of the base pricelist; "
+        "a negative value raises them",
+        digits=(16, 2),
+    )
+    derived_price_surcharge = fields.Float(
+        string="Surcharge",
+        help="Amount added to the discounted price of the base pricelist; "
+        "a negative value lowers it",
+        digits="Product Price",
+    )
+    derived_price_round = fields.Float(
+        string="Rounding",
+        help="The discounted price is rounded to a multiple of this amount, "
+        "before adding the surcharge",
+        digits="Product Price",
+    )
+
+    # ORM Overrides
+    def write(self, vals):
+        res = super().write(vals)
+        if "pms_property_ids" in vals:
+            self.env["pms.rate.grid"]._refresh_rate_grid(pricelist_ids=self.ids)
+        if vals.get("item_storage_mode") == "range":
+            self.item_ids._compact_consumption_runs(keep_items=False)
+        return res
 
     def _compute_price_rule_get_items(
         self, products_qty_partner, date, uom_id, prod_tmpl_ids, prod_ids, categ_ids
     ):
-        board_service = True if self._context.get("board_service") else False
         if (
             "property" in self._context
             and self._context["property"]
             and self._context.get("consumption_date")
         ):
-            self.env.cr.execute(
-                """
-                SELECT item.id
-                FROM   product_pricelist_item item
-                       LEFT JOIN product_category categ
-                            ON item.categ_id = categ.id
-                       LEFT JOIN product_pricelist_pms_property_rel cab
-                            ON item.pricelist_id = cab.product_pricelist_id
-                       LEFT JOIN product_pricelist_item_pms_property_rel lin
-                            ON item.id = lin.product_pricelist_item_id
-                WHERE  (lin.pms_property_id = %s OR lin.pms_property_id IS NULL)
-                   AND (cab.pms_property_id = %s OR cab.pms_property_id IS NULL)
-                   AND (item.product_tmpl_id IS NULL
-                        OR item.product_tmpl_id = ANY(%s))
-                   AND (item.product_id IS NULL OR item.product_id = ANY(%s))
-                   AND (item.categ_id IS NULL OR item.categ_id = ANY(%s))
-                   AND (item.pricelist_id = %s)
-                   AND (item.date_start IS NULL OR item.date_start <=%s)
-                   AND (item.date_end IS NULL OR item.date_end >=%s)
-                   AND (item.date_start_consumption IS NULL
-                        OR item.date_start_consumption <=%s)
-                   AND (item.date_end_consumption IS NULL
-                        OR item.date_end_consumption >=%s)
-                GROUP  BY item.id
-                ORDER  BY item.applied_on,
-                          /* REVIEW: priotrity date sale / date consumption */
-                          item.date_end - item.date_start ASC,
-                          item.date_end_consumption - item.date_start_consumption ASC,
-                          NULLIF((SELECT COUNT(1)
-                           FROM   product_pricelist_item_pms_property_rel l
-                           WHERE  item.id = l.product_pricelist_item_id)
-                          + (SELECT COUNT(1)
-                             FROM   product_pricelist_pms_property_rel c
-                             WHERE  item.pricelist_id = c.product_pricelist_id),0)
-                          NULLS LAST,
-                          item.id DESC;
-                """,
-                (
-                    self._context["property"],
+            # items already fetched for the whole stay
+            stay_items = self._context.get("pricelist_item_ids") or ()
+            stay_item_ids = dict(zip(stay_items[::2], stay_items[1::2]))
+            consumption_date = fields.Date.to_date(self._context["consumption_date"])
+            grid_item_ids = {}
+            if self.id not in stay_item_ids and len(prod_ids) == 1:
+                grid_item_ids = self.env["pms.rate.grid"].get_rate_grid_items(
+                    self.id,
+                    prod_ids[0],
                     self._context["property"],
+                    [consumption_date],
+                    self._context.get("board_service"),
+                )
+            if self.id in stay_item_ids:
+                item_ids = stay_item_ids[self.id]
+            elif grid_item_ids:
+                item_ids = [grid_item_ids[consumption_date]]
+            else:
+                item_ids = self._get_pms_items_by_consumption_date(
                     prod_tmpl_ids,
                     prod_ids,
                     categ_ids,
-                    self.id,
-                    date,
+                    self._context["property"],
                     date,
-                    self._context["consumption_date"],
-                    self._context["consumption_date"],
-                ),
-            )
-            item_ids = [x[0] for x in self.env.cr.fetchall()]
+                    [consumption_date],
+                    self._context.get("board_service"),
+                )[consumption_date]
             items = self.env["product.pricelist.item"].browse(item_ids)
-            if board_service:
-                items = items.filtered(
-                    lambda x: x.board_service_room_type_id.id
-                    == self._context.get("board_service")
-                )
-            else:
-                items = items.filtered(lambda x: not x.board_service_room_type_id.id)
         else:
             items = super(ProductPricelist, self)._compute_price_rule_get_items(
                 products_qty_partner, date, uom_id, prod_tmpl_ids, prod_ids, categ_ids
             )
+        if self.parent_pricelist_id:
+            # the prices without an item of their own follow the base pricelist
+            items |= self._get_derived_pricelist_item()
         return items
 
+    def _get_derived_pricelist_item(self):
+        """
+        Item, never stored, that prices the products with the prices of the
+        base pricelist and the adjustments of the pricelist, so that a change
+        of a base price reaches the derived pricelists without any write.
+        """
+        self.ensure_one()
+        return self.env["product.pricelist.item"].new(
+            {
+                "pricelist_id": self.id,
+                "applied_on": "3_global",
+                "compute_price": "formula",
+                "base": "pricelist",
+                "base_pricelist_id": self.parent_pricelist_id.id,
+                "price_discount": self.derived_price_discount,
+                "price_surcharge": self.derived_price_surcharge,
+                "price_round": self.derived_price_round,
+            }
+        )
+
+    def _compute_derived_price(self, price):
+        """
+        Price of the base pricelist with the adjustments of the pricelist,
+        as the item of _get_derived_pricelist_item computes it.
+        """
+        self.ensure_one()
+        price = price - price * (self.derived_price_discount / 100)
+        if self.derived_price_round:
+            price = tools.float_round(
+                price, precision_rounding=self.derived_price_round
+            )
+        return price + self.derived_price_surcharge
+
+    def _get_derived_pricelists(self):
+        """
+        Pricelists that follow the pricelists, directly or through other
+        derived pricelists.
+        """
+        derived_pricelists = self.browse()
+        pricelists = self
+        while pricelists:
+            pricelists = (
+                self.search([("parent_pricelist_id", "in", pricelists.ids)])
+                - derived_pricelists
+                - self
+            )
+            derived_pricelists |= pricelists
+        return derived_pricelists
+
+    def _get_pms_items_by_consumption_date(
+        self,
+        prod_tmpl_ids,
+        prod_ids,
+        categ_ids,
+        pms_property_id,
+        date,
+        consumption_dates,
+        board_service=False,
+    ):
+        """
+        Items of the pricelist that apply in the property to each consumption
+        date, fetched with a single query for the whole range of dates and
+        sorted by priority. As the priority doesn't depend on the date, the
+        items of each date keep the order of the query.
+        :return: dict {consumption date: tuple of item ids by priority}
+        """
+        self.ensure_one()
+        if self.pms_property_ids and pms_property_id not in self.pms_property_ids.ids:
+            return {consumption_date: () for consumption_date in consumption_dates}
+        self.env["product.pricelist.item"].flush(
+            [
+                "pricelist_id",
+                "product_tmpl_id",
+                "product_id",
+                "categ_id",
+                "applied_on",
+                "date_start",
+                "date_end",
+                "date_start_consumption",
+                "date_end_consumption",
+                "board_service_room_type_id",
+                "pms_property_ids",
+                "pms_property_rank",
+                "consumption_run",
+            ]
+        )
+        self.env.cr.execute(
+            """
+            SELECT item.id, item.date_start_consumption, item.date_end_consumption
+            FROM   product_pricelist_item item
+            WHERE  item.pricelist_id = %(pricelist_id)s
+               AND (item.product_tmpl_id IS NULL
+                    OR item.product_tmpl_id = ANY(%(prod_tmpl_ids)s))
+               AND (item.product_id IS NULL OR item.product_id = ANY(%(prod_ids)s))
+               AND (item.categ_id IS NULL OR item.categ_id = ANY(%(categ_ids)s))
+               AND (item.date_start IS NULL OR item.date_start <= %(date)s)
+               AND (item.date_end IS NULL OR item.date_end >= %(date)s)
+               AND (item.date_start_consumption IS NULL
+                    OR item.date_start_consumption <= %(date_to)s)
+               AND (item.date_end_consumption IS NULL
+                    OR item.date_end_consumption >= %(date_from)s)
+               AND (CASE WHEN %(board_service)s IS NULL
+                         THEN item.board_service_room_type_id IS NULL
+                         ELSE item.board_service_room_type_id = %(board_service)s
+                    END)
+               AND (NOT EXISTS (
+                        SELECT 1
+                        FROM   product_pricelist_item_pms_property_rel lin
+                        WHERE  lin.product_pricelist_item_id = item.id
+                    )
+                    OR EXISTS (
+                        SELECT 1
+                        FROM   product_pricelist_item_pms_property_rel lin
+                        WHERE  lin.product_pricelist_item_id = item.id
+                           AND lin.pms_property_id = %(pms_property_id)s
+                    ))
+            ORDER  BY item.applied_on,
+                      /* REVIEW: priotrity date sale / date consumption */
+                      item.date_end - item.date_start ASC,
+                      /* a run of daily prices has the priority of a day */
+                      CASE WHEN item.consumption_run THEN 0
+                           ELSE item.date_end_consumption
+                                - item.date_start_consumption
+                      END ASC,
+                      NULLIF(item.pms_property_rank, 0) NULLS LAST,
+                      item.id DESC;
+            """,
+            {
+                "pms_property_id": pms_property_id,
+                "prod_tmpl_ids": prod_tmpl_ids,
+                "prod_ids": prod_ids,
+                "categ_ids": categ_ids,
+                "pricelist_id": self.id,
+                "date": date,
+                "date_from": min(consumption_dates),
+                "date_to": max(consumption_dates),
+                "board_service": board_service or None,
+            },
+        )
+        rows = self.env.cr.fetchall()
+        return {
+            consumption_date: tuple(
+                item_id
+                for item_id, date_start, date_end in rows
+                if (not date_start or date_start <= consumption_date)
+                and (not date_end or date_end >= consumption_date)
+            )
+            for consumption_date in consumption_dates
+        }
+
+    def get_pms_stay_items(
+        self, product, pms_property_id, consumption_dates, date, board_service=False
+    ):
+        """
+        Items of the pricelist for the nights of a stay, to price them with
+        a single pricelist query instead of one per night. The nights stored
+        in the rate grid are read from it by key. The items of each
+        night are passed to the price computation in the context key
+        pricelist_item_ids.
+        :param date: sale date, as given in the context key date
+        :return: dict {consumption date: (pricelist id, tuple of item ids)},
+                 followed, for a derived pricelist, by the same pair of each
+                 of its base pricelists
+        """
+        self.ensure_one()
+        if not consumption_dates:
+            return {}
+        consumption_dates = [fields.Date.to_date(x) for x in consumption_dates]
+        stay_items = {
+            consumption_date: (self.id, (item_id,))
+            for consumption_date, item_id in self.env["pms.rate.grid"]
+            .get_rate_grid_items(
+                self.id, product.id, pms_property_id, consumption_dates, board_service
+            )
+            .items()
+        }
+        missing_dates = [x for x in consumption_dates if x not in stay_items]
+        if missing_dates:
+            stay_items.update(
+                self._get_pms_stay_items_by_query(
+                    product, pms_property_id, missing_dates, date, board_service
+                )
+            )
+        if self.parent_pricelist_id:
+            parent_items = self.parent_pricelist_id.get_pms_stay_items(
+                product, pms_property_id, consumption_dates, date, board_service
+            )
+            stay_items = {
+                consumption_date: stay_items[consumption_date]
+                + parent_items[consumption_date]
+                for consumption_date in consumption_dates
+            }
+        return stay_items
+
+    def _get_pms_stay_items_by_query(
+        self, product, pms_property_id, consumption_dates, date, board_service=False
+    ):
+        """
+        Stay items of the nights that are not in the rate grid.
+        """
+        categ_ids = []
+        categ = product.categ_id
+        while categ:
+            categ_ids.append(categ.id)
+            categ = categ.parent_id
+        items_by_date = self._get_pms_items_by_consumption_date(
+            [product.product_tmpl_id.id],
+            [product.id],
+            categ_ids,
+            pms_property_id,
+            date or fields.Datetime.now(),
+            consumption_dates,
+            board_service,
+        )
+        return {
+            consumption_date: (self.id, item_ids)
+            for consumption_date, item_ids in items_by_date.items()
+        }
+
+    @api.constrains("parent_pricelist_id")
+    def _check_parent_pricelist_id(self):
+        if not self._check_recursion(parent="parent_pricelist_id"):
+            raise ValidationError(_("A pricelist can't be derived from itself"))
+
     @api.constrains("pricelist_type", "item_ids", "pms_property_ids")
     def _check_pricelist_type(self):
         for record in self:
@@ -150,7 +387,10 @@ class ProductPricelist(models.Model):
                         or len(item.pms_property_ids) != 1
                         or not item.date_end_consumption
                         or not item.date_start_consumption
-                        or item.date_end_consumption != item.date_start_consumption
+                        or (
+                            item.date_end_consumption != item.date_start_consumption
+                            and not item.consumption_run
+                        )
                     ):
                         raise ValidationError(
                             _(
@@ -1,6 +1,27 @@
 # Copyright 2017  Alexandre Díaz, Pablo Quesada, Darío Lodeiros
 # License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl).
+import datetime
+
 from odoo import api, fields, models
+from odoo.tools import float_compare
+
+# item fields that may split or merge a run of daily prices
+CONSUMPTION_RUN_FIELDS = {
+    "pricelist_id",
+    "applied_on",
+    "product_id",
+    "product_tmpl_id",
+    "categ_id",
+    "board_service_room_type_id",
+    "pms_property_ids",
+    "compute_price",
+    "fixed_price",
+    "min_quantity",
+    "date_start",
+    "date_end",
+    "date_start_consumption",
+    "date_end_consumption",
+}
 
 
 class ProductPricelistItem(models.Model):
@@ -47,6 +68,22 @@ class ProductPricelistItem(models.Model):
         help="Product template associated with the item",
         check_pms_properties=True,
     )
+    pms_property_rank = fields.Integer(
+        string="Property Rank",
+        help="Properties of the item plus properties of its pricelist; "
+        "items restricted to fewer properties have priority and "
+        "items of every property (0) go last",
+        readonly=True,
+        store=True,
+        compute="_compute_pms_property_rank",
+    )
+    consumption_run = fields.Boolean(
+        string="Run of Daily Prices",
+        help="The item stores consecutive days with the same price, "
+        "it has the priority of a daily item",
+        readonly=True,
+        copy=False,
+    )
     allowed_board_service_product_ids = fields.Many2many(
         string="Allowed board service products",
         comodel_name="product.product",
@@ -63,6 +100,26 @@ class ProductPricelistItem(models.Model):
         compute="_compute_allowed_board_service_room_type_ids",
     )
 
+    def init(self):
+        super().init()
+        self._cr.execute(
+            "SELECT indexname FROM pg_indexes WHERE indexname = %s",
+            ("product_pricelist_item_consumption_index",),
+        )
+        if not self._cr.fetchone():
+            self._cr.execute(
+                "CREATE INDEX product_pricelist_item_consumption_index \
+                ON product_pricelist_item \
+                (pricelist_id, date_start_consumption, date_end_consumption)"
+            )
+
+    @api.depends("pms_property_ids", "pricelist_id.pms_property_ids")
+    def _compute_pms_property_rank(self):
+        for record in self:
+            record.pms_property_rank = len(record.pms_property_ids) + len(
+                record.pricelist_id.pms_property_ids
+            )
+
     @api.depends("board_service_room_type_id")
     def _compute_allowed_board_service_product_ids(self):
         for record in self:
@@ -112,3 +169,319 @@ class ProductPricelistItem(models.Model):
                 if domain
                 else False
             )
+
+    # ORM Overrides
+    @api.model_create_multi
+    def create(self, vals_list):
+        records = super().create(vals_list)
+        self.env["pms.ari.change"]._register_changes(
+            records._get_ari_cells(), prices=True
+        )
+        self._refresh_rate_grid_scopes(records._get_rate_grid_scopes())
+        records._compact_consumption_runs()
+        return records
+
+    def write(self, vals):
+        cells = self._get_ari_cells()
+        scopes = self._get_rate_grid_scopes()
+        res = super().write(vals)
+        self.env["pms.ari.change"]._register_changes(
+            cells | self._get_ari_cells(), prices=True
+        )
+        self._refresh_rate_grid_scopes(scopes | self._get_rate_grid_scopes())
+        if CONSUMPTION_RUN_FIELDS.intersection(vals):
+            self._compact_consumption_runs()
+        return res
+
+    def unlink(self):
+        cells = self._get_ari_cells()
+        scopes = self._get_rate_grid_scopes()
+        res = super().unlink()
+        self.env["pms.ari.change"]._register_changes(cells, prices=True)
+        self._refresh_rate_grid_scopes(scopes)
+        return res
+
+    def _get_rate_grid_scopes(self):
+        """
+        Scopes (pricelist, product, date from, date to) of the rate grid
+        that may be won by the items. Only the product items can win a
+        cell; an item without consumption dates competes for every date.
+        """
+        return {
+            (
+                item.pricelist_id.id,
+                item.product_id.id,
+                item.date_start_consumption,
+                item.date_end_consumption,
+            )
+            for item in self
+            if item.applied_on == "0_product_variant" and item.product_id
+        }
+
+    @api.model
+    def _refresh_rate_grid_scopes(self, scopes):
+        """
+        Recompute the rate grid cells of the scopes, merged by pricelist
+        and product. Bulk writers set the skip_rate_grid_refresh context key
+        and refresh the grid once at the end.
+        """
+        if self._context.get("skip_rate_grid_refresh"):
+            return
+        ranges = {}
+        for pricelist_id, product_id, date_from, date_to in scopes:
+            if (pricelist_id, product_id) in ranges:
+                current_from, current_to = ranges[(pricelist_id, product_id)]
+                date_from = current_from and date_from and min(current_from, date_from)
+                date_to = current_to and date_to and max(current_to, date_to)
+            ranges[(pricelist_id, product_id)] = (date_from, date_to)
+        for (pricelist_id, product_id), (date_from, date_to) in ranges.items():
+            self.env["pms.rate.grid"]._refresh_rate_grid(
+                [pricelist_id], [product_id], date_from, date_to
+            )
+
+    def _get_consumption_run_key(self):
+        """
+        Everything but the price and the consumption dates: items with the
+        same key and price on consecutive days belong to the same run.
+        """
+        self.ensure_one()
+        return (
+            self.pricelist_id.id,
+            self.applied_on,
+            self.product_id.id,
+            self.product_tmpl_id.id,
+            self.categ_id.id,
+            self.board_service_room_type_id.id,
+            tuple(sorted(self.pms_property_ids.ids)),
+            self.date_start,
+            self.date_end,
+            self.min_quantity,
+        )
+
+    def _search_consumption_run_items(self, key, date_from, date_to):
+        return self.search(
+            [
+                ("pricelist_id", "=", key[0]),
+                ("product_id", "=", key[2]),
+                ("board_service_room_type_id", "=", key[5]),
+                ("compute_price", "=", "fixed"),
+                ("date_start_consumption", "<=", date_to),
+                ("date_end_consumption", ">=", date_from),
+            ]
+        ).filtered(lambda i: i._get_consumption_run_key() == key)
+
+    def _split_consumption_runs(self):
+        """
+        Remove the days of the items from the runs of the same key, so that
+        a price written for a day inside a run replaces the price of the
+        run for that day only.
+        """
+        one_day = datetime.timedelta(days=1)
+        days_by_key = {}
+        for item in self:
+            days = days_by_key.setdefault(item._get_consumption_run_key(), set())
+            day = item.date_start_consumption
+            while day <= item.date_end_consumption:
+                days.add(day)
+                day += one_day
+        for key, days in days_by_key.items():
+            runs = self._search_consumption_run_items(
+                key, min(days), max(days)
+            ).filtered(lambda i: i.consumption_run and i not in self)
+            for run in runs:
+                segments = []
+                day = run.date_start_consumption
+                while day <= run.date_end_consumption:
+                    if day not in days:
+                        if segments and segments[-1][1] + one_day == day:
+                            segments[-1][1] = day
+                        else:
+                            segments.append([day, day])
+                    day += one_day
+                if not segments:
+                    run.unlink()
+                    continue
+                for segment_start, segment_end in segments[1:]:
+                    run.copy(
+                        {
+                            "date_start_consumption": segment_start,
+                            "date_end_consumption": segment_end,
+                            "consumption_run": True,
+                        }
+                    )
+                if segments[0] != [
+                    run.date_start_consumption,
+                    run.date_end_consumption,
+                ]:
+                    run.write(
+                        {
+                            "date_start_consumption": segments[0][0],
+                            "date_end_consumption": segments[0][1],
+                        }
+                    )
+
+    def _get_consumption_run_segments(self, run_start, run_end, item_by_day):
+        """
+        Split a run between the items that own some of its days: each one
+        spans from its first day up to the next item, the leading days of
+        the run go to the first one.
+        :param item_by_day: dict {date: item winning the date}
+        :return: list of [date from, date to, item]
+        """
+        one_day = datetime.timedelta(days=1)
+        segments = []
+        day = run_start
+        while day <= run_end:
+            item = item_by_day[day]
+            if item in self and item not in [s[2] for s in segments]:
+                segments.append([day, day, item])
+            elif segments:
+                segments[-1][1] = day
+            day += one_day
+        if segments:
+            segments[0][0] = run_start
+        return segments
+
+    def _compact_consumption_runs(self, keep_items=True):
+        """
+        In the pricelists that store date ranges, collapse the consecutive
+        days with the same price and key around the items into a single
+        item spanning the run, removing the other items of the run.
+        :param keep_items: the items themselves are never removed, as the
+                           caller still holds them: each one takes the
+                           consecutive days of the items it absorbs, so a
+                           run with several of them is not collapsed.
+                           Explicit compactions (a pricelist switched to
+                           date ranges, the massive changes wizard) pass
+                           False and collapse the whole runs.
+        """
+        if self._context.get("skip_item_compaction"):
+            return
+        items = (
+            self.exists()
+            .with_context(skip_item_compaction=True)
+            .filtered(
+                lambda i: i.pricelist_id.item_storage_mode == "range"
+                and i.compute_price == "fixed"
+                and i.date_start_consumption
+                and i.date_end_consumption
+            )
+        )
+        if not items:
+            return
+        items._split_consumption_runs()
+        precision = self.env["decimal.precision"].precision_get("Product Price")
+        one_day = datetime.timedelta(days=1)
+        windows = {}
+        for item in items:
+            key = item._get_consumption_run_key()
+            date_from, date_to = windows.get(
+                key, (item.date_start_consumption, item.date_end_consumption)
+            )
+            windows[key] = (
+                min(date_from, item.date_start_consumption),
+                max(date_to, item.date_end_consumption),
+            )
+        to_unlink = items.browse()
+        for key, (date_from, date_to) in windows.items():
+            neighbours = items._search_consumption_run_items(
+                key, date_from - one_day, date_to + one_day
+            )
+            # as in the lookups, the newest item wins a repeated day
+            item_by_day = {}
+            for item in neighbours.sorted("id"):
+                day = item.date_start_consumption
+                while day <= item.date_end_consumption:
+                    item_by_day[day] = item
+                    day += one_day
+            runs = []
+            for day in sorted(item_by_day):
+                item = item_by_day[day]
+                if (
+                    runs
+                    and runs[-1][1] + one_day == day
+                    and not float_compare(
+                        runs[-1][2][0].fixed_price,
+                        item.fixed_price,
+                        precision_digits=precision,
+                    )
+                ):
+                    runs[-1][1] = day
+                    runs[-1][2] |= item
+                else:
+                    runs.append([day, day, item])
+            kept = items.browse()
+            for run_start, run_end, run_items in runs:
+                segments = []
+                if keep_items:
+                    segments = (items - kept)._get_consumption_run_segments(
+                        run_start, run_end, item_by_day
+                    )
+                if not segments:
+                    keep = ((run_items & items) or run_items).sorted("id")[-1]
+                    segments = [[run_start, run_end, keep]]
+                for segment_start, segment_end, keep in segments:
+                    vals = {
+                        "date_start_consumption": segment_start,
+                        "date_end_consumption": segment_end,
+                        "consumption_run": segment_start != segment_end,
+                    }
+                    if keep in kept:
+                        kept |= keep.copy(vals)
+                        continue
+                    kept |= keep
+                    if (
+                        keep.date_start_consumption != segment_start
+                        or keep.date_end_consumption != segment_end
+                        or keep.consumption_run != vals["consumption_run"]
+                    ):
+                        keep.write(vals)
+            to_unlink |= neighbours - kept
+        if keep_items:
+            to_unlink -= self
+        to_unlink.unlink()
+
+    def _get_ari_cells(self):
+        """
+        Cells (property, room type, date, plan) of the consumption dates of
+        the room type items. Items without consumption dates apply to the
+        whole calendar and are not tracked.
+        """
+        cells = set()
+        items = self.filtered(
+            lambda i: i.product_id
+            and i.date_start_consumption
+            and i.date_end_consumption
+        )
+        room_type_ids = {}
+        for room_type in self.env["pms.room.type"].search(
+            [("product_id", "in", items.product_id.ids)]
+        ):
+            room_type_ids.setdefault(room_type.product_id.id, []).append(room_type.id)
+        all_property_ids = False
+        plan_ids_by_pricelist = {}
+        for item in items.filtered(lambda i: i.product_id.id in room_type_ids):
+            property_ids = (
+                item.pms_property_ids.ids or item.pricelist_id.pms_property_ids.ids
+            )
+            if not property_ids:
+                if all_property_ids is False:
+                    all_property_ids = self.env["pms.property"].search([]).ids
+                property_ids = all_property_ids
+            pricelist = item.pricelist_id
+            if pricelist.id not in plan_ids_by_pricelist:
+                # the pricelists derived from the item's pricelist follow its
+                # prices, so the cells of their plans change too
+                plan_ids_by_pricelist[pricelist.id] = set(
+                    (pricelist | pricelist._get_derived_pricelists()).mapped(
+                        lambda p: p.availability_plan_id.id
+                    )
+                )
+            date = item.date_start_consumption
+            while date <= item.date_end_consumption:
+                for pms_property_id in property_ids:
+                    for room_type_id in room_type_ids[item.product_id.id]:
+                        for plan_id in plan_ids_by_pricelist[pricelist.id]:
+                            cells.add((pms_property_id, room_type_id, date, plan_id))
+                date += datetime.timedelta(days=1)
+        return cells
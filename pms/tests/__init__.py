@@ -39,3 +39,10 @@ from . import test_product_template
 from . import test_pms_multiproperty
 from . import test_shared_room
 from . import test_automated_mails
+from . import test_pms_availability
+from . import test_pms_ari_change
+from . import test_pms_inventory_hold
+from . import test_pms_rate_grid
+from . import test_pms_pricelist_benchmark
+from . import test_pms_archived_record
+from . import test_pms_reservation_benchmark
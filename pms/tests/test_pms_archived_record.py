@@ -0,0 +1,135 @@
+import datetime
+
+from odoo import fields
+
+from .common import TestPms
+
+
+class TestPmsArchivedRecord(TestPms):
+    def setUp(self):
+        super().setUp()
+        self.room_type_double = self.env["pms.room.type"].create(
+            {
+                "pms_property_ids": [self.pms_property1.id],
+                "name": "Double Test",
+                "default_code": "DBL_Test",
+                "class_id": self.room_type_class1.id,
+            }
+        )
+        self.availability_plan1 = self.env["pms.availability.plan"].create(
+            {
+                "name": "Availability plan for TEST",
+                "pms_pricelist_ids": [(6, 0, [self.pricelist1.id])],
+            }
+        )
+        self.ArchivedRecord = self.env["pms.archived.record"]
+        self.cutoff = fields.date.today() - datetime.timedelta(days=30)
+
+    def _create_item(self, date):
+        return self.env["product.pricelist.item"].create(
+            {
+                "pricelist_id": self.pricelist1.id,
+                "date_start_consumption": date,
+                "date_end_consumption": date,
+                "compute_price": "fixed",
+                "applied_on": "0_product_variant",
+                "product_id": self.room_type_double.product_id.id,
+                "fixed_price": 50.0,
+                "pms_property_ids": [self.pms_property1.id],
+            }
+        )
+
+    def test_archive_past_items_and_rules(self):
+        """
+        Check that the items and rules consumed before the cutoff leave
+        their tables and that the recent ones stay.
+        ----------------
+        Create an item and a rule before the cutoff and an item after it.
+        """
+        # ARRANGE
+        old_date = self.cutoff - datetime.timedelta(days=1)
+        old_item = self._create_item(old_date)
+        recent_item = self._create_item(self.cutoff)
+        old_rule = self.env["pms.availability.plan.rule"].create(
+            {
+                "availability_plan_id": self.availability_plan1.id,
+                "room_type_id": self.room_type_double.id,
+                "date": old_date,
+                "pms_property_id": self.pms_property1.id,
+            }
+        )
+
+        # ACT
+        self.ArchivedRecord.archive_records(self.cutoff)
+
+        # ASSERT
+        self.assertFalse(old_item.exists(), "The past item should be archived")
+        self.assertFalse(old_rule.exists(), "The past rule should be archived")
+        self.assertTrue(recent_item.exists(), "The recent item should stay")
+        self.assertEqual(
+            set(self.ArchivedRecord.search([]).mapped("res_id")),
+            {old_item.id, old_rule.id},
+            "The archive should keep the past item and rule",
+        )
+
+    def test_restore_archived_item(self):
+        """
+        Check that a restored item gets back its id, values and properties.
+        ----------------
+        Archive a past item and restore it.
+        """
+        # ARRANGE
+        item = self._create_item(self.cutoff - datetime.timedelta(days=1))
+        item_id = item.id
+        self.ArchivedRecord.archive_records(self.cutoff)
+        archived = self.ArchivedRecord.search(
+            [("res_model", "=", "product.pricelist.item"), ("res_id", "=", item_id)]
+        )
+
+        # ACT
+        archived.action_restore()
+
+        # ASSERT
+        restored = self.env["product.pricelist.item"].browse(item_id)
+        self.assertTrue(restored.exists(), "The item should be restored")
+        self.assertEqual(
+            (restored.fixed_price, restored.pms_property_ids),
+            (50.0, self.pms_property1),
+            "The restored item should keep its price and properties",
+        )
+        self.assertFalse(archived.exists(), "The archive record should be removed")
+
+    def test_archive_and_restore_follow_item_hooks(self):
+        """
+        Check that archiving an item registers its price change and that
+        restoring it computes again its property rank.
+        ----------------
+        Archive a past item, restrict its pricelist to the property and
+        restore the item.
+        """
+        # ARRANGE
+        old_date = self.cutoff - datetime.timedelta(days=1)
+        item = self._create_item(old_date)
+        item_id = item.id
+        AriChange = self.env["pms.ari.change"]
+        AriChange.acknowledge_changes(AriChange.get_pending_changes())
+
+        # ACT & ASSERT
+        self.ArchivedRecord.archive_records(self.cutoff)
+        self.assertIn(
+            (self.room_type_double.id, old_date, True),
+            {
+                (c["room_type_id"], c["date"], c["price_changed"])
+                for c in AriChange.get_pending_changes(self.pms_property1.id)
+            },
+            "The archived item should register a price change",
+        )
+        self.pricelist1.pms_property_ids = [(6, 0, [self.pms_property1.id])]
+        self.ArchivedRecord.search(
+            [("res_model", "=", "product.pricelist.item"), ("res_id", "=", item_id)]
+        ).action_restore()
+        self.assertEqual(
+            self.env["product.pricelist.item"].browse(item_id).pms_property_rank,
+            2,
+            "The property rank should count the properties of the pricelist",
+        )
@@ -0,0 +1,245 @@
+import datetime
+
+from odoo import fields
+
+from .common import TestPms
+
+
+class TestPmsAriChange(TestPms):
+    def setUp(self):
+        super().setUp()
+        self.room_type_double = self.env["pms.room.type"].create(
+            {
+                "pms_property_ids": [self.pms_property1.id],
+                "name": "Double Test",
+                "default_code": "DBL_Test",
+                "class_id": self.room_type_class1.id,
+            }
+        )
+        self.room = self.env["pms.room"].create(
+            {
+                "pms_property_id": self.pms_property1.id,
+                "name": "Double 201",
+                "room_type_id": self.room_type_double.id,
+                "capacity": 2,
+            }
+        )
+        self.partner1 = self.env["res.partner"].create({"name": "Brais"})
+        self.AriChange = self.env["pms.ari.change"]
+        self.AriChange.acknowledge_changes(self.AriChange.get_pending_changes())
+
+    def _pending_cells(self):
+        return {
+            (c["room_type_id"], c["date"], c["availability_plan_id"]): c
+            for c in self.AriChange.get_pending_changes(self.pms_property1.id)
+        }
+
+    def test_reservation_changes_coalesced_per_cell(self):
+        """
+        Check that the nights of a reservation are registered once per
+        availability cell, even when the reservation is modified again.
+        ----------------
+        Create a 3 nights reservation and cancel it afterwards. There must
+        be exactly one pending availability change for each night.
+        """
+        # ARRANGE
+        checkin = fields.date.today()
+        checkout = checkin + datetime.timedelta(days=3)
+
+        # ACT
+        reservation = self.env["pms.reservation"].create(
+            {
+                "partner_id": self.partner1.id,
+                "room_type_id": self.room_type_double.id,
+                "checkin": checkin,
+                "checkout": checkout,
+                "pms_property_id": self.pms_property1.id,
+            }
+        )
+        reservation.action_cancel()
+
+        # ASSERT
+        cells = self._pending_cells()
+        expected = {
+            (self.room_type_double.id, checkin + datetime.timedelta(days=x), None)
+            for x in range(3)
+        }
+        self.assertEqual(
+            set(cells), expected, "Each night should be a single pending change"
+        )
+        self.assertTrue(
+            all(c["avail_changed"] for c in cells.values()),
+            "The changes should be flagged as availability changes",
+        )
+
+    def test_acknowledge_keeps_newer_changes(self):
+        """
+        Check that acknowledging changes keeps the cells changed after
+        they were read.
+        ----------------
+        Read the pending changes of a rule, modify the rule and acknowledge
+        the changes read. The rule cell must still be pending, flagged as
+        a restriction change.
+        """
+        # ARRANGE
+        plan = self.env["pms.availability.plan"].create(
+            {
+                "name": "Availability plan for TEST",
+                "pms_pricelist_ids": [(6, 0, [self.pricelist1.id])],
+            }
+        )
+        rule = self.env["pms.availability.plan.rule"].create(
+            {
+                "availability_plan_id": plan.id,
+                "room_type_id": self.room_type_double.id,
+                "date": fields.date.today(),
+                "pms_property_id": self.pms_property1.id,
+            }
+        )
+        changes = self.AriChange.get_pending_changes(self.pms_property1.id)
+
+        # ACT
+        rule.closed = True
+        self.AriChange.acknowledge_changes(changes)
+
+        # ASSERT
+        cells = self._pending_cells()
+        self.assertEqual(
+            list(cells),
+            [(self.room_type_double.id, fields.date.today(), plan.id)],
+            "The rule changed after reading should stay pending",
+        )
+        self.assertTrue(
+            cells[(self.room_type_double.id, fields.date.today(), plan.id)][
+                "restrictions_changed"
+            ],
+            "The change should be flagged as a restriction change",
+        )
+
+    def test_acknowledge_keeps_late_committed_changes(self):
+        """
+        Check that acknowledging changes keeps a change committed after
+        the read with a lower seq than the changes read.
+        ----------------
+        Read the pending change of a rule, change another rule and give
+        its change a seq below the read one, as a transaction that took
+        its seq before the read and committed after it would. Acknowledge
+        the changes read: the other rule change must still be pending.
+        """
+        # ARRANGE
+        plan = self.env["pms.availability.plan"].create(
+            {
+                "name": "Availability plan for TEST",
+                "pms_pricelist_ids": [(6, 0, [self.pricelist1.id])],
+            }
+        )
+        tomorrow = fields.date.today() + datetime.timedelta(days=1)
+        self.env["pms.availability.plan.rule"].create(
+            {
+                "availability_plan_id": plan.id,
+                "room_type_id": self.room_type_double.id,
+                "date": fields.date.today(),
+                "pms_property_id": self.pms_property1.id,
+            }
+        )
+        changes = self.AriChange.get_pending_changes(self.pms_property1.id)
+        self.env["pms.availability.plan.rule"].create(
+            {
+                "availability_plan_id": plan.id,
+                "room_type_id": self.room_type_double.id,
+                "date": tomorrow,
+                "pms_property_id": self.pms_property1.id,
+            }
+        ).flush()
+        self.env.cr.execute(
+            "UPDATE pms_ari_change SET seq = %s WHERE date = %s",
+            (min(c["seq"] for c in changes) - 1, tomorrow),
+        )
+
+        # ACT
+        self.AriChange.acknowledge_changes(changes)
+
+        # ASSERT
+        self.assertEqual(
+            list(self._pending_cells()),
+            [(self.room_type_double.id, tomorrow, plan.id)],
+            "The change committed after reading should stay pending",
+        )
+
+    def test_pricelist_item_change_by_consumption_date(self):
+        """
+        Check that a daily price registers a price change for its
+        consumption date.
+        ----------------
+        Create a fixed price item for the room type and tomorrow.
+        """
+        # ARRANGE
+        tomorrow = fields.date.today() + datetime.timedelta(days=1)
+
+        # ACT
+        self.env["product.pricelist.item"].create(
+            {
+                "pricelist_id": self.pricelist1.id,
+                "product_id": self.room_type_double.product_id.id,
+                "date_start_consumption": tomorrow,
+                "date_end_consumption": tomorrow,
+                "compute_price": "fixed",
+                "applied_on": "0_product_variant",
+                "fixed_price": 60.0,
+                "pms_property_ids": [self.pms_property1.id],
+            }
+        )
+
+        # ASSERT
+        cells = self._pending_cells()
+        plan_id = self.pricelist1.availability_plan_id.id or None
+        self.assertTrue(
+            cells[(self.room_type_double.id, tomorrow, plan_id)]["price_changed"],
+            "The item consumption date should be a pending price change",
+        )
+
+    def test_base_pricelist_item_change_reaches_derived_plans(self):
+        """
+        Check that a daily price of a base pricelist registers a price
+        change for the availability plan of the pricelists derived from it.
+        ----------------
+        Create a pricelist derived from pricelist1 with its own availability
+        plan, then a fixed price item of pricelist1 for tomorrow.
+        """
+        # ARRANGE
+        tomorrow = fields.date.today() + datetime.timedelta(days=1)
+        derived_plan = self.env["pms.availability.plan"].create(
+            {"name": "Non refundable plan"}
+        )
+        self.env["product.pricelist"].create(
+            {
+                "name": "Non refundable",
+                "pms_property_ids": [self.pms_property1.id],
+                "parent_pricelist_id": self.pricelist1.id,
+                "derived_price_discount": 10.0,
+                "availability_plan_id": derived_plan.id,
+            }
+        )
+
+        # ACT
+        self.env["product.pricelist.item"].create(
+            {
+                "pricelist_id": self.pricelist1.id,
+                "product_id": self.room_type_double.product_id.id,
+                "date_start_consumption": tomorrow,
+                "date_end_consumption": tomorrow,
+                "compute_price": "fixed",
+                "applied_on": "0_product_variant",
+                "fixed_price": 60.0,
+                "pms_property_ids": [self.pms_property1.id],
+            }
+        )
+
+        # ASSERT
+        cells = self._pending_cells()
+        self.assertTrue(
+            cells[(self.room_type_double.id, tomorrow, derived_plan.id)][
+                "price_changed"
+            ],
+            "The derived pricelist plan should have a pending price change",
+        )
@@ -0,0 +1,573 @@
+import datetime
+
+from odoo import fields
+
+from .common import TestPms
+
+
+class TestPmsAvailability(TestPms):
+    def setUp(self):
+        super().setUp()
+        self.room_type_double = self.env["pms.room.type"].create(
+            {
+                "pms_property_ids": [self.pms_property1.id],
+                "name": "Double Test",
+                "default_code": "DBL_Test",
+                "class_id": self.room_type_class1.id,
+            }
+        )
+        self.rooms = self.env["pms.room"]
+        for i in range(3):
+            self.rooms |= self.env["pms.room"].create(
+                {
+                    "pms_property_id": self.pms_property1.id,
+                    "name": "Double 20%s" % i,
+                    "room_type_id": self.room_type_double.id,
+                    "capacity": 2,
+                }
+            )
+        self.partner1 = self.env["res.partner"].create({"name": "Antón"})
+
+    def _create_stay(self, nights, checkin=False):
+        checkin = checkin or fields.date.today()
+        checkout = checkin + datetime.timedelta(days=nights)
+        for room in self.rooms[:2]:
+            self.env["pms.reservation"].create(
+                {
+                    "partner_id": self.partner1.id,
+                    "preferred_room_id": room.id,
+                    "checkin": checkin,
+                    "checkout": checkout,
+                    "pms_property_id": self.pms_property1.id,
+                }
+            )
+        self.env["base"].flush()
+        return self.env["pms.availability"].search(
+            [
+                ("room_type_id", "=", self.room_type_double.id),
+                ("date", ">=", checkin),
+                ("date", "<", checkout),
+            ]
+        )
+
+    def test_real_avail_with_rooms_occupied(self):
+        """
+        Check the real availability of the nights of a stay
+        ----------------
+        Create two reservations of two nights in two of the three double
+        rooms and check that the real avail of those nights is 1
+        """
+        # ARRANGE & ACT
+        avails = self._create_stay(nights=2)
+
+        # ASSERT
+        self.assertEqual(
+            avails.mapped("real_avail"),
+            [1, 1],
+            "The real avail should discount the occupied rooms",
+        )
+
+    def test_real_avail_query_count_by_records(self):
+        """
+        Check that the real availability is recomputed with the same number
+        of queries regardless of the number of availability records
+        ----------------
+        Recompute the real avail of the nights of a 2 nights stay and of
+        a 30 nights stay, and check that both need the same queries
+        """
+        # ARRANGE
+        short_avails = self._create_stay(nights=2)
+        long_avails = self._create_stay(
+            nights=30, checkin=fields.date.today() + datetime.timedelta(days=2)
+        )
+        queries = []
+
+        # ACT
+        for avails in (short_avails, long_avails):
+            self.env["base"].invalidate_cache()
+            queries_before = self.env.cr.sql_log_count
+            avails._compute_real_avail()
+            queries.append(self.env.cr.sql_log_count - queries_before)
+
+        # ASSERT
+        self.assertEqual(
+            queries[0],
+            queries[1],
+            "The real avail recompute should not depend on the number of records",
+        )
+
+    def test_get_or_create_avails(self):
+        """
+        Check that the availability records are got or created in batch
+        ----------------
+        Create the availability of today, then ask for the availability
+        of the next 14 days and check that the existing record is reused
+        and that one record is created for each of the other days
+        """
+        # ARRANGE
+        today = fields.date.today()
+        Avail = self.env["pms.availability"]
+        avail_today = Avail.create(
+            {
+                "room_type_id": self.room_type_double.id,
+                "date": today,
+                "pms_property_id": self.pms_property1.id,
+            }
+        )
+        keys = [
+            (
+                self.room_type_double.id,
+                today + datetime.timedelta(days=x),
+                self.pms_property1.id,
+            )
+            for x in range(14)
+        ]
+
+        # ACT
+        avail_ids = Avail._get_or_create_avails(keys)
+
+        # ASSERT
+        self.assertEqual(
+            avail_ids[keys[0]],
+            avail_today.id,
+            "The existing availability should be reused",
+        )
+        self.assertEqual(
+            Avail.search_count(
+                [
+                    ("room_type_id", "=", self.room_type_double.id),
+                    ("pms_property_id", "=", self.pms_property1.id),
+                ]
+            ),
+            14,
+            "One availability should exist for each day",
+        )
+        self.assertEqual(
+            Avail._get_or_create_avails(keys),
+            avail_ids,
+            "Getting the availabilities again should not create new ones",
+        )
+        self.assertEqual(
+            Avail.browse(avail_ids[keys[1]]).real_avail,
+            3,
+            "The real avail of the created availability should be computed",
+        )
+
+    def test_materialize_availability(self):
+        """
+        Check that the availability calendar is created in advance
+        ----------------
+        Materialize 90 days of availability of the property (more than one
+        chunk), then do it again and check that there is exactly one
+        availability for each day from today
+        """
+        # ACT
+        self.pms_property1.materialize_availability(
+            horizon_days=90, room_type_ids=self.room_type_double.ids
+        )
+        self.pms_property1.materialize_availability(
+            horizon_days=90, room_type_ids=self.room_type_double.ids
+        )
+
+        # ASSERT
+        avails = self.env["pms.availability"].search(
+            [
+                ("room_type_id", "=", self.room_type_double.id),
+                ("pms_property_id", "=", self.pms_property1.id),
+            ]
+        )
+        today = fields.date.today()
+        self.assertEqual(
+            sorted(avails.mapped("date")),
+            [today + datetime.timedelta(days=x) for x in range(90)],
+            "The availability calendar should cover the horizon once",
+        )
+        self.assertEqual(
+            set(avails.mapped("real_avail")),
+            {3},
+            "The real avail of the materialized calendar should be computed",
+        )
+
+    def test_split_room_assignment_min_changes(self):
+        """
+        Check that a stay that can't be allocated in a single room is split
+        between rooms with the least number of room changes
+        ----------------
+        Occupy room A the last two nights, room B the first night and
+        room C the two nights in the middle of a 4 nights stay. The stay
+        can be allocated with a single room change.
+        """
+        # ARRANGE
+        today = fields.date.today()
+        room_a, room_b, room_c = self.rooms
+        for room, first_night, nights in (
+            (room_a, 2, 2),
+            (room_b, 0, 1),
+            (room_c, 1, 2),
+        ):
+            checkin = today + datetime.timedelta(days=first_night)
+            self.env["pms.reservation"].create(
+                {
+                    "partner_id": self.partner1.id,
+                    "preferred_room_id": room.id,
+                    "checkin": checkin,
+                    "checkout": checkin + datetime.timedelta(days=nights),
+                    "pms_property_id": self.pms_property1.id,
+                }
+            )
+
+        # ACT
+        assignment = self.pms_property1.get_split_room_assignment(
+            checkin=today,
+            checkout=today + datetime.timedelta(days=4),
+            room_type_id=self.room_type_double.id,
+        )
+
+        # ASSERT
+        rooms = [assignment[today + datetime.timedelta(days=x)] for x in range(4)]
+        self.assertEqual(
+            sum(1 for x in range(3) if rooms[x] != rooms[x + 1]),
+            1,
+            "The stay should be split with a single room change",
+        )
+        not_avail = self.env["pms.availability"].get_occupied_room_dates(
+            checkin=today,
+            checkout=today + datetime.timedelta(days=4),
+            pms_property_id=self.pms_property1.id,
+        )
+        for date, room_id in assignment.items():
+            self.assertNotIn(
+                date,
+                not_avail.get(room_id, set()),
+                "The stay should only be assigned to free rooms",
+            )
+
+    def test_split_room_assignment_keeps_last_night_room(self):
+        """
+        Check that the split assignment keeps the room of the night before
+        when it is as good as any other
+        ----------------
+        Occupy room A the first night of a 2 nights stay, so rooms B and
+        C are free for both nights. Starting from room C the night
+        before, the stay must stay in room C.
+        """
+        # ARRANGE
+        today = fields.date.today()
+        room_a, room_b, room_c = self.rooms
+        self.env["pms.reservation"].create(
+            {
+                "partner_id": self.partner1.id,
+                "preferred_room_id": room_a.id,
+                "checkin": today,
+                "checkout": today + datetime.timedelta(days=1),
+                "pms_property_id": self.pms_property1.id,
+            }
+        )
+
+        # ACT
+        assignment = self.pms_property1.get_split_room_assignment(
+            checkin=today,
+            checkout=today + datetime.timedelta(days=2),
+            room_type_id=self.room_type_double.id,
+            last_room_id=room_c.id,
+        )
+
+        # ASSERT
+        self.assertEqual(
+            set(assignment.values()),
+            {room_c.id},
+            "The room of the night before should be kept",
+        )
+
+    def test_availability_cache_hit_and_invalidation(self):
+        """
+        Check that the availability of a stay is served from the cache
+        until a reservation line of the property changes
+        ----------------
+        Ask twice for the availability of the same stay, then book a room
+        and ask again. The second answer must be a cache hit and the third
+        a miss reflecting the new reservation.
+        """
+        # ARRANGE
+        checkin = fields.date.today()
+        checkout = checkin + datetime.timedelta(days=2)
+        Property = self.env["pms.property"]
+
+        # ACT & ASSERT
+        self.pms_property1.get_availability_matrix(
+            checkin, checkout, [self.room_type_double.id]
+        )
+        stats = Property.get_availability_cache_stats()
+        matrix = self.pms_property1.get_availability_matrix(
+            checkin, checkout, [self.room_type_double.id]
+        )
+        self.assertEqual(
+            Property.get_availability_cache_stats()["hits"],
+            stats["hits"] + 1,
+            "The same stay should be served from the cache",
+        )
+        self.assertEqual(matrix[self.room_type_double.id]["availability"], 3)
+        self.env["pms.reservation"].create(
+            {
+                "partner_id": self.partner1.id,
+                "room_type_id": self.room_type_double.id,
+                "checkin": checkin,
+                "checkout": checkout,
+                "pms_property_id": self.pms_property1.id,
+            }
+        )
+        stats = Property.get_availability_cache_stats()
+        matrix = self.pms_property1.get_availability_matrix(
+            checkin, checkout, [self.room_type_double.id]
+        )
+        self.assertEqual(
+            Property.get_availability_cache_stats()["misses"],
+            stats["misses"] + 1,
+            "A new reservation should invalidate the cache",
+        )
+        self.assertEqual(
+            matrix[self.room_type_double.id]["availability"],
+            2,
+            "The cached availability should reflect the new reservation",
+        )
+
+    def test_availability_cache_invalidated_by_property(self):
+        """
+        Check that a change in a property only drops the cached
+        availability of that property
+        ----------------
+        Ask for the availability of a stay in two properties, add a room to
+        the first one and ask again. The first property must be a miss and
+        the second one a hit.
+        """
+        # ARRANGE
+        checkin = fields.date.today()
+        checkout = checkin + datetime.timedelta(days=2)
+        Property = self.env["pms.property"]
+        pms_property2 = Property.create(
+            {
+                "name": "Property 2",
+                "company_id": self.company1.id,
+                "default_pricelist_id": self.pricelist1.id,
+            }
+        )
+        for pms_property in self.pms_property1 | pms_property2:
+            pms_property.get_availability_matrix(
+                checkin, checkout, [self.room_type_double.id]
+            )
+
+        # ACT
+        self.env["pms.room"].create(
+            {
+                "pms_property_id": self.pms_property1.id,
+                "name": "Double 210",
+                "room_type_id": self.room_type_double.id,
+                "capacity": 2,
+            }
+        )
+        stats = Property.get_availability_cache_stats()
+        matrix = self.pms_property1.get_availability_matrix(
+            checkin, checkout, [self.room_type_double.id]
+        )
+        pms_property2.get_availability_matrix(
+            checkin, checkout, [self.room_type_double.id]
+        )
+
+        # ASSERT
+        self.assertEqual(
+            Property.get_availability_cache_stats(),
+            {"hits": stats["hits"] + 1, "misses": stats["misses"] + 1},
+            "Only the property of the new room should be computed again",
+        )
+        self.assertEqual(
+            matrix[self.room_type_double.id]["availability"],
+            4,
+            "The availability should count the new room",
+        )
+
+    def test_iter_ari_rows(self):
+        """
+        Check the availability, price and restrictions exported for a
+        room type and night
+        ----------------
+        Book one of the three rooms tomorrow, then close the arrivals of
+        the room type that night and set a fixed price for it. The row of
+        tomorrow must have 2 rooms available, the price and the closed
+        arrival, also when the rows are fetched in batches smaller than
+        the range.
+        """
+        # ARRANGE
+        tomorrow = fields.date.today() + datetime.timedelta(days=1)
+        self.env["pms.reservation"].create(
+            {
+                "partner_id": self.partner1.id,
+                "preferred_room_id": self.rooms[0].id,
+                "checkin": tomorrow,
+                "checkout": tomorrow + datetime.timedelta(days=1),
+                "pms_property_id": self.pms_property1.id,
+            }
+        )
+        plan = self.env["pms.availability.plan"].create(
+            {
+                "name": "Availability plan for TEST",
+                "pms_pricelist_ids": [(6, 0, [self.pricelist1.id])],
+            }
+        )
+        self.env["pms.availability.plan.rule"].create(
+            {
+                "availability_plan_id": plan.id,
+                "room_type_id": self.room_type_double.id,
+                "date": tomorrow,
+                "closed_arrival": True,
+                "pms_property_id": self.pms_property1.id,
+            }
+        )
+        self.env["product.pricelist.item"].create(
+            {
+                "pricelist_id": self.pricelist1.id,
+                "product_id": self.room_type_double.product_id.id,
+                "date_start_consumption": tomorrow,
+                "date_end_consumption": tomorrow,
+                "compute_price": "fixed",
+                "applied_on": "0_product_variant",
+                "fixed_price": 60.0,
+                "pms_property_ids": [self.pms_property1.id],
+            }
+        )
+
+        # ACT
+        rows = list(
+            self.pms_property1.iter_ari_rows(
+                self.pricelist1,
+                fields.date.today(),
+                fields.date.today() + datetime.timedelta(days=6),
+                batch_size=2,
+            )
+        )
+
+        # ASSERT
+        row = [
+            r
+            for r in rows
+            if r["room_type_id"] == self.room_type_double.id
+            and r["date"] == fields.Date.to_string(tomorrow)
+        ][0]
+        self.assertEqual(
+            len([r for r in rows if r["room_type_id"] == self.room_type_double.id]),
+            7,
+            "There should be a row for each night of the range",
+        )
+        self.assertEqual(row["plan_avail"], 2, "Wrong exported availability")
+        self.assertEqual(row["price"], 60.0, "Wrong exported price")
+        self.assertTrue(row["closed_arrival"], "Wrong exported restriction")
+
+    def test_iter_ari_rows_derived_pricelist(self):
+        """
+        Check that the price exported for a derived pricelist follows its
+        base pricelist with the adjustments.
+        ----------------
+        Set a fixed price of 50 for tomorrow in pricelist1 and derive a
+        pricelist from it with a 10% discount and a surcharge of 2. The
+        exported price of tomorrow must be 47, and a night with its own
+        price in the derived pricelist must keep it.
+        """
+        # ARRANGE
+        tomorrow = fields.date.today() + datetime.timedelta(days=1)
+        derived_pricelist = self.env["product.pricelist"].create(
+            {
+                "name": "Non refundable",
+                "pms_property_ids": [self.pms_property1.id],
+                "parent_pricelist_id": self.pricelist1.id,
+                "derived_price_discount": 10.0,
+                "derived_price_surcharge": 2.0,
+            }
+        )
+        for pricelist, date, price in (
+            (self.pricelist1, tomorrow, 50.0),
+            (self.pricelist1, fields.date.today(), 50.0),
+            (derived_pricelist, fields.date.today(), 30.0),
+        ):
+            self.env["product.pricelist.item"].create(
+                {
+                    "pricelist_id": pricelist.id,
+                    "product_id": self.room_type_double.product_id.id,
+                    "date_start_consumption": date,
+                    "date_end_consumption": date,
+                    "compute_price": "fixed",
+                    "applied_on": "0_product_variant",
+                    "fixed_price": price,
+                    "pms_property_ids": [self.pms_property1.id],
+                }
+            )
+
+        # ACT
+        rows = list(
+            self.pms_property1.iter_ari_rows(
+                derived_pricelist,
+                fields.date.today(),
+                tomorrow,
+                batch_size=1,
+            )
+        )
+
+        # ASSERT
+        prices = {
+            r["date"]: r["price"]
+            for r in rows
+            if r["room_type_id"] == self.room_type_double.id
+        }
+        self.assertEqual(
+            prices[fields.Date.to_string(tomorrow)],
+            47.0,
+            "The price should follow the base pricelist with the adjustments",
+        )
+        self.assertEqual(
+            prices[fields.Date.to_string(fields.date.today())],
+            30.0,
+            "The own price of the derived pricelist should be kept",
+        )
+
+    def test_iter_ari_rows_price_priority(self):
+        """
+        Check that the exported price is the one of the item that prices
+        the reservations.
+        ----------------
+        Set a fixed price of 60 for tomorrow and then a fixed price of 80
+        for the whole week. The daily price has the priority, although the
+        week item is newer, so the exported price of tomorrow must be 60.
+        """
+        # ARRANGE
+        tomorrow = fields.date.today() + datetime.timedelta(days=1)
+        for date_from, date_to, price in (
+            (tomorrow, tomorrow, 60.0),
+            (fields.date.today(), tomorrow + datetime.timedelta(days=5), 80.0),
+        ):
+            self.env["product.pricelist.item"].create(
+                {
+                    "pricelist_id": self.pricelist1.id,
+                    "product_id": self.room_type_double.product_id.id,
+                    "date_start_consumption": date_from,
+                    "date_end_consumption": date_to,
+                    "compute_price": "fixed",
+                    "applied_on": "0_product_variant",
+                    "fixed_price": price,
+                    "pms_property_ids": [self.pms_property1.id],
+                }
+            )
+
+        # ACT
+        rows = list(
+            self.pms_property1.iter_ari_rows(
+                self.pricelist1,
+                tomorrow,
+                tomorrow,
+            )
+        )
+
+        # ASSERT
+        row = [r for r in rows if r["room_type_id"] == self.room_type_double.id][0]
+        self.assertEqual(
+            row["price"],
+            60.0,
+            "The exported price should be the one of the daily item",
+        )
@@ -1,4 +1,5 @@
 import datetime
+import random
 
 from odoo import fields
 from odoo.exceptions import ValidationError
@@ -654,3 +655,336 @@ class TestPmsRoomTypeAvailabilityRules(TestPms):
             rule.quota,
             "The quota should be restored after changing the reservation's pricelist",
         )
+
+    def test_sql_restrictions_match_any_rule_applies(self):
+        """
+        Check that the SQL evaluation of the availability plan rules gives
+        the same result as any_rule_applies for any rule and any stay.
+        ---------------------
+        Rules with random restrictions are created for 30 days for the two
+        room types of the property. For 100 random stays, every rule
+        evaluated by get_rule_restrictions must give the same result as
+        any_rule_applies and the blocked room types must be the ones with any
+        rule that applies.
+        """
+        # ARRANGE
+        rnd = random.Random(42)
+        today = fields.date.today()
+        plan = self.test_room_type_availability1
+        for room_type in self.test_room_type_single | self.test_room_type_double:
+            for day in range(30):
+                min_stay = rnd.choice([0, 0, 1, 2, 3, 5])
+                min_stay_arrival = rnd.choice([0, 0, 1, 2, 4])
+                self.env["pms.availability.plan.rule"].create(
+                    {
+                        "availability_plan_id": plan.id,
+                        "room_type_id": room_type.id,
+                        "date": today + datetime.timedelta(days=day),
+                        "pms_property_id": self.pms_property3.id,
+                        "min_stay": min_stay,
+                        "max_stay": rnd.choice([0, 0, min_stay + rnd.randint(0, 4)]),
+                        "min_stay_arrival": min_stay_arrival,
+                        "max_stay_arrival": rnd.choice(
+                            [0, 0, min_stay_arrival + rnd.randint(0, 4)]
+                        ),
+                        "closed": rnd.random() < 0.05,
+                        "closed_arrival": rnd.random() < 0.1,
+                        "closed_departure": rnd.random() < 0.1,
+                        "quota": rnd.choice([-1, -1, 0, 1, 5]),
+                        "max_avail": rnd.choice([-1, -1, 0, 1, 5]),
+                    }
+                )
+        Rules = self.env["pms.availability.plan.rule"]
+
+        for _i in range(100):
+            checkin = today + datetime.timedelta(days=rnd.randint(0, 25))
+            checkout = checkin + datetime.timedelta(days=rnd.randint(1, 8))
+            with self.subTest(checkin=checkin, checkout=checkout):
+                # ACT
+                restrictions = plan.get_rule_restrictions(
+                    checkin, checkout, self.pms_property3.id
+                )
+                rules = Rules.search(
+                    [
+                        ("availability_plan_id", "=", plan.id),
+                        ("pms_property_id", "=", self.pms_property3.id),
+                        ("date", ">=", checkin),
+                        ("date", "<=", checkout),
+                    ]
+                )
+
+                # ASSERT
+                expected = {
+                    (rule.room_type_id.id, rule.date): plan.any_rule_applies(
+                        checkin, checkout, rule
+                    )
+                    for rule in rules
+                }
+                self.assertEqual(
+                    {
+                        (room_type_id, date): applies
+                        for room_type_id, date, applies, _avail in restrictions
+                    },
+                    expected,
+                    "The SQL restrictions don't match any_rule_applies",
+                )
+                self.assertEqual(
+                    set(
+                        plan.get_blocked_room_type_ids(
+                            checkin, checkout, self.pms_property3.id
+                        )
+                    ),
+                    {
+                        room_type_id
+                        for (room_type_id, _date), applies in expected.items()
+                        if applies
+                    },
+                    "The blocked room types don't match any_rule_applies",
+                )
+
+    def test_rule_update_quota_never_oversold(self):
+        """
+        Check that the last unit of quota can't be taken twice when another
+        transaction took it after this one read the rule.
+        ---------------------
+        The quota of the rule is read in the ORM cache with 1 unit left and
+        then set to 0 directly in the database, as a concurrent booking would
+        do. The quota accounting of a new night must not take quota from the
+        rule, nor leave it below 0.
+        """
+        # ARRANGE
+        self.pricelist2.pms_property_ids = [(4, self.pms_property3.id)]
+        rule = self.env["pms.availability.plan.rule"].create(
+            {
+                "availability_plan_id": self.test_room_type_availability1.id,
+                "room_type_id": self.test_room_type_double.id,
+                "date": datetime.date.today(),
+                "quota": 1,
+                "pms_property_id": self.pms_property3.id,
+            }
+        )
+        rule.flush()
+        self.assertEqual(rule.quota, 1)
+        self.env.cr.execute(
+            "UPDATE pms_availability_plan_rule SET quota = 0 WHERE id = %s",
+            (rule.id,),
+        )
+
+        # ACT
+        rule_ids = self.env["pms.availability.plan"].update_quotas(
+            [
+                (
+                    self.pricelist2.id,
+                    self.test_room_type_double.id,
+                    datetime.date.today(),
+                    self.pms_property3.id,
+                    False,
+                )
+            ]
+        )
+
+        # ASSERT
+        self.assertEqual(rule_ids, [False], "The sold out rule shouldn't apply")
+        self.assertEqual(rule.quota, 0, "The quota shouldn't be oversold")
+
+    def test_rule_update_quota_batch_moves_between_rules(self):
+        """
+        Check that moving nights between rules gives back the quota of the
+        old rules and takes it from the new ones in one batch.
+        ---------------------
+        Two nights take quota from the rules of a first plan and are then
+        moved to the rules of a second plan.
+        """
+        # ARRANGE
+        test_quota = 3
+        pricelist = self.env["product.pricelist"].create(
+            {"name": "test pricelist quota"}
+        )
+        plan = self.env["pms.availability.plan"].create(
+            {
+                "name": "Second plan for TEST",
+                "pms_pricelist_ids": [(6, 0, [pricelist.id])],
+            }
+        )
+        dates = [datetime.date.today() + datetime.timedelta(days=x) for x in range(2)]
+        old_rules = new_rules = self.env["pms.availability.plan.rule"]
+        for date in dates:
+            for availability_plan in self.test_room_type_availability1 | plan:
+                rule = self.env["pms.availability.plan.rule"].create(
+                    {
+                        "availability_plan_id": availability_plan.id,
+                        "room_type_id": self.test_room_type_double.id,
+                        "date": date,
+                        "quota": test_quota,
+                        "pms_property_id": self.pms_property3.id,
+                    }
+                )
+                if availability_plan == plan:
+                    new_rules |= rule
+                else:
+                    old_rules |= rule
+        Plan = self.env["pms.availability.plan"]
+        taken_rule_ids = Plan.update_quotas(
+            [
+                (
+                    self.pricelist2.id,
+                    self.test_room_type_double.id,
+                    date,
+                    self.pms_property3.id,
+                    False,
+                )
+                for date in dates
+            ]
+        )
+
+        # ACT
+        moved_rule_ids = Plan.update_quotas(
+            [
+                (
+                    pricelist.id,
+                    self.test_room_type_double.id,
+                    date,
+                    self.pms_property3.id,
+                    rule_id,
+                )
+                for date, rule_id in zip(dates, taken_rule_ids)
+            ]
+        )
+
+        # ASSERT
+        self.assertEqual(taken_rule_ids, old_rules.ids)
+        self.assertEqual(moved_rule_ids, new_rules.ids)
+        self.assertEqual(
+            old_rules.mapped("quota"),
+            [test_quota] * 2,
+            "The quota of the old rules should be given back",
+        )
+        self.assertEqual(
+            new_rules.mapped("quota"),
+            [test_quota - 1] * 2,
+            "The quota of the new rules should be taken",
+        )
+
+    def _create_range_rule(self, date_from, date_to, **vals):
+        return self.env["pms.availability.plan.range.rule"].create(
+            dict(
+                vals,
+                availability_plan_id=self.test_room_type_availability1.id,
+                room_type_id=self.test_room_type_double.id,
+                pms_property_id=self.pms_property3.id,
+                date_from=date_from,
+                date_to=date_to,
+            )
+        )
+
+    def test_availability_closed_range_rule(self):
+        """
+        Check that rooms of a type with a closed date range rule are not
+        available on the dates of the range.
+        --------------------
+        Create a closed range rule for double rooms of a year and check
+        the free rooms of a stay inside the range.
+        """
+        # ARRANGE
+        today = fields.date.today()
+        self._create_range_rule(
+            today, today + datetime.timedelta(days=365), closed=True
+        )
+
+        # ACT
+        pms_property = self.pms_property3.with_context(
+            checkin=today + datetime.timedelta(days=100),
+            checkout=today + datetime.timedelta(days=103),
+            pricelist_id=self.pricelist2.id,
+        )
+        result = pms_property.free_room_ids
+
+        # ASSERT
+        self.assertNotIn(
+            self.test_room_type_double,
+            result.mapped("room_type_id"),
+            "Availability should not contain rooms of a type "
+            "whose range rule applies",
+        )
+        self.assertIn(
+            self.test_room_type_single,
+            result.mapped("room_type_id"),
+            "The range rule should not close other room types",
+        )
+
+    def test_daily_rule_replaces_range_rule(self):
+        """
+        Check that the daily rule of a day replaces the range rules of
+        that day.
+        --------------------
+        Create a closed range rule and an open daily rule on one of its
+        days, and check the restrictions of each day.
+        """
+        # ARRANGE
+        today = fields.date.today()
+        open_date = today + datetime.timedelta(days=2)
+        self._create_range_rule(today, today + datetime.timedelta(days=4), closed=True)
+        self.env["pms.availability.plan.rule"].create(
+            {
+                "availability_plan_id": self.test_room_type_availability1.id,
+                "room_type_id": self.test_room_type_double.id,
+                "date": open_date,
+                "pms_property_id": self.pms_property3.id,
+            }
+        )
+
+        # ACT
+        restrictions = self.test_room_type_availability1.get_rule_restrictions(
+            today,
+            today + datetime.timedelta(days=4),
+            self.pms_property3.id,
+            [self.test_room_type_double.id],
+        )
+
+        # ASSERT
+        self.assertEqual(
+            {date: applies for _room_type_id, date, applies, _avail in restrictions},
+            {today + datetime.timedelta(days=x): x != 2 for x in range(5)},
+            "Only the day of the daily rule should be open",
+        )
+
+    def test_shortest_range_rule_wins(self):
+        """
+        Check that, among the range rules of a day, the shortest range
+        gives the restrictions.
+        --------------------
+        Create a min stay of 7 nights for a month and a min stay of 2
+        nights for a week inside it, and check a stay of 3 nights in and
+        out of the week.
+        """
+        # ARRANGE
+        today = fields.date.today()
+        self._create_range_rule(today, today + datetime.timedelta(days=30), min_stay=7)
+        self._create_range_rule(
+            today + datetime.timedelta(days=10),
+            today + datetime.timedelta(days=16),
+            min_stay=2,
+        )
+        plan = self.test_room_type_availability1
+
+        # ACT
+        blocked_in_week = plan.get_blocked_room_type_ids(
+            today + datetime.timedelta(days=11),
+            today + datetime.timedelta(days=14),
+            self.pms_property3.id,
+        )
+        blocked_out_of_week = plan.get_blocked_room_type_ids(
+            today + datetime.timedelta(days=20),
+            today + datetime.timedelta(days=23),
+            self.pms_property3.id,
+        )
+
+        # ASSERT
+        self.assertFalse(
+            blocked_in_week, "The min stay of the week should allow the stay"
+        )
+        self.assertEqual(
+            blocked_out_of_week,
+            [self.test_room_type_double.id],
+            "The min stay of the month should block the stay",
+        )
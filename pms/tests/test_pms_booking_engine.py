@@ -3,6 +3,7 @@ import datetime
 from freezegun import freeze_time
 
 from odoo import fields
+from odoo.exceptions import ValidationError
 
 from .common import TestPms
 
@@ -409,6 +410,71 @@ class TestPmsBookingEngine(TestPms):
         # ASSERT
         self.assertEqual(len(folio.reservation_ids), 2, "Reservations  not created.")
 
+    def test_create_folio_group_same_ubication(self):
+        """
+        Check that the rooms of a group booked from the booking engine
+        are assigned together on the same ubication.
+        ------------
+        Room 202 is on a first ubication and rooms 201, 203 and 204 on a
+        second one. Booking three double rooms must place the whole group
+        on the second ubication, even though room 202 comes before 203
+        in the room order.
+        """
+        # ARRANGE
+        checkin = fields.date.today()
+        checkout = fields.date.today() + datetime.timedelta(days=2)
+        ubication1 = self.env["pms.ubication"].create(
+            {
+                "name": "Ubication Test 1",
+                "pms_property_ids": [(4, self.pms_property1.id)],
+            }
+        )
+        ubication2 = self.env["pms.ubication"].create(
+            {
+                "name": "Ubication Test 2",
+                "pms_property_ids": [(4, self.pms_property1.id)],
+            }
+        )
+        self.test_room2_double.ubication_id = ubication1
+        (
+            self.test_room1_double | self.test_room3_double | self.test_room4_double
+        ).ubication_id = ubication2
+        booking_engine = self.env["pms.booking.engine"].create(
+            {
+                "start_date": checkin,
+                "end_date": checkout,
+                "partner_id": self.partner_id.id,
+                "pricelist_id": self.pricelist1.id,
+                "pms_property_id": self.pms_property1.id,
+            }
+        )
+        line = booking_engine.availability_results.filtered(
+            lambda r: r.room_type_id == self.test_room_type_double
+        )
+        line.num_rooms_selected = self.env["pms.num.rooms.selection"].search(
+            [
+                ("room_type_id", "=", self.test_room_type_double.id),
+                ("value", "=", 3),
+            ]
+        )
+        line.value_num_rooms_selected = 3
+
+        # ACT
+        booking_engine.create_folio()
+
+        # ASSERT
+        folio = self.env["pms.folio"].search([("partner_id", "=", self.partner_id.id)])
+        self.assertEqual(
+            folio.reservation_ids.reservation_line_ids.room_id.ubication_id,
+            ubication2,
+            "The group should be assigned to the same ubication",
+        )
+        self.assertEqual(
+            len(folio.reservation_ids.preferred_room_id),
+            3,
+            "Each reservation of the group should get its own room",
+        )
+
     def test_values_folio_created(self):
         """
         Check that the partner_id and pricelist_id values of the folio correspond
@@ -962,3 +1028,229 @@ class TestPmsBookingEngine(TestPms):
             1,
             "Reservations of folio are incorrect",
         )
+
+    def test_availability_matrix_matches_availability(self):
+        """
+        Check that the availability matrix returns, for every room type,
+        the same bookable rooms as the availability field.
+        -----------------
+        A reservation occupies one of the double rooms the first night and
+        a quota rule limits the double rooms the second night. The matrix is
+        requested for a two nights stay and compared with the availability
+        field computed room type by room type.
+        """
+        # ARRANGE
+        checkin = fields.date.today()
+        checkout = fields.date.today() + datetime.timedelta(days=2)
+        self.availability_plan1 = self.env["pms.availability.plan"].create(
+            {
+                "name": "Availability plan for TEST",
+                "pms_pricelist_ids": [(6, 0, [self.pricelist1.id])],
+            }
+        )
+        self.env["pms.availability.plan.rule"].create(
+            {
+                "quota": 2,
+                "room_type_id": self.test_room_type_double.id,
+                "availability_plan_id": self.availability_plan1.id,
+                "date": checkin + datetime.timedelta(days=1),
+                "pms_property_id": self.pms_property1.id,
+            }
+        )
+        self.env["pms.reservation"].create(
+            {
+                "checkin": checkin,
+                "checkout": checkin + datetime.timedelta(days=1),
+                "room_type_id": self.test_room_type_double.id,
+                "partner_id": self.partner_id.id,
+                "pms_property_id": self.pms_property1.id,
+            }
+        )
+
+        # ACT
+        matrix = self.pms_property1.get_availability_matrix(
+            checkin=checkin,
+            checkout=checkout,
+            pricelist_id=self.pricelist1.id,
+        )
+
+        # ASSERT
+        double = matrix[self.test_room_type_double.id]
+        self.assertEqual(
+            double["nights"],
+            {checkin: 3, checkin + datetime.timedelta(days=1): 4},
+            "Free rooms per night are wrong in the availability matrix",
+        )
+        for room_type_id, values in matrix.items():
+            with self.subTest(room_type_id=room_type_id):
+                self.assertEqual(
+                    values["availability"],
+                    self.pms_property1.with_context(
+                        checkin=checkin,
+                        checkout=checkout,
+                        room_type_id=room_type_id,
+                        pricelist_id=self.pricelist1.id,
+                    ).availability,
+                    "The availability matrix doesn't match the availability",
+                )
+
+    def test_availability_matrix_query_count(self):
+        """
+        Check that the number of queries of the availability matrix doesn't
+        depend on the number of room types.
+        -----------------
+        The matrix is requested for one room type and then for ten room
+        types. The number of queries executed must be the same.
+        """
+        # ARRANGE
+        checkin = fields.date.today()
+        checkout = fields.date.today() + datetime.timedelta(days=7)
+        room_types = self.test_room_type_double
+        for i in range(9):
+            room_type = self.env["pms.room.type"].create(
+                {
+                    "pms_property_ids": [self.pms_property1.id],
+                    "name": "Room type %s" % i,
+                    "default_code": "RT_%s" % i,
+                    "class_id": self.room_type_class1.id,
+                }
+            )
+            self.env["pms.room"].create(
+                {
+                    "pms_property_id": self.pms_property1.id,
+                    "name": "Room %s" % i,
+                    "room_type_id": room_type.id,
+                    "capacity": 2,
+                }
+            )
+            room_types |= room_type
+        self.env["base"].flush()
+
+        # ACT
+        queries_before = self.env.cr.sql_log_count
+        self.pms_property1.get_availability_matrix(
+            checkin=checkin,
+            checkout=checkout,
+            room_type_ids=self.test_room_type_double.ids,
+        )
+        queries_one = self.env.cr.sql_log_count - queries_before
+        self.env["base"].invalidate_cache()
+        queries_before = self.env.cr.sql_log_count
+        self.pms_property1.get_availability_matrix(
+            checkin=checkin,
+            checkout=checkout,
+            room_type_ids=room_types.ids,
+        )
+        queries_many = self.env.cr.sql_log_count - queries_before
+
+        # ASSERT
+        self.assertEqual(
+            queries_one,
+            queries_many,
+            "The availability matrix queries depend on the number of room types",
+        )
+
+    def test_hold_rooms_then_create_folio(self):
+        """
+        Check that the rooms held from the booking engine are kept for it
+        and become the reservations of the folio.
+        -----------------
+        The four double rooms are selected and held. A competing hold of
+        one of them must fail, and creating the folio must create the four
+        reservations and release the holds.
+        """
+        # ARRANGE
+        checkin = fields.date.today()
+        checkout = fields.date.today() + datetime.timedelta(days=2)
+        booking_engine = self.env["pms.booking.engine"].create(
+            {
+                "start_date": checkin,
+                "end_date": checkout,
+                "partner_id": self.partner_id.id,
+                "pricelist_id": self.pricelist1.id,
+                "pms_property_id": self.pms_property1.id,
+            }
+        )
+        line = booking_engine.availability_results.filtered(
+            lambda r: r.room_type_id == self.test_room_type_double
+        )
+        line.value_num_rooms_selected = 4
+
+        # ACT & ASSERT
+        booking_engine.action_hold_rooms()
+        holds = self.env["pms.inventory.hold"].search(
+            [("token", "=", booking_engine.hold_token)]
+        )
+        self.assertEqual(len(holds), 8, "The four rooms should be held two nights")
+        with self.assertRaises(
+            ValidationError, msg="A held room shouldn't be held by another booking"
+        ):
+            self.env["pms.inventory.hold"].hold_rooms(
+                pms_property_id=self.pms_property1.id,
+                checkin=checkin,
+                checkout=checkout,
+                room_ids=self.test_room1_double.ids,
+            )
+        booking_engine.create_folio()
+        folio = self.env["pms.folio"].search([("partner_id", "=", self.partner_id.id)])
+        self.assertEqual(
+            len(folio.reservation_ids),
+            4,
+            "The held rooms should become the reservations",
+        )
+        self.assertFalse(holds.exists(), "The holds should be released")
+
+    def test_create_folio_group_split_stays(self):
+        """
+        Check that a group that only fits changing rooms between nights is
+        booked with split stays instead of being rejected.
+        -----------------
+        Room 201 is booked the first night and room 202 the second one, so
+        only rooms 203 and 204 are free for the whole stay. Booking three
+        double rooms for both nights must create the three reservations,
+        the third one split between rooms 202 and 201.
+        """
+        # ARRANGE
+        checkin = fields.date.today()
+        checkout = fields.date.today() + datetime.timedelta(days=2)
+        for room, date in (
+            (self.test_room1_double, checkin),
+            (self.test_room2_double, checkin + datetime.timedelta(days=1)),
+        ):
+            self.env["pms.reservation"].create(
+                {
+                    "checkin": date,
+                    "checkout": date + datetime.timedelta(days=1),
+                    "preferred_room_id": room.id,
+                    "partner_id": self.partner_id.id,
+                    "pms_property_id": self.pms_property1.id,
+                }
+            )
+        partner = self.env["res.partner"].create({"name": "Group"})
+        booking_engine = self.env["pms.booking.engine"].create(
+            {
+                "start_date": checkin,
+                "end_date": checkout,
+                "partner_id": partner.id,
+                "pricelist_id": self.pricelist1.id,
+                "pms_property_id": self.pms_property1.id,
+            }
+        )
+        line = booking_engine.availability_results.filtered(
+            lambda r: r.room_type_id == self.test_room_type_double
+        )
+        line.value_num_rooms_selected = 3
+
+        # ACT
+        booking_engine.create_folio()
+
+        # ASSERT
+        folio = self.env["pms.folio"].search([("partner_id", "=", partner.id)])
+        self.assertEqual(
+            len(folio.reservation_ids), 3, "The whole group should be booked"
+        )
+        self.assertEqual(
+            len(folio.reservation_ids.reservation_line_ids.room_id),
+            4,
+            "The third stay should be split between the rooms left",
+        )
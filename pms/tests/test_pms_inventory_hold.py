@@ -0,0 +1,129 @@
+import datetime
+
+from odoo import fields
+from odoo.exceptions import ValidationError
+
+from .common import TestPms
+
+
+class TestPmsInventoryHold(TestPms):
+    def setUp(self):
+        super().setUp()
+        self.room_type_double = self.env["pms.room.type"].create(
+            {
+                "pms_property_ids": [self.pms_property1.id],
+                "name": "Double Test",
+                "default_code": "DBL_Test",
+                "class_id": self.room_type_class1.id,
+            }
+        )
+        self.room1 = self.env["pms.room"].create(
+            {
+                "pms_property_id": self.pms_property1.id,
+                "name": "Double 201",
+                "room_type_id": self.room_type_double.id,
+                "capacity": 2,
+            }
+        )
+        self.partner1 = self.env["res.partner"].create({"name": "Xoana"})
+        self.checkin = fields.date.today()
+        self.checkout = self.checkin + datetime.timedelta(days=2)
+        self.Hold = self.env["pms.inventory.hold"]
+
+    def _hold(self, token=False):
+        return self.Hold.hold_rooms(
+            pms_property_id=self.pms_property1.id,
+            checkin=self.checkin,
+            checkout=self.checkout,
+            room_ids=[self.room1.id],
+            token=token,
+        )
+
+    def test_hold_takes_availability_except_for_its_token(self):
+        """
+        Check that a held room is not available for other bookings but it
+        is for the booking that holds it.
+        ----------------
+        Hold the only room of the room type for two nights and check the
+        availability of the room type with and without the hold token.
+        """
+        # ACT
+        token = self._hold()
+
+        # ASSERT
+        matrix = self.pms_property1.get_availability_matrix(
+            self.checkin, self.checkout, [self.room_type_double.id]
+        )
+        own_matrix = self.pms_property1.with_context(
+            inventory_hold_token=token
+        ).get_availability_matrix(
+            self.checkin, self.checkout, [self.room_type_double.id]
+        )
+        self.assertEqual(
+            matrix[self.room_type_double.id]["availability"],
+            0,
+            "The held room shouldn't be available for other bookings",
+        )
+        self.assertEqual(
+            own_matrix[self.room_type_double.id]["availability"],
+            1,
+            "The held room should be available for the booking that holds it",
+        )
+
+    def test_competing_hold_fails(self):
+        """
+        Check that a second booking can't hold a room already held.
+        ----------------
+        Hold a room and try to hold it again with another token, and try to
+        book it without the token.
+        """
+        # ARRANGE
+        self._hold()
+
+        # ACT & ASSERT
+        with self.assertRaises(ValidationError):
+            self._hold()
+        with self.assertRaises(ValidationError):
+            self.env["pms.reservation"].create(
+                {
+                    "partner_id": self.partner1.id,
+                    "preferred_room_id": self.room1.id,
+                    "checkin": self.checkin,
+                    "checkout": self.checkout,
+                    "pms_property_id": self.pms_property1.id,
+                }
+            )
+
+    def test_expired_holds_swept(self):
+        """
+        Check that an expired hold doesn't take availability and that the
+        sweep cron removes it.
+        ----------------
+        Hold a room and move its expiration to the past.
+        """
+        # ARRANGE
+        token = self._hold()
+        self.env.cr.execute(
+            """
+            UPDATE pms_inventory_hold
+            SET    expiration_date = now() at time zone 'UTC' - interval '1 minute'
+            WHERE  token = %s
+            """,
+            (token,),
+        )
+        self.env["pms.property"]._invalidate_availability_cache()
+
+        # ACT
+        not_avail = self.env["pms.availability"].get_occupied_room_dates(
+            checkin=self.checkin,
+            checkout=self.checkout,
+            pms_property_id=self.pms_property1.id,
+        )
+        self.Hold.cron_sweep_expired_holds()
+
+        # ASSERT
+        self.assertFalse(not_avail, "An expired hold shouldn't take the room")
+        self.assertFalse(
+            self.Hold.search([("token", "=", token)]),
+            "The expired holds should be removed",
+        )
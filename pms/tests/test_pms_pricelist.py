@@ -1238,3 +1238,337 @@ class TestPmsPricelist(TestPms):
 
                 # ASSERT
                 self.assertEqual(tc["expected_price"], reservation_price, tc["name"])
+
+    @freeze_time("2000-01-01")
+    def test_stay_nights_priced_by_consumption_date(self):
+        """
+        Check that every night of a stay gets the price of the items of its
+        own consumption date, now that the items of the whole stay are
+        fetched at once.
+        ----------------
+        Create a daily item for the first and the third night of a 4 nights
+        reservation. The second and fourth nights must keep the room type
+        price.
+        """
+        # ARRANGE
+        checkin = fields.date.today()
+        prices = {
+            checkin: 50.0,
+            checkin + datetime.timedelta(days=2): 70.0,
+        }
+        for consumption_date, price in prices.items():
+            self.env["product.pricelist.item"].create(
+                {
+                    "pricelist_id": self.pricelist2.id,
+                    "date_start_consumption": consumption_date,
+                    "date_end_consumption": consumption_date,
+                    "compute_price": "fixed",
+                    "applied_on": "0_product_variant",
+                    "product_id": self.room_type1.product_id.id,
+                    "fixed_price": price,
+                    "pms_property_ids": [self.pms_property1.id],
+                }
+            )
+
+        # ACT
+        reservation = self.env["pms.reservation"].create(
+            {
+                "partner_id": self.partner1.id,
+                "checkin": checkin,
+                "checkout": checkin + datetime.timedelta(days=4),
+                "preferred_room_id": self.room1.id,
+                "pms_property_id": self.pms_property1.id,
+                "pricelist_id": self.pricelist2.id,
+            }
+        )
+
+        # ASSERT
+        self.assertEqual(
+            {line.date: line.price for line in reservation.reservation_line_ids},
+            {
+                checkin
+                + datetime.timedelta(days=x): prices.get(
+                    checkin + datetime.timedelta(days=x), self.room_type1.list_price
+                )
+                for x in range(4)
+            },
+            "Each night should be priced with the items of its date",
+        )
+
+    @freeze_time("2000-01-01")
+    def test_range_storage_compacts_consecutive_days(self):
+        """
+        Check that a pricelist storing date ranges keeps consecutive days
+        with the same price as a single item.
+        ----------------
+        Create the same price for 3 consecutive days on a range pricelist.
+        """
+        # ARRANGE
+        self.pricelist2.item_storage_mode = "range"
+        checkin = fields.date.today()
+
+        # ACT
+        for x in range(3):
+            self.env["product.pricelist.item"].create(
+                {
+                    "pricelist_id": self.pricelist2.id,
+                    "date_start_consumption": checkin + datetime.timedelta(days=x),
+                    "date_end_consumption": checkin + datetime.timedelta(days=x),
+                    "compute_price": "fixed",
+                    "applied_on": "0_product_variant",
+                    "product_id": self.room_type1.product_id.id,
+                    "fixed_price": 50.0,
+                    "pms_property_ids": [self.pms_property1.id],
+                }
+            )
+
+        # ASSERT
+        self.assertEqual(
+            [
+                (item.date_start_consumption, item.date_end_consumption)
+                for item in self.pricelist2.item_ids
+            ],
+            [(checkin, checkin + datetime.timedelta(days=2))],
+            "The 3 days should be stored as a single item",
+        )
+
+    @freeze_time("2000-01-01")
+    def test_range_storage_batch_create_keeps_items(self):
+        """
+        Check that compacting the items of a batch creation on a range
+        pricelist never removes the created items.
+        ----------------
+        Create a price for a day and, in a single call, the same price for
+        the 3 following days. The created items must still exist, the
+        first one spanning the day created before.
+        """
+        # ARRANGE
+        self.pricelist2.item_storage_mode = "range"
+        checkin = fields.date.today()
+        vals = {
+            "pricelist_id": self.pricelist2.id,
+            "compute_price": "fixed",
+            "applied_on": "0_product_variant",
+            "product_id": self.room_type1.product_id.id,
+            "fixed_price": 50.0,
+            "pms_property_ids": [self.pms_property1.id],
+        }
+        previous_item = self.env["product.pricelist.item"].create(
+            dict(
+                vals,
+                date_start_consumption=checkin,
+                date_end_consumption=checkin,
+            )
+        )
+
+        # ACT
+        items = self.env["product.pricelist.item"].create(
+            [
+                dict(
+                    vals,
+                    date_start_consumption=checkin + datetime.timedelta(days=x),
+                    date_end_consumption=checkin + datetime.timedelta(days=x),
+                )
+                for x in range(1, 4)
+            ]
+        )
+
+        # ASSERT
+        self.assertEqual(
+            items.exists(), items, "The created items should not be removed"
+        )
+        self.assertFalse(
+            previous_item.exists(),
+            "The item created before should be absorbed by the new items",
+        )
+        self.assertEqual(
+            [
+                (item.date_start_consumption, item.date_end_consumption)
+                for item in items
+            ],
+            [
+                (checkin, checkin + datetime.timedelta(days=1)),
+                (
+                    checkin + datetime.timedelta(days=2),
+                    checkin + datetime.timedelta(days=2),
+                ),
+                (
+                    checkin + datetime.timedelta(days=3),
+                    checkin + datetime.timedelta(days=3),
+                ),
+            ],
+            "Each created item should keep its day, the first one the "
+            "day created before",
+        )
+
+    @freeze_time("2000-01-01")
+    def test_range_storage_split_by_day_price(self):
+        """
+        Check that a price written for a day inside a run splits the run
+        and that the nights of a reservation keep their prices.
+        ----------------
+        Create a run of 4 days on a range pricelist and a different price
+        for its second day.
+        """
+        # ARRANGE
+        self.pricelist2.item_storage_mode = "range"
+        checkin = fields.date.today()
+        vals = {
+            "pricelist_id": self.pricelist2.id,
+            "compute_price": "fixed",
+            "applied_on": "0_product_variant",
+            "product_id": self.room_type1.product_id.id,
+            "pms_property_ids": [self.pms_property1.id],
+        }
+        for x in range(4):
+            self.env["product.pricelist.item"].create(
+                dict(
+                    vals,
+                    date_start_consumption=checkin + datetime.timedelta(days=x),
+                    date_end_consumption=checkin + datetime.timedelta(days=x),
+                    fixed_price=50.0,
+                )
+            )
+
+        # ACT
+        self.env["product.pricelist.item"].create(
+            dict(
+                vals,
+                date_start_consumption=checkin + datetime.timedelta(days=1),
+                date_end_consumption=checkin + datetime.timedelta(days=1),
+                fixed_price=80.0,
+            )
+        )
+        reservation = self.env["pms.reservation"].create(
+            {
+                "partner_id": self.partner1.id,
+                "checkin": checkin,
+                "checkout": checkin + datetime.timedelta(days=4),
+                "preferred_room_id": self.room1.id,
+                "pms_property_id": self.pms_property1.id,
+                "pricelist_id": self.pricelist2.id,
+            }
+        )
+
+        # ASSERT
+        self.assertEqual(
+            sorted(
+                (
+                    item.date_start_consumption,
+                    item.date_end_consumption,
+                    item.fixed_price,
+                )
+                for item in self.pricelist2.item_ids
+            ),
+            [
+                (checkin, checkin, 50.0),
+                (
+                    checkin + datetime.timedelta(days=1),
+                    checkin + datetime.timedelta(days=1),
+                    80.0,
+                ),
+                (
+                    checkin + datetime.timedelta(days=2),
+                    checkin + datetime.timedelta(days=3),
+                    50.0,
+                ),
+            ],
+            "The run should be split around the new price",
+        )
+        self.assertEqual(
+            reservation.reservation_line_ids.sorted("date").mapped("price"),
+            [50.0, 80.0, 50.0, 50.0],
+            "Each night should keep its price",
+        )
+
+    @freeze_time("2000-01-01")
+    def test_derived_pricelist_follows_base_prices(self):
+        """
+        Check that a derived pricelist prices the nights with the prices of
+        its base pricelist and its discount, and that its own items are
+        kept.
+        ----------------
+        Derive a pricelist with a 10% discount from a pricelist with a
+        daily price for the first night and set an own price for the third
+        night of a 3 nights reservation.
+        """
+        # ARRANGE
+        checkin = fields.date.today()
+        self.env["product.pricelist.item"].create(
+            {
+                "pricelist_id": self.pricelist2.id,
+                "date_start_consumption": checkin,
+                "date_end_consumption": checkin,
+                "compute_price": "fixed",
+                "applied_on": "0_product_variant",
+                "product_id": self.room_type1.product_id.id,
+                "fixed_price": 50.0,
+                "pms_property_ids": [self.pms_property1.id],
+            }
+        )
+        derived_pricelist = self.env["product.pricelist"].create(
+            {
+                "name": "Non refundable",
+                "pms_property_ids": [self.pms_property1.id],
+                "parent_pricelist_id": self.pricelist2.id,
+                "derived_price_discount": 10.0,
+                "derived_price_round": 1.0,
+            }
+        )
+        night3 = checkin + datetime.timedelta(days=2)
+        self.env["product.pricelist.item"].create(
+            {
+                "pricelist_id": derived_pricelist.id,
+                "date_start_consumption": night3,
+                "date_end_consumption": night3,
+                "compute_price": "fixed",
+                "applied_on": "0_product_variant",
+                "product_id": self.room_type1.product_id.id,
+                "fixed_price": 20.0,
+                "pms_property_ids": [self.pms_property1.id],
+            }
+        )
+
+        # ACT
+        reservation = self.env["pms.reservation"].create(
+            {
+                "partner_id": self.partner1.id,
+                "checkin": checkin,
+                "checkout": checkin + datetime.timedelta(days=3),
+                "preferred_room_id": self.room1.id,
+                "pms_property_id": self.pms_property1.id,
+                "pricelist_id": derived_pricelist.id,
+            }
+        )
+
+        # ASSERT
+        self.assertEqual(
+            reservation.reservation_line_ids.sorted("date").mapped("price"),
+            [45.0, 27.0, 20.0],
+            "The nights should get the discounted base price or the own price",
+        )
+        self.assertEqual(
+            len(derived_pricelist.item_ids),
+            1,
+            "The derived prices shouldn't be stored as items",
+        )
+
+    def test_derived_pricelist_recursion(self):
+        """
+        Check that a pricelist can't be derived from one of its derived
+        pricelists.
+        ----------------
+        Derive a pricelist from pricelist 2 and derive pricelist 2 from it.
+        """
+        # ARRANGE
+        derived_pricelist = self.env["product.pricelist"].create(
+            {
+                "name": "Agency rate",
+                "pms_property_ids": [self.pms_property1.id, self.pms_property2.id],
+                "parent_pricelist_id": self.pricelist2.id,
+            }
+        )
+
+        # ACT & ASSERT
+        with self.assertRaises(ValidationError):
+            self.pricelist2.parent_pricelist_id = derived_pricelist
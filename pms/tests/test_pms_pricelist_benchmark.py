@@ -0,0 +1,236 @@
+import datetime
+import logging
+import random
+import time
+
+from odoo import fields
+from odoo.tests import tagged
+from odoo.tools import split_every
+
+from .common import TestPms
+
+_logger = logging.getLogger(__name__)
+
+BENCHMARK_ROOM_TYPES = 50
+BENCHMARK_DAYS = 20000  # 50 room types x 20000 days = 1M daily items
+BENCHMARK_LOOKUPS = 200
+BENCHMARK_NIGHTS = 7
+BENCHMARK_COMPUTE_CHUNK = 10000
+
+# lookup before the property rank, kept to compare the latencies
+LEGACY_QUERY = """
+    SELECT item.id
+    FROM   product_pricelist_item item
+           LEFT JOIN product_category categ
+                ON item.categ_id = categ.id
+           LEFT JOIN product_pricelist_pms_property_rel cab
+                ON item.pricelist_id = cab.product_pricelist_id
+           LEFT JOIN product_pricelist_item_pms_property_rel lin
+                ON item.id = lin.product_pricelist_item_id
+    WHERE  (lin.pms_property_id = %(pms_property_id)s
+            OR lin.pms_property_id IS NULL)
+       AND (cab.pms_property_id = %(pms_property_id)s
+            OR cab.pms_property_id IS NULL)
+       AND (item.product_tmpl_id IS NULL
+            OR item.product_tmpl_id = ANY(%(prod_tmpl_ids)s))
+       AND (item.product_id IS NULL OR item.product_id = ANY(%(prod_ids)s))
+       AND (item.categ_id IS NULL OR item.categ_id = ANY(%(categ_ids)s))
+       AND (item.pricelist_id = %(pricelist_id)s)
+       AND (item.date_start IS NULL OR item.date_start <= %(date)s)
+       AND (item.date_end IS NULL OR item.date_end >= %(date)s)
+       AND (item.date_start_consumption IS NULL
+            OR item.date_start_consumption <= %(date_to)s)
+       AND (item.date_end_consumption IS NULL
+            OR item.date_end_consumption >= %(date_from)s)
+       AND item.board_service_room_type_id IS NULL
+    GROUP  BY item.id
+    ORDER  BY item.applied_on,
+              item.date_end - item.date_start ASC,
+              item.date_end_consumption - item.date_start_consumption ASC,
+              NULLIF((SELECT COUNT(1)
+               FROM   product_pricelist_item_pms_property_rel l
+               WHERE  item.id = l.product_pricelist_item_id)
+              + (SELECT COUNT(1)
+                 FROM   product_pricelist_pms_property_rel c
+                 WHERE  item.pricelist_id = c.product_pricelist_id),0)
+              NULLS LAST,
+              item.id DESC;
+"""
+
+
+@tagged("-standard", "pms_benchmark")
+class TestPmsPricelistBenchmark(TestPms):
+    """
+    Latency of the pricelist item lookup of a stay with 1M daily items.
+    Not run by default, run it with --test-tags pms_benchmark.
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.date_start = fields.Date.today()
+        self.room_types = self.env["pms.room.type"].create(
+            [
+                {
+                    "pms_property_ids": [self.pms_property1.id],
+                    "name": "Benchmark %s" % x,
+                    "default_code": "BNCH%s" % x,
+                    "class_id": self.room_type_class1.id,
+                }
+                for x in range(BENCHMARK_ROOM_TYPES)
+            ]
+        )
+        self.env["base"].flush()
+        # the daily items are inserted in SQL, creating them through the
+        # ORM would take hours
+        self.env.cr.execute(
+            """
+            WITH new_item AS (
+                INSERT INTO product_pricelist_item (
+                    pricelist_id, company_id, currency_id, active,
+                    applied_on, base, compute_price, product_id,
+                    product_tmpl_id, fixed_price, min_quantity,
+                    date_start_consumption, date_end_consumption,
+                    create_uid, create_date, write_uid, write_date
+                )
+                SELECT pl.id, pl.company_id, pl.currency_id, True,
+                       '0_product_variant', 'list_price', 'fixed', pp.id,
+                       pp.product_tmpl_id, 50 + day.n %% 50, 0,
+                       %(date_start)s::date + day.n,
+                       %(date_start)s::date + day.n,
+                       %(uid)s, now() at time zone 'UTC',
+                       %(uid)s, now() at time zone 'UTC'
+                FROM   product_pricelist pl
+                       CROSS JOIN product_product pp
+                       CROSS JOIN generate_series(0, %(days)s - 1) AS day(n)
+                WHERE  pl.id = %(pricelist_id)s
+                   AND pp.id = ANY(%(product_ids)s)
+                RETURNING id
+            )
+            INSERT INTO product_pricelist_item_pms_property_rel (
+                product_pricelist_item_id, pms_property_id
+            )
+            SELECT id, %(pms_property_id)s FROM new_item
+            """,
+            {
+                "date_start": self.date_start,
+                "uid": self.env.uid,
+                "days": BENCHMARK_DAYS,
+                "pricelist_id": self.pricelist1.id,
+                "product_ids": self.room_types.mapped("product_id").ids,
+                "pms_property_id": self.pms_property1.id,
+            },
+        )
+        # the stored fields computed by the ORM are computed in chunks
+        PricelistItem = self.env["product.pricelist.item"]
+        self.env.cr.execute(
+            "SELECT id FROM product_pricelist_item WHERE pricelist_id = %s",
+            (self.pricelist1.id,),
+        )
+        item_ids = [row[0] for row in self.env.cr.fetchall()]
+        for chunk_ids in split_every(BENCHMARK_COMPUTE_CHUNK, item_ids):
+            items = PricelistItem.browse(chunk_ids)
+            self.env.add_to_compute(PricelistItem._fields["pms_property_rank"], items)
+            items.recompute(["pms_property_rank"])
+            items.flush(["pms_property_rank"])
+            PricelistItem.invalidate_cache()
+        self.env.cr.execute("ANALYZE product_pricelist_item")
+        self.env.cr.execute("ANALYZE product_pricelist_item_pms_property_rel")
+
+    def _latencies(self, lookup):
+        random.seed(0)
+        latencies = []
+        for _i in range(BENCHMARK_LOOKUPS):
+            product = random.choice(self.room_types).product_id
+            checkin = self.date_start + datetime.timedelta(
+                days=random.randrange(BENCHMARK_DAYS - BENCHMARK_NIGHTS)
+            )
+            dates = [
+                checkin + datetime.timedelta(days=x) for x in range(BENCHMARK_NIGHTS)
+            ]
+            start = time.perf_counter()
+            lookup(product, dates)
+            latencies.append((time.perf_counter() - start) * 1000)
+        latencies.sort()
+        return (
+            latencies[len(latencies) // 2],
+            latencies[int(len(latencies) * 0.95)],
+        )
+
+    def _legacy_lookup(self, product, dates):
+        items_by_date = {}
+        for date in dates:
+            self.env.cr.execute(
+                LEGACY_QUERY,
+                {
+                    "pms_property_id": self.pms_property1.id,
+                    "prod_tmpl_ids": [product.product_tmpl_id.id],
+                    "prod_ids": [product.id],
+                    "categ_ids": [product.categ_id.id],
+                    "pricelist_id": self.pricelist1.id,
+                    "date": fields.Datetime.now(),
+                    "date_from": date,
+                    "date_to": date,
+                },
+            )
+            items_by_date[date] = tuple(x[0] for x in self.env.cr.fetchall())
+        return items_by_date
+
+    def _lookup(self, product, dates):
+        return self.pricelist1._get_pms_items_by_consumption_date(
+            [product.product_tmpl_id.id],
+            [product.id],
+            [product.categ_id.id],
+            self.pms_property1.id,
+            fields.Datetime.now(),
+            dates,
+        )
+
+    def _query_count(self, product, dates):
+        queries_before = self.env.cr.sql_log_count
+        self._lookup(product, dates)
+        return self.env.cr.sql_log_count - queries_before
+
+    def test_stay_items_lookup_latency(self):
+        """
+        Measure the item lookup of random 7 nights stays among 1M daily
+        items, with the legacy per night query and with the current stay
+        query. Both must find the same items, the current lookup must not
+        be slower than the legacy one and its queries must not depend on
+        the nights of the stay.
+        """
+        # ARRANGE
+        product = self.room_types[0].product_id
+        date = self.date_start + datetime.timedelta(days=100)
+        dates = [date + datetime.timedelta(days=x) for x in range(BENCHMARK_NIGHTS)]
+
+        # ACT
+        legacy_median, legacy_p95 = self._latencies(self._legacy_lookup)
+        median, p95 = self._latencies(self._lookup)
+        _logger.info(
+            "Stay items lookup with %s items, %s nights: "
+            "legacy median %.2f ms p95 %.2f ms, "
+            "current median %.2f ms p95 %.2f ms",
+            BENCHMARK_ROOM_TYPES * BENCHMARK_DAYS,
+            BENCHMARK_NIGHTS,
+            legacy_median,
+            legacy_p95,
+            median,
+            p95,
+        )
+
+        # ASSERT
+        self.assertEqual(
+            self._lookup(product, [date]),
+            self._legacy_lookup(product, [date]),
+            "The current lookup should find the items of the legacy one",
+        )
+        self.assertEqual(
+            self._query_count(product, dates),
+            self._query_count(product, [date]),
+            "The queries of the lookup should not depend on the nights",
+        )
+        self.assertLessEqual(
+            median,
+            legacy_median,
+            "The stay lookup should not be slower than the per night one",
+        )
@@ -0,0 +1,211 @@
+import datetime
+
+from odoo import fields
+
+from .common import TestPms
+
+
+class TestPmsRateGrid(TestPms):
+    def setUp(self):
+        super().setUp()
+        self.room_type_double = self.env["pms.room.type"].create(
+            {
+                "pms_property_ids": [self.pms_property1.id],
+                "name": "Double Test",
+                "default_code": "DBL_Test",
+                "class_id": self.room_type_class1.id,
+                "list_price": 30.0,
+            }
+        )
+        self.room1 = self.env["pms.room"].create(
+            {
+                "pms_property_id": self.pms_property1.id,
+                "name": "Double 201",
+                "room_type_id": self.room_type_double.id,
+                "capacity": 2,
+            }
+        )
+        self.partner1 = self.env["res.partner"].create({"name": "Uxía"})
+        self.checkin = fields.date.today()
+        self.RateGrid = self.env["pms.rate.grid"]
+
+    def _create_item(self, date, price, **vals):
+        item_vals = {
+            "pricelist_id": self.pricelist1.id,
+            "date_start_consumption": date,
+            "date_end_consumption": date,
+            "compute_price": "fixed",
+            "applied_on": "0_product_variant",
+            "product_id": self.room_type_double.product_id.id,
+            "fixed_price": price,
+            "pms_property_ids": [self.pms_property1.id],
+        }
+        item_vals.update(vals)
+        return self.env["product.pricelist.item"].create(item_vals)
+
+    def _grid_prices(self):
+        return {
+            cell.date: cell.price
+            for cell in self.RateGrid.search(
+                [
+                    ("pricelist_id", "=", self.pricelist1.id),
+                    ("product_id", "=", self.room_type_double.product_id.id),
+                    ("pms_property_id", "=", self.pms_property1.id),
+                ]
+            )
+        }
+
+    def test_grid_follows_item_changes(self):
+        """
+        Check that the grid is kept up to date when the daily items are
+        created, modified and removed.
+        ----------------
+        Create an item for tomorrow, change its price and remove it.
+        """
+        # ARRANGE
+        tomorrow = self.checkin + datetime.timedelta(days=1)
+
+        # ACT & ASSERT
+        item = self._create_item(tomorrow, 50.0)
+        self.assertEqual(
+            self._grid_prices(),
+            {tomorrow: 50.0},
+            "The new item should be stored in the grid",
+        )
+        item.fixed_price = 55.0
+        self.assertEqual(
+            self._grid_prices(),
+            {tomorrow: 55.0},
+            "The grid should have the new price of the item",
+        )
+        item.unlink()
+        self.assertFalse(self._grid_prices(), "The removed item should leave the grid")
+
+    def test_grid_item_without_properties(self):
+        """
+        Check that an item without properties is stored in the grid for
+        the properties where it applies.
+        ----------------
+        Create an item for tomorrow without properties in a pricelist
+        without properties, then create a new property.
+        """
+        # ARRANGE
+        tomorrow = self.checkin + datetime.timedelta(days=1)
+
+        # ACT
+        self._create_item(tomorrow, 45.0, pms_property_ids=[])
+        pms_property2 = self.env["pms.property"].create(
+            {
+                "name": "Property 2",
+                "company_id": self.company1.id,
+                "default_pricelist_id": self.pricelist1.id,
+            }
+        )
+
+        # ASSERT
+        self.assertEqual(
+            self._grid_prices(),
+            {tomorrow: 45.0},
+            "The item without properties should be stored in the grid",
+        )
+        self.assertTrue(
+            self.RateGrid.search_count(
+                [
+                    ("pricelist_id", "=", self.pricelist1.id),
+                    ("pms_property_id", "=", pms_property2.id),
+                    ("date", "=", tomorrow),
+                ]
+            ),
+            "The item should be stored in the grid of a new property",
+        )
+
+    def test_grid_keeps_item_priority(self):
+        """
+        Check that the grid stores the item that the priority of the
+        pricelist gives and leaves out the cells that depend on the sale
+        date.
+        ----------------
+        Create two items for the first night and an item with sale dates
+        for the second night.
+        """
+        # ARRANGE
+        night2 = self.checkin + datetime.timedelta(days=1)
+
+        # ACT
+        self._create_item(self.checkin, 60.0)
+        self._create_item(self.checkin, 65.0)
+        self._create_item(
+            night2,
+            45.0,
+            date_start=datetime.datetime.combine(
+                self.checkin, datetime.datetime.min.time()
+            ),
+        )
+
+        # ASSERT
+        self.assertEqual(
+            self._grid_prices(),
+            {self.checkin: 65.0},
+            "The newest item should win and the sale dated item "
+            "shouldn't be in the grid",
+        )
+
+    def test_reservation_priced_from_grid(self):
+        """
+        Check that a reservation gets the prices of the grid and the
+        dynamic price for the nights out of the grid.
+        ----------------
+        Create a 3 nights reservation with a daily price for the first
+        night only.
+        """
+        # ARRANGE
+        self._create_item(self.checkin, 70.0)
+
+        # ACT
+        reservation = self.env["pms.reservation"].create(
+            {
+                "partner_id": self.partner1.id,
+                "preferred_room_id": self.room1.id,
+                "checkin": self.checkin,
+                "checkout": self.checkin + datetime.timedelta(days=3),
+                "pms_property_id": self.pms_property1.id,
+                "pricelist_id": self.pricelist1.id,
+            }
+        )
+
+        # ASSERT
+        self.assertEqual(
+            reservation.reservation_line_ids.sorted("date").mapped("price"),
+            [70.0, 30.0, 30.0],
+            "The nights should be priced from the grid or the room type",
+        )
+
+    def test_massive_changes_fill_grid(self):
+        """
+        Check that the prices created by the massive changes wizard are
+        stored in the grid.
+        ----------------
+        Set a price for the room type for 3 days with the wizard.
+        """
+        # ARRANGE
+        date_to = self.checkin + datetime.timedelta(days=2)
+
+        # ACT
+        self.env["pms.massive.changes.wizard"].create(
+            {
+                "massive_changes_on": "pricelist",
+                "pricelist_ids": [(6, 0, [self.pricelist1.id])],
+                "start_date": self.checkin,
+                "end_date": date_to,
+                "room_type_ids": [(6, 0, [self.room_type_double.id])],
+                "pms_property_ids": [self.pms_property1.id],
+                "price": 80.0,
+            }
+        ).apply_massive_changes()
+
+        # ASSERT
+        self.assertEqual(
+            self._grid_prices(),
+            {self.checkin + datetime.timedelta(days=x): 80.0 for x in range(3)},
+            "Every day of the wizard should be in the grid",
+        )
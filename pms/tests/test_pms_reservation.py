@@ -3619,3 +3619,109 @@ class TestPmsReservations(TestPms):
             msg="A partner must be added to the reservation",
         ):
             several_partners_wizard.add_partner()
+
+    def test_create_reservations_batch(self):
+        """
+        Check that reservations created in a single call get their own
+        folio, consecutive names of the property sequence and their nights.
+        ---------------
+        Three reservations without folio are created in one call and their
+        names are compared with the next values of the sequence.
+        """
+        # ARRANGE
+        checkin = fields.date.today()
+        checkout = fields.date.today() + datetime.timedelta(days=3)
+        sequence = self.pms_property1.reservation_sequence_id
+        next_number = sequence.number_next_actual
+        expected_names = [
+            sequence.get_next_char(next_number + sequence.number_increment * x)
+            for x in range(3)
+        ]
+
+        # ACT
+        reservations = self.env["pms.reservation"].create(
+            [
+                {
+                    "checkin": checkin,
+                    "checkout": checkout,
+                    "room_type_id": self.room_type_double.id,
+                    "pms_property_id": self.pms_property1.id,
+                    "partner_name": "Group guest %s" % x,
+                }
+                for x in range(3)
+            ]
+        )
+
+        # ASSERT
+        self.assertEqual(
+            reservations.mapped("name"),
+            expected_names,
+            "The names should be allocated in a block of the sequence",
+        )
+        self.assertEqual(
+            len(reservations.mapped("folio_id")),
+            3,
+            "Each reservation without folio should get its own folio",
+        )
+        self.assertEqual(
+            reservations.mapped(lambda r: len(r.reservation_line_ids)),
+            [3, 3, 3],
+            "Each reservation should have a line by night",
+        )
+
+    def _count_move_queries(self, reservation):
+        """
+        Queries made to move the reservation one day later.
+        """
+        self.env["base"].flush()
+        queries = self.env.cr.sql_log_count
+        reservation.write(
+            {
+                "checkin": reservation.checkin + datetime.timedelta(days=1),
+                "checkout": reservation.checkout + datetime.timedelta(days=1),
+            }
+        )
+        self.env["base"].flush()
+        return self.env.cr.sql_log_count - queries
+
+    def test_move_long_stay_constant_queries(self):
+        """
+        Check that moving the dates of a long stay takes as many queries as
+        moving the dates of a short one.
+        ---------------
+        Reservations of 10 and 90 nights are moved one day later, after a
+        first move that warms up the caches, counting the queries of each
+        move.
+        """
+        # ARRANGE
+        checkin = fields.date.today()
+        short_stay, long_stay = self.env["pms.reservation"].create(
+            [
+                {
+                    "checkin": checkin,
+                    "checkout": checkin + datetime.timedelta(days=nights),
+                    "room_type_id": self.room_type_double.id,
+                    "preferred_room_id": room.id,
+                    "pms_property_id": self.pms_property1.id,
+                    "partner_id": self.partner1.id,
+                }
+                for nights, room in ((10, self.room1), (90, self.room2))
+            ]
+        )
+        self._count_move_queries(short_stay)
+
+        # ACT
+        short_stay_queries = self._count_move_queries(short_stay)
+        long_stay_queries = self._count_move_queries(long_stay)
+
+        # ASSERT
+        self.assertEqual(
+            len(long_stay.reservation_line_ids),
+            90,
+            "The long stay should keep a line by night",
+        )
+        self.assertEqual(
+            long_stay_queries,
+            short_stay_queries,
+            "Moving a long stay should not take more queries than a short one",
+        )
@@ -0,0 +1,119 @@
+import datetime
+import logging
+import time
+
+from odoo import fields
+from odoo.tests import tagged
+
+from .common import TestPms
+
+_logger = logging.getLogger(__name__)
+
+BENCHMARK_ROOMS = 500
+BENCHMARK_NIGHTS = 3
+
+
+@tagged("-standard", "pms_benchmark")
+class TestPmsReservationBenchmark(TestPms):
+    """
+    Throughput of the creation of the reservations of a 500 rooms group.
+    Not run by default, run it with --test-tags pms_benchmark.
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.room_type = self.env["pms.room.type"].create(
+            {
+                "pms_property_ids": [self.pms_property1.id],
+                "name": "Benchmark Double",
+                "default_code": "BNCH_DBL",
+                "class_id": self.room_type_class1.id,
+            }
+        )
+        self.rooms = self.env["pms.room"].create(
+            [
+                {
+                    "pms_property_id": self.pms_property1.id,
+                    "name": "Benchmark %s" % x,
+                    "room_type_id": self.room_type.id,
+                    "capacity": 2,
+                }
+                for x in range(BENCHMARK_ROOMS)
+            ]
+        )
+        self.folio = self.env["pms.folio"].create(
+            {
+                "pms_property_id": self.pms_property1.id,
+                "partner_name": "Benchmark group",
+            }
+        )
+
+    def _group_vals(self, checkin):
+        return [
+            {
+                "folio_id": self.folio.id,
+                "checkin": checkin,
+                "checkout": checkin + datetime.timedelta(days=BENCHMARK_NIGHTS),
+                "room_type_id": self.room_type.id,
+                "preferred_room_id": room.id,
+                "pms_property_id": self.pms_property1.id,
+            }
+            for room in self.rooms
+        ]
+
+    def _throughput(self, create):
+        queries_before = self.env.cr.sql_log_count
+        start = time.perf_counter()
+        reservations = create()
+        reservations.flush()
+        return (
+            reservations,
+            len(reservations) / (time.perf_counter() - start),
+            self.env.cr.sql_log_count - queries_before,
+        )
+
+    def test_group_creation_throughput(self):
+        """
+        Measure the reservations created by second for a group of 500
+        rooms, one reservation by call and all of them in a single call.
+        Both must create the same nights and the single call must run
+        fewer queries; the reservations by second are only logged, as
+        wall-clock timings are not reliable on a loaded worker.
+        """
+        # ARRANGE
+        Reservation = self.env["pms.reservation"]
+        checkin = fields.date.today()
+        batch_checkin = checkin + datetime.timedelta(days=BENCHMARK_NIGHTS)
+
+        # ACT
+        single, single_throughput, single_queries = self._throughput(
+            lambda: Reservation.browse(
+                [Reservation.create(vals).id for vals in self._group_vals(checkin)]
+            )
+        )
+        batch, batch_throughput, batch_queries = self._throughput(
+            lambda: Reservation.create(self._group_vals(batch_checkin))
+        )
+        _logger.info(
+            "Creation of a group of %s rooms, %s nights: "
+            "%.1f reservations/s (%s queries) one by one, "
+            "%.1f reservations/s (%s queries) in batch",
+            BENCHMARK_ROOMS,
+            BENCHMARK_NIGHTS,
+            single_throughput,
+            single_queries,
+            batch_throughput,
+            batch_queries,
+        )
+
+        # ASSERT
+        self.assertEqual(
+            len(batch.reservation_line_ids),
+            len(single.reservation_line_ids),
+            "The batch should create the nights of the one by one creation",
+        )
+        self.assertLess(
+            batch_queries,
+            single_queries,
+            "The batch creation should run fewer queries",
+        )
@@ -1285,3 +1285,406 @@ class TestPmsWizardMassiveChanges(TestPms):
             ),
             "The wizard should create as many items as properties given.",
         )
+
+    def test_background_changes_by_chunks(self):
+        """
+        Check that the changes applied in background are split in chunks
+        of dates and that the wizard reports the progress and the created
+        items when the jobs are done.
+        ----------------
+        Apply a price to a room type for 40 days in background, with the
+        jobs run at once.
+        """
+        # ARRANGE
+        room_type_double = self.env["pms.room.type"].create(
+            {
+                "pms_property_ids": [self.pms_property1.id],
+                "name": "Double Test",
+                "default_code": "DBL_Test",
+                "class_id": self.room_type_class1.id,
+            }
+        )
+        date_from = fields.date.today()
+        date_to = date_from + datetime.timedelta(days=39)
+        wizard = (
+            self.env["pms.massive.changes.wizard"]
+            .with_context(queue_job__no_delay=True)
+            .create(
+                {
+                    "massive_changes_on": "pricelist",
+                    "pricelist_ids": [(6, 0, [self.pricelist1.id])],
+                    "start_date": date_from,
+                    "end_date": date_to,
+                    "room_type_ids": [(6, 0, [room_type_double.id])],
+                    "pms_property_ids": [self.pms_property1.id],
+                    "price": 60.0,
+                    "run_in_background": True,
+                }
+            )
+        )
+
+        # ACT
+        wizard.apply_massive_changes()
+
+        # ASSERT
+        self.assertEqual(
+            (wizard.state, wizard.job_chunk_count, wizard.progress),
+            ("done", 2, 100.0),
+            "The 40 days should be applied in 2 jobs",
+        )
+        self.assertEqual(
+            sorted(wizard.created_pricelist_item_ids.mapped("date_start_consumption")),
+            [date_from + datetime.timedelta(days=x) for x in range(40)],
+            "The wizard should link an item for each day",
+        )
+
+    def test_background_job_without_wizard(self):
+        """
+        Check that a queued chunk applies the changes when its wizard has
+        been vacuumed.
+        ----------------
+        Take the job values of a wizard that applies a price for 3 days,
+        delete the wizard and run the job of the chunk.
+        """
+        # ARRANGE
+        room_type_double = self.env["pms.room.type"].create(
+            {
+                "pms_property_ids": [self.pms_property1.id],
+                "name": "Double Test",
+                "default_code": "DBL_Test",
+                "class_id": self.room_type_class1.id,
+            }
+        )
+        date_from = fields.date.today()
+        date_to = date_from + datetime.timedelta(days=2)
+        Wizard = self.env["pms.massive.changes.wizard"]
+        wizard = Wizard.create(
+            {
+                "massive_changes_on": "pricelist",
+                "pricelist_ids": [(6, 0, [self.pricelist1.id])],
+                "start_date": date_from,
+                "end_date": date_to,
+                "room_type_ids": [(6, 0, [room_type_double.id])],
+                "pms_property_ids": [self.pms_property1.id],
+                "price": 60.0,
+                "run_in_background": True,
+            }
+        )
+        wizard_vals = wizard._get_massive_changes_job_vals()
+        wizard_id = wizard.id
+        wizard.unlink()
+
+        # ACT
+        Wizard._apply_massive_changes_chunk(wizard_vals, wizard_id, date_from, date_to)
+
+        # ASSERT
+        items = self.env["product.pricelist.item"].search(
+            [
+                ("pricelist_id", "=", self.pricelist1.id),
+                ("product_id", "=", room_type_double.product_id.id),
+            ]
+        )
+        self.assertEqual(
+            sorted(items.mapped("date_start_consumption")),
+            [date_from + datetime.timedelta(days=x) for x in range(3)],
+            "The job should apply the changes without the wizard",
+        )
+
+    def test_availability_rules_upsert(self):
+        """
+        Check that the wizard updates only the applied fields of the
+        existing rules and creates the missing ones with their plan
+        availability.
+        ----------------
+        Create a rule with a quota for today and apply a min. stay for
+        today and tomorrow.
+        """
+        # ARRANGE
+        room_type_double = self.env["pms.room.type"].create(
+            {
+                "pms_property_ids": [self.pms_property1.id],
+                "name": "Double Test",
+                "default_code": "DBL_Test",
+                "class_id": self.room_type_class1.id,
+            }
+        )
+        self.env["pms.room"].create(
+            {
+                "pms_property_id": self.pms_property1.id,
+                "name": "Double 201",
+                "room_type_id": room_type_double.id,
+                "capacity": 2,
+            }
+        )
+        today = fields.date.today()
+        tomorrow = today + datetime.timedelta(days=1)
+        rule = self.env["pms.availability.plan.rule"].create(
+            {
+                "availability_plan_id": self.availability_plan1.id,
+                "room_type_id": room_type_double.id,
+                "date": today,
+                "quota": 0,
+                "pms_property_id": self.pms_property1.id,
+            }
+        )
+
+        # ACT
+        self.env["pms.massive.changes.wizard"].create(
+            {
+                "massive_changes_on": "availability_plan",
+                "availability_plan_ids": [(6, 0, [self.availability_plan1.id])],
+                "start_date": today,
+                "end_date": tomorrow,
+                "room_type_ids": [(6, 0, [room_type_double.id])],
+                "pms_property_ids": [self.pms_property1.id],
+                "min_stay": 3,
+                "apply_min_stay": True,
+            }
+        ).apply_massive_changes()
+
+        # ASSERT
+        new_rule = self.availability_plan1.rule_ids - rule
+        self.assertEqual(
+            (rule.min_stay, rule.quota, rule.plan_avail),
+            (3, 0, 0),
+            "The existing rule should only get the new min. stay",
+        )
+        self.assertEqual(
+            (new_rule.date, new_rule.min_stay, new_rule.plan_avail),
+            (tomorrow, 3, 1),
+            "The missing rule should be created with its plan availability",
+        )
+
+    def test_preview_availability_rules(self):
+        """
+        Check that the preview counts the rules to create and to update
+        without changing them.
+        ----------------
+        Create a rule for today and preview a min. stay for 3 days.
+        """
+        # ARRANGE
+        room_type_double = self.env["pms.room.type"].create(
+            {
+                "pms_property_ids": [self.pms_property1.id],
+                "name": "Double Test",
+                "default_code": "DBL_Test",
+                "class_id": self.room_type_class1.id,
+            }
+        )
+        today = fields.date.today()
+        self.env["pms.availability.plan.rule"].create(
+            {
+                "availability_plan_id": self.availability_plan1.id,
+                "room_type_id": room_type_double.id,
+                "date": today,
+                "pms_property_id": self.pms_property1.id,
+            }
+        )
+        wizard = self.env["pms.massive.changes.wizard"].create(
+            {
+                "massive_changes_on": "availability_plan",
+                "availability_plan_ids": [(6, 0, [self.availability_plan1.id])],
+                "start_date": today,
+                "end_date": today + datetime.timedelta(days=2),
+                "room_type_ids": [(6, 0, [room_type_double.id])],
+                "pms_property_ids": [self.pms_property1.id],
+                "min_stay": 2,
+                "apply_min_stay": True,
+            }
+        )
+
+        # ACT
+        wizard.action_preview()
+
+        # ASSERT
+        self.assertEqual(
+            (
+                wizard.preview_insert_count,
+                wizard.preview_update_count,
+                wizard.preview_delete_count,
+            ),
+            (2, 1, 0),
+            "The preview should count 2 rules to create and 1 to update",
+        )
+        self.assertEqual(
+            wizard.preview_line_ids.mapped("update_count"),
+            [1, 0, 0],
+            "The preview should show the rule to update on its date",
+        )
+        self.assertEqual(
+            (
+                len(self.availability_plan1.rule_ids),
+                self.availability_plan1.rule_ids.min_stay,
+            ),
+            (1, 0),
+            "The preview shouldn't change the rules",
+        )
+
+    def test_preview_pricelist_items(self):
+        """
+        Check that the preview counts the items that the wizard replaces
+        and that the apply replaces the same items.
+        ----------------
+        Create an item for today and preview and apply a price for today
+        and tomorrow.
+        """
+        # ARRANGE
+        room_type_double = self.env["pms.room.type"].create(
+            {
+                "pms_property_ids": [self.pms_property1.id],
+                "name": "Double Test",
+                "default_code": "DBL_Test",
+                "class_id": self.room_type_class1.id,
+            }
+        )
+        today = fields.date.today()
+        item = self.env["product.pricelist.item"].create(
+            {
+                "pricelist_id": self.pricelist1.id,
+                "date_start_consumption": today,
+                "date_end_consumption": today,
+                "compute_price": "fixed",
+                "applied_on": "0_product_variant",
+                "product_id": room_type_double.product_id.id,
+                "fixed_price": 40.0,
+                "pms_property_ids": [self.pms_property1.id],
+            }
+        )
+        wizard = self.env["pms.massive.changes.wizard"].create(
+            {
+                "massive_changes_on": "pricelist",
+                "pricelist_ids": [(6, 0, [self.pricelist1.id])],
+                "start_date": today,
+                "end_date": today + datetime.timedelta(days=1),
+                "room_type_ids": [(6, 0, [room_type_double.id])],
+                "pms_property_ids": [self.pms_property1.id],
+                "price": 60.0,
+            }
+        )
+
+        # ACT
+        wizard.action_preview()
+        preview_counts = (
+            wizard.preview_insert_count,
+            wizard.preview_update_count,
+            wizard.preview_delete_count,
+        )
+        item_kept = bool(item.exists())
+        wizard.apply_massive_changes()
+
+        # ASSERT
+        self.assertEqual(
+            (preview_counts, item_kept),
+            ((2, 0, 1), True),
+            "The preview should count the item to replace without removing it",
+        )
+        self.assertFalse(item.exists(), "The apply should replace the item")
+
+    def test_availability_rules_as_date_range(self):
+        """
+        Check that the wizard applied as a date range creates a single
+        range rule and updates the daily rules of the range.
+        ----------------
+        Create a rule for tomorrow and apply a min. stay for a year as a
+        date range.
+        """
+        # ARRANGE
+        room_type_double = self.env["pms.room.type"].create(
+            {
+                "pms_property_ids": [self.pms_property1.id],
+                "name": "Double Test",
+                "default_code": "DBL_Test",
+                "class_id": self.room_type_class1.id,
+            }
+        )
+        today = fields.date.today()
+        rule = self.env["pms.availability.plan.rule"].create(
+            {
+                "availability_plan_id": self.availability_plan1.id,
+                "room_type_id": room_type_double.id,
+                "date": today + datetime.timedelta(days=1),
+                "pms_property_id": self.pms_property1.id,
+            }
+        )
+
+        # ACT
+        self.env["pms.massive.changes.wizard"].create(
+            {
+                "massive_changes_on": "availability_plan",
+                "availability_plan_ids": [(6, 0, [self.availability_plan1.id])],
+                "start_date": today,
+                "end_date": today + datetime.timedelta(days=365),
+                "room_type_ids": [(6, 0, [room_type_double.id])],
+                "pms_property_ids": [self.pms_property1.id],
+                "min_stay": 3,
+                "apply_min_stay": True,
+                "apply_as_date_range": True,
+            }
+        ).apply_massive_changes()
+
+        # ASSERT
+        range_rule = self.availability_plan1.range_rule_ids
+        self.assertEqual(
+            (range_rule.date_from, range_rule.date_to, range_rule.min_stay),
+            (today, today + datetime.timedelta(days=365), 3),
+            "A single range rule should hold the min. stay of the year",
+        )
+        self.assertEqual(
+            self.availability_plan1.rule_ids, rule, "No daily rule should be created"
+        )
+        self.assertEqual(rule.min_stay, 3, "The daily rule should get the min. stay")
+
+    def test_daily_quota_keeps_range_rule_restrictions(self):
+        """
+        Check that a daily rule created by the wizard over a range rule
+        keeps the restrictions of the range rule.
+        ----------------
+        Close the room type for a week with a range rule, then apply only
+        a quota for tomorrow by day. The new daily rule of tomorrow must
+        have the quota and stay closed.
+        """
+        # ARRANGE
+        room_type_double = self.env["pms.room.type"].create(
+            {
+                "pms_property_ids": [self.pms_property1.id],
+                "name": "Double Test",
+                "default_code": "DBL_Test",
+                "class_id": self.room_type_class1.id,
+            }
+        )
+        today = fields.date.today()
+        tomorrow = today + datetime.timedelta(days=1)
+        self.env["pms.availability.plan.range.rule"].create(
+            {
+                "availability_plan_id": self.availability_plan1.id,
+                "room_type_id": room_type_double.id,
+                "pms_property_id": self.pms_property1.id,
+                "date_from": today,
+                "date_to": today + datetime.timedelta(days=6),
+                "closed": True,
+                "min_stay": 2,
+            }
+        )
+
+        # ACT
+        self.env["pms.massive.changes.wizard"].create(
+            {
+                "massive_changes_on": "availability_plan",
+                "availability_plan_ids": [(6, 0, [self.availability_plan1.id])],
+                "start_date": tomorrow,
+                "end_date": tomorrow,
+                "room_type_ids": [(6, 0, [room_type_double.id])],
+                "pms_property_ids": [self.pms_property1.id],
+                "quota": 2,
+                "apply_quota": True,
+            }
+        ).apply_massive_changes()
+
+        # ASSERT
+        rule = self.availability_plan1.rule_ids
+        self.assertEqual(rule.date, tomorrow, "A daily rule should be created")
+        self.assertEqual(
+            (rule.quota, rule.closed, rule.min_stay),
+            (2, True, 2),
+            "The daily rule should get the quota and keep the range restrictions",
+        )
@@ -485,3 +485,78 @@ class TestPmsSharedRoom(TestPms):
             2,
             "The child room avail dont update when " "cancel parent room reservation",
         )
+
+    def test_not_avail_rooms_in_nested_shared_rooms(self):
+        """
+        Check that an occupied bed blocks all the rooms above it and that
+        an occupied top room blocks all the rooms below it, whatever the
+        depth of the hierarchy.
+        ----------------
+        Create a suite that contains room1 (which contains two beds),
+        create a reservation in bed1 the first night and a reservation in
+        the suite the second night, and check the rooms not available
+        """
+
+        # ARRANGE
+        today = fields.date.today()
+        tomorrow = fields.date.today() + datetime.timedelta(days=1)
+        after_tomorrow = fields.date.today() + datetime.timedelta(days=2)
+        suite = self.env["pms.room"].create(
+            {
+                "pms_property_id": self.pms_property1.id,
+                "name": "Suite 100",
+                "room_type_id": self.room_type_test.id,
+                "capacity": 4,
+            }
+        )
+        self.room1.parent_id = suite
+        all_rooms = suite | self.room1 | self.r1bed1 | self.r1bed2
+
+        # ACT
+        self.env["pms.reservation"].create(
+            {
+                "partner_id": self.partner1.id,
+                "preferred_room_id": self.r1bed1.id,
+                "checkin": today,
+                "checkout": tomorrow,
+                "pms_property_id": self.pms_property1.id,
+            }
+        )
+        self.env["pms.reservation"].create(
+            {
+                "partner_id": self.partner1.id,
+                "preferred_room_id": suite.id,
+                "checkin": tomorrow,
+                "checkout": after_tomorrow,
+                "pms_property_id": self.pms_property1.id,
+            }
+        )
+
+        # ASSERT
+        Avail = self.env["pms.availability"]
+        with self.subTest(night=today):
+            self.assertEqual(
+                set(
+                    Avail.get_rooms_not_avail(
+                        checkin=today,
+                        checkout=tomorrow,
+                        room_ids=all_rooms.ids,
+                        pms_property_id=self.pms_property1.id,
+                    )
+                ),
+                set((suite | self.room1 | self.r1bed1).ids),
+                "An occupied bed should block all its ancestor rooms",
+            )
+        with self.subTest(night=tomorrow):
+            self.assertEqual(
+                set(
+                    Avail.get_rooms_not_avail(
+                        checkin=tomorrow,
+                        checkout=after_tomorrow,
+                        room_ids=all_rooms.ids,
+                        pms_property_id=self.pms_property1.id,
+                    )
+                ),
+                set(all_rooms.ids),
+                "An occupied suite should block all its descendant rooms",
+            )
@@ -113,6 +113,12 @@ class BookingEngine(models.TransientModel):
         string="Internal Folio Notes",
         help="Internal Folio notes for Staff",
     )
+    hold_token = fields.Char(
+        string="Hold Token",
+        help="Token of the holds taken on the selected rooms",
+        readonly=True,
+        copy=False,
+    )
 
     def _default_pms_property_id(self):
         if self._context.get("default_folio_id"):
@@ -184,21 +190,21 @@ class BookingEngine(models.TransientModel):
 
                 cmds = [(5, 0, 0)]
 
-                for room_type_iterator in self.env["pms.room.type"].search(
+                room_types = self.env["pms.room.type"].search(
                     [
                         "|",
                         ("pms_property_ids", "=", False),
                         ("pms_property_ids", "in", record.pms_property_id.id),
                     ]
-                ):
-                    pms_property = record.pms_property_id
-                    pms_property = pms_property.with_context(
-                        checkin=record.start_date,
-                        checkout=record.end_date,
-                        room_type_id=room_type_iterator.id,
-                        pricelist_id=record.pricelist_id.id,
-                    )
-                    num_rooms_available = pms_property.availability
+                )
+                matrix = record.pms_property_id.get_availability_matrix(
+                    checkin=record.start_date,
+                    checkout=record.end_date,
+                    room_type_ids=room_types.ids,
+                    pricelist_id=record.pricelist_id.id,
+                )
+                for room_type_iterator in room_types:
+                    num_rooms_available = matrix[room_type_iterator.id]["availability"]
 
                     cmds.append(
                         (
@@ -224,6 +230,80 @@ class BookingEngine(models.TransientModel):
                         key=lambda s: s.num_rooms_available, reverse=True
                     )
 
+    def _get_room_assignments(self):
+        """
+        Assign jointly the rooms of the whole group, so that they sit
+        together and a group that does not fit fails before any reservation
+        is created. The rooms held by the wizard count as free.
+        :return: dict {(checkin, checkout): {room_type_id: [room_ids]}}
+        """
+        self.ensure_one()
+        lines_by_dates = {}
+        for line in self.availability_results.filtered("value_num_rooms_selected"):
+            lines_by_dates.setdefault((line.checkin, line.checkout), []).append(line)
+        pms_property = (self.folio_id or self).pms_property_id.with_context(
+            inventory_hold_token=self.hold_token
+        )
+        room_assignments = {}
+        for (checkin, checkout), lines in lines_by_dates.items():
+            room_type_demands = {}
+            for line in lines:
+                room_type_demands[line.room_type_id.id] = (
+                    room_type_demands.get(line.room_type_id.id, 0)
+                    + line.value_num_rooms_selected
+                )
+            room_assignments[
+                (checkin, checkout)
+            ] = pms_property.get_group_room_assignment(
+                checkin=checkin,
+                checkout=checkout,
+                room_type_demands=room_type_demands,
+                pricelist_id=self.pricelist_id.id,
+            )
+        return room_assignments
+
+    def _hold_room_assignments(self, room_assignments):
+        """
+        Hold the assigned rooms with the token of the wizard, extending the
+        holds it already has.
+        :return: token of the holds
+        """
+        self.ensure_one()
+        pms_property = (self.folio_id or self).pms_property_id
+        hold_token = self.hold_token
+        for (checkin, checkout), assignment in room_assignments.items():
+            hold_token = self.env["pms.inventory.hold"].hold_rooms(
+                pms_property_id=pms_property.id,
+                checkin=checkin,
+                checkout=checkout,
+                room_ids=[
+                    room_id
+                    for room_ids in assignment.values()
+                    for room_id in room_ids
+                    if room_id
+                ],
+                token=hold_token,
+            )
+        self.hold_token = hold_token
+        return hold_token
+
+    def action_hold_rooms(self):
+        """
+        Hold the selected rooms while the booking is completed. The holds
+        are committed with the request, so competing bookings see them, and
+        they are converted into reservations by create_folio or expire if the
+        booking is abandoned.
+        """
+        self.ensure_one()
+        self._hold_room_assignments(self._get_room_assignments())
+        return {
+            "type": "ir.actions.act_window",
+            "res_model": self._name,
+            "res_id": self.id,
+            "view_mode": "form",
+            "target": "new",
+        }
+
     def create_folio(self):
         for record in self:
             if not record.folio_id:
@@ -244,14 +324,30 @@ class BookingEngine(models.TransientModel):
                 )
             else:
                 folio = record.folio_id
-            for line in record.availability_results:
+            # the holds taken when the rooms were selected become the
+            # reservations; rooms not held yet are held now, before the
+            # heavy computes of the reservations
+            room_assignments = record._get_room_assignments()
+            hold_token = record._hold_room_assignments(room_assignments)
+            Reservation = self.env["pms.reservation"].with_context(
+                inventory_hold_token=hold_token
+            )
+            # the reservations of the whole group are created in batch
+            reservations_vals = []
+            for line in record.availability_results.filtered(
+                "value_num_rooms_selected"
+            ):
+                room_ids = room_assignments[(line.checkin, line.checkout)][
+                    line.room_type_id.id
+                ]
                 for _reservations_to_create in range(0, line.value_num_rooms_selected):
-                    res = self.env["pms.reservation"].create(
+                    reservations_vals.append(
                         {
                             "folio_id": folio.id,
                             "checkin": line.checkin,
                             "checkout": line.checkout,
                             "room_type_id": line.room_type_id.id,
+                            "preferred_room_id": room_ids.pop(0),
                             "partner_id": record.partner_id.id
                             if record.partner_id
                             else False,
@@ -261,7 +357,22 @@ class BookingEngine(models.TransientModel):
                             "board_service_room_id": line.board_service_room_id.id,
                         }
                     )
-                    res.reservation_line_ids.discount = record.discount * 100
+            reservations = Reservation.create(
+                [vals for vals in reservations_vals if vals["preferred_room_id"]]
+            )
+            # the stays split between rooms are allocated one after another,
+            # so that each one sees the nights taken by the previous ones
+            for vals in reservations_vals:
+                if not vals.pop("preferred_room_id"):
+                    reservations.flush()
+                    reservations |= Reservation.create(vals)
+            reservations.reservation_line_ids.discount = record.discount * 100
+            # the rooms were assigned automatically, not by the user
+            reservations.to_assign = True
+            reservations.flush()
+            if hold_token:
+                self.env["pms.inventory.hold"].release_holds(hold_token)
+                record.hold_token = False
             action = self.env.ref("pms.open_pms_folio1_form_tree_all").read()[0]
             action["views"] = [(self.env.ref("pms.pms_folio_view_form").id, "form")]
             action["res_id"] = folio.id
@@ -353,15 +464,31 @@ class AvailabilityWizard(models.TransientModel):
 
     @api.depends("room_type_id", "checkin", "checkout")
     def _compute_num_rooms_available(self):
+        # lines of the same search share a single availability matrix
+        matrices = {}
         for record in self:
             pms_property = record.booking_engine_id.pms_property_id
-            pms_property = pms_property.with_context(
-                checkin=record.checkin,
-                checkout=record.checkout,
-                room_type_id=record.room_type_id.id,
-                pricelist_id=record.booking_engine_id.pricelist_id.id,
+            if not pms_property or not record.room_type_id:
+                record.num_rooms_available = 0
+                continue
+            key = (
+                pms_property.id,
+                record.checkin,
+                record.checkout,
+                record.booking_engine_id.pricelist_id.id,
             )
-            record.num_rooms_available = pms_property.availability
+            if key not in matrices:
+                matrices[key] = pms_property.get_availability_matrix(
+                    checkin=record.checkin,
+                    checkout=record.checkout,
+                    room_type_ids=self.filtered(
+                        lambda r: r.booking_engine_id.pms_property_id == pms_property
+                    ).room_type_id.ids,
+                    pricelist_id=record.booking_engine_id.pricelist_id.id,
+                )
+            record.num_rooms_available = matrices[key][record.room_type_id.id][
+                "availability"
+            ]
 
     @api.depends("num_rooms_available")
     def _compute_num_rooms_selected(self):
@@ -425,10 +552,20 @@ class AvailabilityWizard(models.TransientModel):
         room_type_total_price_per_room = 0
         room_type = self.env["pms.room.type"].browse(room_type_id)
         pms_property = self.env["pms.property"].browse(pms_property_id)
-        for date_iterator in [
+        dates = [
             checkin + datetime.timedelta(days=x)
             for x in range(0, (checkout - checkin).days)
-        ]:
+        ]
+        stay_items = {}
+        if pricelist_id and pms_property_id:
+            stay_items = (
+                self.env["product.pricelist"]
+                .browse(pricelist_id)
+                .get_pms_stay_items(
+                    room_type.product_id, pms_property_id, dates, fields.Date.today()
+                )
+            )
+        for date_iterator in dates:
 
             product = room_type.product_id
             product = product.with_company(pms_property.company_id).with_context(
@@ -438,6 +575,7 @@ class AvailabilityWizard(models.TransientModel):
                 pricelist=pricelist_id,
                 uom=product.uom_id.id,
                 property=pms_property_id,
+                pricelist_item_ids=stay_items.get(date_iterator, False),
             )
             room_type_total_price_per_room += product.price
 
@@ -1,6 +1,24 @@
 import datetime
 
 from odoo import _, api, fields, models
+from odoo.exceptions import ValidationError
+
+# days of each job when the changes are applied in background
+MASSIVE_CHANGES_CHUNK_DAYS = 31
+# dates shown in the preview of the changes
+MASSIVE_CHANGES_PREVIEW_DATES = 31
+# fields of the wizard that report the changes instead of defining them
+MASSIVE_CHANGES_REPORT_FIELDS = {
+    "state",
+    "job_chunk_count",
+    "job_chunk_done",
+    "created_pricelist_item_ids",
+    "created_rule_ids",
+    "preview_insert_count",
+    "preview_update_count",
+    "preview_delete_count",
+    "preview_line_ids",
+}
 
 
 class AvailabilityWizard(models.TransientModel):
@@ -268,6 +286,108 @@ class AvailabilityWizard(models.TransientModel):
         string="Pricelist Readonly",
         default=lambda self: self._default_pricelist_readonly(),
     )
+    run_in_background = fields.Boolean(
+        string="Run in background",
+        help="Apply the changes in queued jobs of a month of dates each, "
+        "to change long periods without waiting for them",
+        default=False,
+    )
+    apply_as_date_range = fields.Boolean(
+        string="Apply as date range",
+        help="Store the restrictions as one date range rule by plan, room "
+        "type and property instead of one rule by day. The daily rules "
+        "already set in the dates get the applied fields.",
+        default=False,
+    )
+    state = fields.Selection(
+        string="State",
+        help="State of the changes applied in background",
+        selection=[
+            ("draft", "Draft"),
+            ("running", "Running"),
+            ("done", "Done"),
+        ],
+        default="draft",
+        readonly=True,
+    )
+    job_chunk_count = fields.Integer(
+        string="Jobs",
+        help="Number of jobs of the changes applied in background",
+        readonly=True,
+    )
+    job_chunk_done = fields.Integer(
+        string="Jobs done",
+        help="Number of jobs already done",
+        readonly=True,
+    )
+    progress = fields.Float(
+        string="Progress",
+        help="Percentage of the jobs already done",
+        compute="_compute_progress",
+    )
+    created_pricelist_item_ids = fields.Many2many(
+        string="Applied pricelist items",
+        help="Pricelist items created by the changes applied in background",
+        readonly=True,
+        comodel_name="product.pricelist.item",
+        relation="massive_changes_created_pricelist_item_rel",
+        column1="massive_changes_id",
+        column2="pricelist_item_id",
+    )
+    preview_insert_count = fields.Integer(
+        string="Records to create",
+        help="Records that the changes create, as of the last preview",
+        readonly=True,
+    )
+    preview_update_count = fields.Integer(
+        string="Records to update",
+        help="Records that the changes update, as of the last preview",
+        readonly=True,
+    )
+    preview_delete_count = fields.Integer(
+        string="Records to delete",
+        help="Records that the changes delete, as of the last preview",
+        readonly=True,
+    )
+    preview_line_ids = fields.One2many(
+        string="Preview",
+        help="Changes of the first dates, as of the last preview",
+        readonly=True,
+        comodel_name="pms.massive.changes.preview.line",
+        inverse_name="wizard_id",
+    )
+    created_rule_ids = fields.Many2many(
+        string="Applied availability rules",
+        help="Availability rules created or modified by the changes "
+        "applied in background",
+        readonly=True,
+        comodel_name="pms.availability.plan.rule",
+        relation="massive_changes_created_rule_rel",
+        column1="massive_changes_id",
+        column2="rule_id",
+    )
+
+    @api.constrains(
+        "apply_as_date_range",
+        "massive_changes_on",
+        "apply_quota",
+        "apply_max_avail",
+        "apply_on_all_week",
+    )
+    def _check_apply_as_date_range(self):
+        for record in self.filtered("apply_as_date_range"):
+            if record.massive_changes_on != "availability_plan":
+                raise ValidationError(
+                    _("Only the availability plan rules can be applied as a date range")
+                )
+            if record.apply_quota or record.apply_max_avail:
+                raise ValidationError(
+                    _("The date range rules have no quota or max. availability")
+                )
+            if not record.apply_on_all_week:
+                raise ValidationError(
+                    _("The date range rules apply on every day of the week")
+                )
 
     def _default_avail_readonly(self):
         return True if self._context.get("availability_plan_id") else False
@@ -517,6 +637,8 @@ class AvailabilityWizard(models.TransientModel):
                 elif record.date_types == "consumption_dates":
                     domain.append(("date_start_consumption", ">=", record.start_date))
                     domain.append(("date_end_consumption", "<=", record.end_date))
+                    # runs of daily prices are split by the new items
+                    domain.append(("consumption_run", "=", False))
 
                 product_ids = self.generate_product_ids_to_filter(
                     record.apply_pricelists_on,
@@ -579,6 +701,15 @@ class AvailabilityWizard(models.TransientModel):
             else:
                 record.pricelist_items_to_overwrite = False
 
+    @api.depends("job_chunk_count", "job_chunk_done")
+    def _compute_progress(self):
+        for record in self:
+            record.progress = (
+                100.0 * record.job_chunk_done / record.job_chunk_count
+                if record.job_chunk_count
+                else 0.0
+            )
+
     @api.depends(
         "rules_to_overwrite",
     )
@@ -667,7 +798,7 @@ class AvailabilityWizard(models.TransientModel):
         return vals
 
     @api.model
-    def create_pricelists_items_room_types(
+    def prepare_pricelists_items_room_types(
         self,
         room_types,
         pricelist_ids,
@@ -677,7 +808,7 @@ class AvailabilityWizard(models.TransientModel):
         date,
         date_types,
     ):
-        new_items = []
+        vals_list = []
         for room_type in room_types:
             for pricelist in pricelist_ids:
                 vals = {
@@ -689,14 +820,11 @@ class AvailabilityWizard(models.TransientModel):
                     "min_quantity": min_quantity,
                     "pms_property_ids": [pms_property.id],
                 }
-                vals = self.generate_dates_vals(date_types, vals, date)
-
-                pricelist_item = self.env["product.pricelist.item"].create(vals)
-                new_items.append(pricelist_item.id)
-        return new_items
+                vals_list.append(self.generate_dates_vals(date_types, vals, date))
+        return vals_list
 
     @api.model
-    def create_pricelists_items_board_services(
+    def prepare_pricelists_items_board_services(
         self,
         board_service_room_type_ids,
         pricelist_ids,
@@ -707,133 +835,127 @@ class AvailabilityWizard(models.TransientModel):
         date_types,
         date,
     ):
-        new_items = []
+        vals_list = []
         for bs_room_type in board_service_room_type_ids:
+            if board_service:
+                products = board_service
+            else:
+                products = (
+                    bs_room_type.pms_board_service_id.board_service_line_ids.mapped(
+                        "product_id"
+                    )
+                )
             for pricelist in pricelist_ids:
-                if board_service:
+                for product in products:
                     vals = {
                         "pricelist_id": pricelist.id,
                         "compute_price": "fixed",
                         "applied_on": "0_product_variant",
-                        "product_id": board_service.id,
+                        "product_id": product.id,
                         "board_service_room_type_id": bs_room_type.id,
                         "fixed_price": price,
                         "min_quantity": min_quantity,
                         "pms_property_ids": [pms_property.id],
                     }
-                    vals = self.generate_dates_vals(date_types, vals, date)
-
-                    pricelist_item = self.env["product.pricelist.item"].create(vals)
-                    new_items.append(pricelist_item.id)
+                    vals_list.append(self.generate_dates_vals(date_types, vals, date))
+        return vals_list
 
-                else:
-                    for (
-                        board_service_line
-                    ) in bs_room_type.pms_board_service_id.board_service_line_ids:
-                        vals = {
-                            "pricelist_id": pricelist.id,
-                            "compute_price": "fixed",
-                            "applied_on": "0_product_variant",
-                            "product_id": board_service_line.product_id.id,
-                            "board_service_room_type_id": bs_room_type.id,
-                            "fixed_price": price,
-                            "min_quantity": min_quantity,
-                            "pms_property_ids": [pms_property.id],
-                        }
-                        vals = self.generate_dates_vals(date_types, vals, date)
-
-                        pricelist_item = self.env["product.pricelist.item"].create(vals)
-                        new_items.append(pricelist_item.id)
-        return new_items
+    @api.model
+    def prepare_pricelists_items_service(
+        self,
+        service,
+        pricelist_ids,
+        price,
+        min_quantity,
+        pms_property,
+        date_types,
+        date,
+    ):
+        vals_list = []
+        if service:
+            for pricelist in pricelist_ids:
+                vals = {
+                    "pricelist_id": pricelist.id,
+                    "compute_price": "fixed",
+                    "applied_on": "0_product_variant",
+                    "product_id": service.id,
+                    "fixed_price": price,
+                    "min_quantity": min_quantity,
+                    "pms_property_ids": [pms_property.id],
+                }
+                vals_list.append(self.generate_dates_vals(date_types, vals, date))
+        return vals_list
+
+    def _get_availability_rule_vals(self):
+        """
+        Values of the availability rules created by the wizard and names
+        of the fields written on the rules that already exist.
+        """
+        fields_to_apply = (
+            "min_stay",
+            "min_stay_arrival",
+            "max_stay",
+            "max_stay_arrival",
+            "quota",
+            "max_avail",
+            "closed",
+            "closed_arrival",
+            "closed_departure",
+        )
+        rule_vals = {field: self[field] for field in fields_to_apply}
+        update_fields = [field for field in fields_to_apply if self["apply_" + field]]
+        return rule_vals, update_fields
 
     @api.model
-    def create_availability_plans_rules(
+    def prepare_availability_plans_rules(
         self,
         room_types,
         availability_plan_ids,
-        min_stay,
-        apply_min_stay,
-        min_stay_arrival,
-        apply_min_stay_arrival,
-        max_stay,
-        apply_max_stay,
-        max_stay_arrival,
-        apply_max_stay_arrival,
-        quota,
-        apply_quota,
-        max_avail,
-        apply_max_avail,
-        closed,
-        apply_closed,
-        closed_arrival,
-        apply_closed_arrival,
-        closed_departure,
-        apply_closed_departure,
+        rule_vals,
         date,
-        rules_to_overwrite,
         pms_property,
     ):
-        new_items = []
-        for room_type in room_types:
-            for avail_plan_id in availability_plan_ids:
-                vals = {}
-                vals.update({"min_stay": min_stay} if apply_min_stay else {})
-                vals.update(
-                    {"min_stay_arrival": min_stay_arrival}
-                    if apply_min_stay_arrival
-                    else {}
-                )
-                vals.update({"max_stay": max_stay} if apply_max_stay else {})
-
-                vals.update(
-                    {"max_stay_arrival": max_stay_arrival}
-                    if apply_max_stay_arrival
-                    else {}
-                )
-                vals.update({"quota": quota} if apply_quota else {})
-                vals.update({"max_avail": max_avail} if apply_max_avail else {})
-
-                vals.update({"closed": closed} if apply_closed else {})
-                vals.update(
-                    {"closed_arrival": closed_arrival} if apply_closed_arrival else {}
-                )
-                vals.update(
-                    {"closed_departure": closed_departure}
-                    if apply_closed_departure
-                    else {}
-                )
-
-                if date in rules_to_overwrite.mapped(
-                    "date"
-                ) and room_type in rules_to_overwrite.mapped("room_type_id"):
-                    overwrite = rules_to_overwrite.filtered(
-                        lambda x: x.room_type_id == room_type
-                        and x.date == date
-                        and x.pms_property_id.id == pms_property.id
-                    )
-                    overwrite.write(vals)
-                    new_items += overwrite.ids
-                else:
-                    plan_rule = self.env["pms.availability.plan.rule"].create(
-                        {
-                            "availability_plan_id": avail_plan_id.id,
-                            "date": date,
-                            "room_type_id": room_type.id,
-                            "quota": quota,
-                            "max_avail": max_avail,
-                            "min_stay": min_stay,
-                            "min_stay_arrival": min_stay_arrival,
-                            "max_stay": max_stay,
-                            "max_stay_arrival": max_stay_arrival,
-                            "closed": closed,
-                            "closed_arrival": closed_arrival,
-                            "closed_departure": closed_departure,
-                            "pms_property_id": pms_property.id,
-                        }
-                    )
-                    new_items.append(plan_rule.id)
+        """
+        :return: dict {(availability_plan_id, room_type_id, date,
+                 pms_property_id): vals} of the rules to create or update
+        """
+        return {
+            (avail_plan_id.id, room_type.id, date, pms_property.id): rule_vals
+            for room_type in room_types
+            for avail_plan_id in availability_plan_ids
+        }
 
-        return new_items
+    @api.model
+    def prepare_availability_plans_range_rules(
+        self,
+        room_types,
+        availability_plan_ids,
+        rule_vals,
+        date_from,
+        date_to,
+        pms_properties,
+    ):
+        """
+        :return: values of the date range rules to create, one by plan,
+                 room type and property
+        """
+        range_fields = self.env["pms.availability.plan.range.rule"]._fields
+        range_rule_vals = {
+            field: value for field, value in rule_vals.items() if field in range_fields
+        }
+        return [
+            dict(
+                range_rule_vals,
+                availability_plan_id=avail_plan_id.id,
+                room_type_id=room_type.id,
+                pms_property_id=pms_property.id,
+                date_from=date_from,
+                date_to=date_to,
+            )
+            for pms_property in pms_properties
+            for room_type in room_types
+            for avail_plan_id in availability_plan_ids
+        ]
 
     def continue_massive_changes(self):
         self.apply_massive_changes()
@@ -858,6 +980,9 @@ class AvailabilityWizard(models.TransientModel):
 
     def save_and_close(self):
         items = self.apply_massive_changes()
+        if self.run_in_background:
+            # keep the wizard open to follow the progress of the jobs
+            return self._get_wizard_action()
         if self.massive_changes_on == "pricelist" and not self.pricelist_readonly:
             action = {
                 "view": self.env.ref("pms.product_pricelist_item_action2").read()[0]
@@ -874,9 +999,159 @@ class AvailabilityWizard(models.TransientModel):
             action["view"]["domain"] = [("id", "in", items)]
             return action["view"]
 
+    def _get_wizard_action(self):
+        return {
+            "name": _("Massive changes on Pricelist and Availability Plans"),
+            "res_model": "pms.massive.changes.wizard",
+            "type": "ir.actions.act_window",
+            "view_id": self.env.ref("pms.massive_changes_wizard").id,
+            "target": "new",
+            "view_mode": "form",
+            "res_id": self.id,
+        }
+
+    def action_refresh_progress(self):
+        return self._get_wizard_action()
+
+    def action_view_applied_records(self):
+        if self.massive_changes_on == "pricelist":
+            action = self.env.ref("pms.product_pricelist_item_action2").read()[0]
+            action["domain"] = [("id", "in", self.created_pricelist_item_ids.ids)]
+        else:
+            action = self.env.ref("pms.availability_plan_rule_view_tree_action").read()[
+                0
+            ]
+            action["domain"] = [("id", "in", self.created_rule_ids.ids)]
+        return action
+
     def apply_massive_changes(self):
+        """
+        Apply the changes between the start and end dates and return the
+        ids of the created or modified items or rules. In background, the
+        dates are applied by chunks in queued jobs, one after another, and
+        the ids are linked to the wizard when the last chunk is done.
+        """
         self.ensure_one()
-        self.pricelist_items_to_overwrite.unlink()
+        if self.run_in_background:
+            chunks = self._get_massive_changes_chunks()
+            self.write(
+                {
+                    "state": "running",
+                    "job_chunk_count": len(chunks),
+                    "job_chunk_done": 0,
+                    "created_pricelist_item_ids": [(5, 0, 0)],
+                    "created_rule_ids": [(5, 0, 0)],
+                }
+            )
+            self._enqueue_massive_changes_chunk(
+                self._get_massive_changes_job_vals(), self.id, *chunks[0]
+            )
+            return []
+        return self._apply_massive_changes_between(self.start_date, self.end_date)
+
+    def _get_massive_changes_chunks(self):
+        """
+        :return: list of (date_from, date_to) of MASSIVE_CHANGES_CHUNK_DAYS
+                 days at most, between the start and end dates
+        """
+        if self.apply_as_date_range:
+            # a chunk by range rule would split the range
+            return [(self.start_date, self.end_date)]
+        chunks = []
+        date_from = self.start_date
+        while date_from <= self.end_date:
+            date_to = min(
+                date_from + datetime.timedelta(days=MASSIVE_CHANGES_CHUNK_DAYS - 1),
+                self.end_date,
+            )
+            chunks.append((date_from, date_to))
+            date_from = date_to + datetime.timedelta(days=1)
+        return chunks
+
+    def _get_massive_changes_job_vals(self):
+        """
+        Values of the wizard that define the changes. The jobs get them as
+        arguments, as the wizard is a transient record that can be vacuumed
+        before they run.
+        """
+        self.ensure_one()
+        return self._convert_to_write(
+            {
+                fname: self[fname]
+                for fname, field in self._fields.items()
+                if field.store
+                and not field.automatic
+                and fname not in MASSIVE_CHANGES_REPORT_FIELDS
+            }
+        )
+
+    @api.model
+    def _enqueue_massive_changes_chunk(
+        self, wizard_vals, wizard_id, date_from, date_to
+    ):
+        self.browse().with_delay(
+            description=_("Massive changes from %s to %s") % (date_from, date_to)
+        )._apply_massive_changes_chunk(wizard_vals, wizard_id, date_from, date_to)
+
+    @api.model
+    def _apply_massive_changes_chunk(self, wizard_vals, wizard_id, date_from, date_to):
+        """
+        Job of a chunk of dates: apply them with the values of the wizard,
+        report the progress on the wizard if it still exists and enqueue
+        the next chunk.
+        """
+        date_from = fields.Date.to_date(date_from)
+        date_to = fields.Date.to_date(date_to)
+        changes = self.new(wizard_vals)
+        items = changes._apply_massive_changes_between(date_from, date_to)
+        next_date = date_to + datetime.timedelta(days=1)
+        wizard = self.browse(wizard_id).exists()
+        if wizard:
+            created_field = (
+                "created_pricelist_item_ids"
+                if changes.massive_changes_on == "pricelist"
+                else "created_rule_ids"
+            )
+            vals = {
+                "job_chunk_done": wizard.job_chunk_done + 1,
+                created_field: [(4, item_id) for item_id in items],
+            }
+            if next_date > changes.end_date:
+                vals["state"] = "done"
+            wizard.write(vals)
+        if next_date <= changes.end_date:
+            self._enqueue_massive_changes_chunk(
+                wizard_vals,
+                wizard_id,
+                next_date,
+                min(
+                    next_date + datetime.timedelta(days=MASSIVE_CHANGES_CHUNK_DAYS - 1),
+                    changes.end_date,
+                ),
+            )
+        return _("%s records applied from %s to %s") % (len(items), date_from, date_to)
+
+    def _get_pricelist_items_to_overwrite_rows(self, date_from, date_to):
+        """
+        Pricelist items replaced by the changes between date_from and
+        date_to, read in SQL with the criteria of
+        pricelist_items_to_overwrite.
+        :return: list of (item id, date) with the sale or consumption date
+                 of each item
+        """
+        if (
+            self.massive_changes_on != "pricelist"
+            or not self.pricelist_ids
+            or not self.pms_property_ids
+        ):
+            return []
+        product_ids = self.generate_product_ids_to_filter(
+            self.apply_pricelists_on,
+            self.room_type_ids,
+            self.board_service_room_type_ids,
+            self.board_service,
+            self.service,
+        )
         week_days_to_apply = (
             self.apply_on_monday,
             self.apply_on_tuesday,
@@ -886,12 +1161,144 @@ class AvailabilityWizard(models.TransientModel):
             self.apply_on_saturday,
             self.apply_on_sunday,
         )
-
-        # dates between start and end (both included)
-        items = []
+        if self.date_types == "sale_dates":
+            day, last_day = "item.date_start::date", "item.date_end::date"
+        else:
+            day, last_day = "item.date_start_consumption", "item.date_end_consumption"
+        self.env["product.pricelist.item"].flush()
+        self.env.cr.execute(
+            """
+            SELECT item.id, %(day)s
+            FROM   product_pricelist_item item
+            WHERE  item.active
+               AND item.pricelist_id = ANY(%%(pricelist_ids)s)
+               AND (
+                    NOT EXISTS (
+                        SELECT 1
+                        FROM   product_pricelist_item_pms_property_rel rel
+                        WHERE  rel.product_pricelist_item_id = item.id
+                    )
+                    OR EXISTS (
+                        SELECT 1
+                        FROM   product_pricelist_item_pms_property_rel rel
+                        WHERE  rel.product_pricelist_item_id = item.id
+                           AND rel.pms_property_id = ANY(%%(pms_property_ids)s)
+                    )
+               )
+               AND %(day)s BETWEEN %%(date_from)s AND %%(date_to)s
+               AND (
+                    %%(sale_dates)s
+                    OR (
+                        item.date_end_consumption <= %%(end_date)s
+                        AND NOT item.consumption_run
+                    )
+               )
+               AND (%%(all_products)s OR item.product_id = ANY(%%(product_ids)s))
+               AND (
+                    %%(all_board_services)s
+                    OR item.board_service_room_type_id
+                       = ANY(%%(board_service_room_type_ids)s)
+               )
+               AND (
+                    %%(all_week)s
+                    OR EXTRACT(ISODOW FROM %(last_day)s) = ANY(%%(week_days)s)
+               )
+            """
+            % {"day": day, "last_day": last_day},
+            {
+                "pricelist_ids": self.pricelist_ids.ids,
+                "pms_property_ids": self.pms_property_ids.ids,
+                "date_from": date_from,
+                "date_to": date_to,
+                "end_date": self.end_date,
+                "sale_dates": self.date_types == "sale_dates",
+                "all_products": not product_ids,
+                "product_ids": product_ids or [],
+                "all_board_services": not self.board_service_room_type_ids,
+                "board_service_room_type_ids": self.board_service_room_type_ids.ids,
+                "all_week": self.apply_on_all_week,
+                "week_days": [
+                    isodow
+                    for isodow, apply_on in enumerate(week_days_to_apply, 1)
+                    if apply_on
+                ],
+            },
+        )
+        return self.env.cr.fetchall()
+
+    def _get_massive_changes_plan(self, date_from, date_to):
+        """
+        Changes of the wizard between date_from and date_to, computed
+        without touching any data. The preview and the apply of the
+        wizard run from the same plan.
+        :return: dict with
+                 delete_rows: list of (item id, date) of the pricelist
+                     items replaced
+                 vals_list: values of the pricelist items to create
+                 rules_vals: dict {(availability_plan_id, room_type_id,
+                     date, pms_property_id): vals} of the rules to create
+                     or update
+                 update_fields: fields written on the existing rules
+                 range_rules_vals: values of the date range rules to
+                     create
+        """
+        week_days_to_apply = (
+            self.apply_on_monday,
+            self.apply_on_tuesday,
+            self.apply_on_wednesday,
+            self.apply_on_thursday,
+            self.apply_on_friday,
+            self.apply_on_saturday,
+            self.apply_on_sunday,
+        )
+        if not self.room_type_ids:
+            room_types = self.env["pms.room.type"].search(
+                [
+                    "|",
+                    ("pms_property_ids", "=", False),
+                    ("pms_property_ids", "in", self.pms_property_ids.ids),
+                ]
+            )
+        else:
+            room_types = self.room_type_ids
+
+        vals_list = []
+        rules_vals = {}
+        range_rules_vals = []
+        rule_vals, update_fields = self._get_availability_rule_vals()
+        if self.apply_as_date_range:
+            range_rules_vals = self.prepare_availability_plans_range_rules(
+                room_types,
+                self.availability_plan_ids,
+                rule_vals,
+                date_from,
+                date_to,
+                self.pms_property_ids,
+            )
+            # the daily rules replace the range rules on their dates
+            if update_fields:
+                daily_rules = self.env["pms.availability.plan.rule"].search(
+                    [
+                        ("availability_plan_id", "in", self.availability_plan_ids.ids),
+                        ("room_type_id", "in", room_types.ids),
+                        ("pms_property_id", "in", self.pms_property_ids.ids),
+                        ("date", ">=", date_from),
+                        ("date", "<=", date_to),
+                    ]
+                )
+                rules_vals = {
+                    (
+                        rule.availability_plan_id.id,
+                        rule.room_type_id.id,
+                        rule.date,
+                        rule.pms_property_id.id,
+                    ): rule_vals
+                    for rule in daily_rules
+                }
+        # dates between date_from and date_to (both included)
         for date in [
-            self.start_date + datetime.timedelta(days=x)
-            for x in range(0, (self.end_date - self.start_date).days + 1)
+            date_from + datetime.timedelta(days=x)
+            for x in range(0, (date_to - date_from).days + 1)
         ]:
 
             if (
@@ -900,23 +1307,12 @@ class AvailabilityWizard(models.TransientModel):
             ):
                 continue
 
-            if not self.room_type_ids:
-                room_types = self.env["pms.room.type"].search(
-                    [
-                        "|",
-                        ("pms_property_ids", "=", False),
-                        ("pms_property_ids", "in", self.pms_property_ids.ids),
-                    ]
-                )
-            else:
-                room_types = self.room_type_ids
-
             for pms_property in self.pms_property_ids:
                 if (
                     self.massive_changes_on == "pricelist"
                     and self.apply_pricelists_on == "room_types"
                 ):
-                    new_items = self.create_pricelists_items_room_types(
+                    vals_list += self.prepare_pricelists_items_room_types(
                         room_types,
                         self.pricelist_ids,
                         self.price,
@@ -925,13 +1321,12 @@ class AvailabilityWizard(models.TransientModel):
                         date,
                         self.date_types,
                     )
-                    items = items + new_items if new_items else items
 
                 elif (
                     self.massive_changes_on == "pricelist"
                     and self.apply_pricelists_on == "board_services"
                 ):
-                    new_items = self.create_pricelists_items_board_services(
+                    vals_list += self.prepare_pricelists_items_board_services(
                         self.board_service_room_type_ids,
                         self.pricelist_ids,
                         self.board_service,
@@ -941,55 +1336,193 @@ class AvailabilityWizard(models.TransientModel):
                         self.date_types,
                         date,
                     )
-                    items = items + new_items if new_items else items
 
                 elif (
                     self.massive_changes_on == "pricelist"
                     and self.apply_pricelists_on == "service"
                 ):
-                    for pricelist in self.pricelist_ids:
-                        if self.service:
-                            vals = {
-                                "pricelist_id": pricelist.id,
-                                "compute_price": "fixed",
-                                "applied_on": "0_product_variant",
-                                "product_id": self.service.id,
-                                "fixed_price": self.price,
-                                "min_quantity": self.min_quantity,
-                                "pms_property_ids": [pms_property.id],
-                            }
-                            vals = self.generate_dates_vals(self.date_types, vals, date)
-
-                            pricelist_item = self.env["product.pricelist.item"].create(
-                                vals
-                            )
-                            items.append(pricelist_item.id)
-                elif self.massive_changes_on == "availability_plan":
-
-                    new_items = self.create_availability_plans_rules(
-                        room_types,
-                        self.availability_plan_ids,
-                        self.min_stay,
-                        self.apply_min_stay,
-                        self.min_stay_arrival,
-                        self.apply_min_stay_arrival,
-                        self.max_stay,
-                        self.apply_max_stay,
-                        self.max_stay_arrival,
-                        self.apply_max_stay_arrival,
-                        self.quota,
-                        self.apply_quota,
-                        self.max_avail,
-                        self.apply_max_avail,
-                        self.closed,
-                        self.apply_closed,
-                        self.closed_arrival,
-                        self.apply_closed_arrival,
-                        self.closed_departure,
-                        self.apply_closed_departure,
-                        date,
-                        self.rules_to_overwrite,
+                    vals_list += self.prepare_pricelists_items_service(
+                        self.service,
+                        self.pricelist_ids,
+                        self.price,
+                        self.min_quantity,
                         pms_property,
+                        self.date_types,
+                        date,
+                    )
+                elif (
+                    self.massive_changes_on == "availability_plan"
+                    and not self.apply_as_date_range
+                ):
+                    rules_vals.update(
+                        self.prepare_availability_plans_rules(
+                            room_types,
+                            self.availability_plan_ids,
+                            rule_vals,
+                            date,
+                            pms_property,
+                        )
                     )
-                    items = items + new_items if new_items else items
+
+        return {
+            "delete_rows": self._get_pricelist_items_to_overwrite_rows(
+                date_from, date_to
+            ),
+            "vals_list": vals_list,
+            "rules_vals": rules_vals,
+            "update_fields": update_fields,
+            "range_rules_vals": range_rules_vals,
+        }
+
+    def _apply_massive_changes_between(self, date_from, date_to):
+        PricelistItem = self.env["product.pricelist.item"]
+        plan = self._get_massive_changes_plan(date_from, date_to)
+        items_to_overwrite = PricelistItem.browse(
+            [item_id for item_id, _date in plan["delete_rows"]]
+        )
+        rate_grid_scopes = items_to_overwrite._get_rate_grid_scopes()
+        # the rate grid and the runs of daily prices are updated once for
+        # all the items, not item by item
+        items = self.with_context(
+            skip_rate_grid_refresh=True, skip_item_compaction=True
+        )._apply_massive_changes(plan)
+        if self.massive_changes_on == "pricelist":
+            new_items = PricelistItem.browse(items)
+            PricelistItem._refresh_rate_grid_scopes(
+                rate_grid_scopes | new_items._get_rate_grid_scopes()
+            )
+            new_items._compact_consumption_runs(keep_items=False)
+            items = new_items.exists().ids
         return items
+
+    def _apply_massive_changes(self, plan):
+        self.env["product.pricelist.item"].browse(
+            [item_id for item_id, _date in plan["delete_rows"]]
+        ).unlink()
+        if self.massive_changes_on == "availability_plan":
+            self.env["pms.availability.plan.range.rule"].create(
+                plan["range_rules_vals"]
+            )
+            return (
+                self.env["pms.availability.plan.rule"]
+                ._upsert_rules(plan["rules_vals"], plan["update_fields"])
+                .ids
+            )
+        return self.env["product.pricelist.item"].create(plan["vals_list"]).ids
+
+    def _get_massive_changes_preview(self, plan):
+        """
+        Count, in a single query, the records that the plan creates,
+        updates and deletes on each date.
+        :return: list of (date, inserts, updates, deletes) ordered by date
+        """
+        self.env["pms.availability.plan.rule"].flush(
+            ["availability_plan_id", "room_type_id", "date", "pms_property_id"]
+        )
+        rule_keys = list(plan["rules_vals"]) or [(None, None, None, None)]
+        plan_ids, room_type_ids, dates, pms_property_ids = zip(*rule_keys)
+        self.env.cr.execute(
+            """
+            SELECT change.date, SUM(change.inserts), SUM(change.updates),
+                   SUM(change.deletes)
+            FROM   (
+                SELECT cell.date, (rule.id IS NULL)::int AS inserts,
+                       (rule.id IS NOT NULL)::int AS updates, 0 AS deletes
+                FROM   unnest(
+                           %(plan_ids)s::int[], %(room_type_ids)s::int[],
+                           %(dates)s::date[], %(pms_property_ids)s::int[]
+                       ) AS cell(
+                           availability_plan_id, room_type_id, date,
+                           pms_property_id
+                       )
+                       LEFT JOIN pms_availability_plan_rule rule
+                            ON  rule.availability_plan_id
+                                = cell.availability_plan_id
+                            AND rule.room_type_id = cell.room_type_id
+                            AND rule.date = cell.date
+                            AND rule.pms_property_id = cell.pms_property_id
+                WHERE  cell.date IS NOT NULL
+                UNION ALL
+                SELECT date, 1, 0, 0
+                FROM   unnest(%(insert_dates)s::date[]) AS date
+                UNION ALL
+                SELECT date, 0, 0, 1
+                FROM   unnest(%(delete_dates)s::date[]) AS date
+            ) change
+            GROUP  BY change.date
+            ORDER  BY change.date
+            """,
+            {
+                "plan_ids": list(plan_ids),
+                "room_type_ids": list(room_type_ids),
+                "dates": list(dates),
+                "pms_property_ids": list(pms_property_ids),
+                "insert_dates": [
+                    vals.get("date_start_consumption") or vals["date_start"].date()
+                    for vals in plan["vals_list"]
+                ]
+                + [vals["date_from"] for vals in plan["range_rules_vals"]],
+                "delete_dates": [date for _item_id, date in plan["delete_rows"]],
+            },
+        )
+        return self.env.cr.fetchall()
+
+    def action_preview(self):
+        """
+        Show the number of records that the changes would create, update
+        and delete, without applying them.
+        """
+        self.ensure_one()
+        plan = self._get_massive_changes_plan(self.start_date, self.end_date)
+        rows = self._get_massive_changes_preview(plan)
+        self.write(
+            {
+                "preview_insert_count": sum(row[1] for row in rows),
+                "preview_update_count": sum(row[2] for row in rows),
+                "preview_delete_count": sum(row[3] for row in rows),
+                "preview_line_ids": [(5, 0, 0)]
+                + [
+                    (
+                        0,
+                        0,
+                        {
+                            "date": date,
+                            "insert_count": inserts,
+                            "update_count": updates,
+                            "delete_count": deletes,
+                        },
+                    )
+                    for date, inserts, updates, deletes in rows[
+                        :MASSIVE_CHANGES_PREVIEW_DATES
+                    ]
+                ],
+            }
+        )
+        return self._get_wizard_action()
+
+
+class MassiveChangesPreviewLine(models.TransientModel):
+    _name = "pms.massive.changes.preview.line"
+    _description = "Changes of a date in the preview of the massive changes"
+    _order = "date"
+
+    wizard_id = fields.Many2one(
+        string="Wizard",
+        comodel_name="pms.massive.changes.wizard",
+        ondelete="cascade",
+    )
+    date = fields.Date(
+        string="Date",
+    )
+    insert_count = fields.Integer(
+        string="Created",
+        help="Records created on the date",
+    )
+    update_count = fields.Integer(
+        string="Updated",
+        help="Records updated on the date",
+    )
+    delete_count = fields.Integer(
+        string="Deleted",
+        help="Records deleted on the date",
+    )
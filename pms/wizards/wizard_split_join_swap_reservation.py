@@ -250,12 +250,8 @@ class ReservationSplitJoinSwapWizard(models.TransientModel):
         rooms_available = pms_property.free_room_ids
 
         if room in rooms_available:
-            for line in (
-                self.env["pms.reservation"]
-                .search([("id", "=", reservation.id)])
-                .reservation_line_ids
-            ):
-                line.room_id = room.id
+            # a single write for all the nights
+            reservation.reservation_line_ids.room_id = room.id
         else:
             raise UserError(_("Room {} not available.".format(room.name)))
 
@@ -301,7 +297,14 @@ class ReservationSplitJoinSwapWizard(models.TransientModel):
 
     def action_split(self):
         for record in self:
+            rooms_by_date = {
+                line.date: line.room_id
+                for line in record.reservation_id.reservation_line_ids
+            }
             for line in record.reservation_lines_to_change:
+                # only the nights moved to another room are checked and written
+                if rooms_by_date.get(line.date) == line.room_id:
+                    continue
                 self.reservation_split(
                     record.reservation_id,
                     line.date,